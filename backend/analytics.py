@@ -0,0 +1,432 @@
+"""Precomputed task insights, refreshed off the request path.
+
+The charts read ``insights_daily``: per user and day (a task's
+``start_date``), overall and per ``habit_type`` / category, the number of
+tasks, how many were completed, their planned minutes (and those of the
+completed ones) and the habit occurrences completed that day.
+``insights_overdue`` keeps a daily snapshot of each user's pending and
+overdue counts for the overdue trend.
+
+Nothing is computed when a chart is requested. SQLite triggers on
+``tasks`` and ``habit_completions`` mark the (user, day) buckets a write
+touched in ``insights_dirty``; the ``Refresher`` thread drains them every
+``INSIGHTS_REFRESH_SECONDS`` and recomputes just those buckets with one
+GROUP BY over tasks and one over habit completions, in the same
+transaction that clears the marks. Charts can lag writes by that
+interval; responses report how many days are still pending.
+
+Archived tasks (``backend/archive.py``) still count: the task aggregates,
+the overdue snapshot and the reports read ``tasks`` and ``tasks_archive``
+together. Archiving deletes from ``tasks``, which marks the day dirty like
+any delete, and the recomputation finds the task again in the archive.
+
+Reports that have to scan a user's tasks (``pattern_report``) run in a
+process pool of ``INSIGHTS_PROCESSES`` workers so they never hold the
+GIL of the process serving requests.
+
+Rebuild every summary of an existing database with:
+
+    python -m backend.analytics rebuild
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Integer, and_, case, cast, create_engine, delete, func, insert, select, text, tuple_
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+
+from backend import archive, database, tenancy
+from backend.models import habit as habit_models, insight as models, task as task_models
+
+logger = logging.getLogger(__name__)
+
+INSIGHTS_REFRESH_SECONDS = float(os.getenv("INSIGHTS_REFRESH_SECONDS", "5"))
+# Buckets (utilizador, dia) recalculados por transação
+INSIGHTS_BATCH_DAYS = int(os.getenv("INSIGHTS_BATCH_DAYS", "500"))
+INSIGHTS_PROCESSES = int(os.getenv("INSIGHTS_PROCESSES", "2"))
+
+DIMENSIONS = ("all", "habit_type", "category")
+
+# Limites (minutos planeados) dos grupos do relatório "tempo vs resultados"
+DURATION_BUCKETS = (15, 30, 60, 120)
+
+# Colunas das tarefas lidas pelas agregações (de tasks e do arquivo)
+AGGREGATED_COLUMNS = [
+    "user_id", "start_date", "completed", "habit_type", "category_id", "start_time", "end_time", "unit", "unit_value",
+]
+
+_MARK = "INSERT OR IGNORE INTO insights_dirty (user_id, day) SELECT {user}, {day} WHERE {day} IS NOT NULL"
+_TASK_USER = "(SELECT user_id FROM tasks WHERE id = {row}.task_id)"
+_COMPLETION_DAYS = (
+    "INSERT OR IGNORE INTO insights_dirty (user_id, day) "
+    "SELECT {row}.user_id, occurrence_date FROM habit_completions WHERE task_id = {row}.id"
+)
+
+_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_insights_ai AFTER INSERT ON tasks BEGIN
+        {_MARK.format(user="new.user_id", day="new.start_date")};
+    END
+    """,
+    # Só as colunas que entram nas agregações (o carimbo de revisão do sync não conta)
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_insights_au
+    AFTER UPDATE OF start_date, completed, habit_type, category_id, start_time, end_time, unit, unit_value
+    ON tasks BEGIN
+        {_MARK.format(user="old.user_id", day="old.start_date")};
+        {_MARK.format(user="new.user_id", day="new.start_date")};
+    END
+    """,
+    # Os dias das ocorrências concluídas também mudam de grupo (ou desaparecem, no DELETE)
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_insights_au_habits
+    AFTER UPDATE OF habit_type, category_id ON tasks
+    WHEN old.habit_type IS NOT new.habit_type OR old.category_id IS NOT new.category_id BEGIN
+        {_COMPLETION_DAYS.format(row="new")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_insights_bd BEFORE DELETE ON tasks BEGIN
+        {_COMPLETION_DAYS.format(row="old")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_insights_ad AFTER DELETE ON tasks BEGIN
+        {_MARK.format(user="old.user_id", day="old.start_date")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS habit_completions_insights_ai AFTER INSERT ON habit_completions BEGIN
+        {_MARK.format(user=_TASK_USER.format(row="new"), day="new.occurrence_date")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS habit_completions_insights_ad AFTER DELETE ON habit_completions BEGIN
+        {_MARK.format(user=_TASK_USER.format(row="old"), day="old.occurrence_date")};
+    END
+    """,
+)
+
+
+def install_analytics(engine: Engine) -> bool:
+    """Install the dirty-marking triggers; on first install every existing day is marked for the refresher"""
+    if engine.dialect.name != "sqlite":
+        logger.warning("Insights triggers are only installed on SQLite")
+        return False
+
+    with engine.begin() as conn:
+        installed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'tasks_insights_ai'")
+        ).first()
+        for trigger in _TRIGGERS:
+            conn.execute(text(trigger))
+        if not installed:
+            mark_all(conn)
+    return True
+
+
+def mark_all(conn) -> None:
+    """Mark every (user, day) with tasks or habit completions for recomputation"""
+    conn.execute(text(
+        "INSERT OR IGNORE INTO insights_dirty (user_id, day) "
+        "SELECT DISTINCT user_id, start_date FROM tasks WHERE start_date IS NOT NULL "
+        "UNION SELECT DISTINCT user_id, start_date FROM tasks_archive WHERE start_date IS NOT NULL"
+    ))
+    conn.execute(text(
+        "INSERT OR IGNORE INTO insights_dirty (user_id, day) "
+        "SELECT DISTINCT tasks.user_id, habit_completions.occurrence_date FROM habit_completions "
+        "JOIN tasks ON tasks.id = habit_completions.task_id"
+    ))
+
+
+# -------------------------------
+# Agregações
+# -------------------------------
+def planned_minutes_expression(table):
+    """SQL version of crud.time_entry.planned_minutes: the start/end span, else unit_value in minutes or hours"""
+    span = (func.julianday(table.c.end_time) - func.julianday(table.c.start_time)) * 1440
+    # Segundos inteiros primeiro, para 60 minutos não virarem 59.9999
+    seconds = cast(func.round(case((span < 0, span + 1440), else_=span) * 60), Integer)
+    duration = case(
+        (and_(table.c.start_time.isnot(None), table.c.end_time.isnot(None)), seconds // 60), else_=0
+    )
+    unit_value = func.coalesce(table.c.unit_value, 0)
+    return case(
+        (duration > 0, duration),
+        (table.c.unit == "minutes", unit_value),
+        (table.c.unit == "hours", unit_value * 60),
+        else_=0,
+    )
+
+
+def _keys(habit_type: Optional[str], category_id: Optional[int]) -> tuple:
+    return (("all", ""), ("habit_type", habit_type or ""), ("category", str(category_id) if category_id else ""))
+
+
+def aggregate(conn, buckets: List[tuple]) -> list:
+    """insights_daily rows of the given (user_id, day) buckets, from one GROUP BY per source table"""
+    tasks = task_models.Task.__table__
+    completions = habit_models.HabitCompletion.__table__
+    # Tarefas quentes e arquivadas; o filtro dos buckets desce para cada lado (índices user_id, start_date)
+    both = archive.with_archive(
+        AGGREGATED_COLUMNS, lambda table: tuple_(table.c.user_id, table.c.start_date).in_(buckets)
+    )
+    planned = planned_minutes_expression(both)
+    totals = defaultdict(lambda: [0, 0, 0, 0, 0])
+
+    task_rows = conn.execute(
+        select(
+            both.c.user_id, both.c.start_date, both.c.habit_type, both.c.category_id,
+            func.count(), func.sum(cast(both.c.completed, Integer)),
+            func.sum(planned), func.sum(case((both.c.completed, planned), else_=0)),
+        )
+        .group_by(both.c.user_id, both.c.start_date, both.c.habit_type, both.c.category_id)
+    )
+    for user_id, day, habit_type, category_id, count, completed, planned_sum, completed_sum in task_rows:
+        for dimension, key in _keys(habit_type, category_id):
+            total = totals[(user_id, dimension, day, key)]
+            total[0] += count
+            total[1] += completed or 0
+            total[2] += planned_sum or 0
+            total[3] += completed_sum or 0
+
+    # Só as tarefas recorrentes têm conclusões por ocorrência, e essas nunca são arquivadas
+    habit_rows = conn.execute(
+        select(tasks.c.user_id, completions.c.occurrence_date, tasks.c.habit_type, tasks.c.category_id, func.count())
+        .select_from(completions.join(tasks, tasks.c.id == completions.c.task_id))
+        .where(tuple_(tasks.c.user_id, completions.c.occurrence_date).in_(buckets))
+        .group_by(tasks.c.user_id, completions.c.occurrence_date, tasks.c.habit_type, tasks.c.category_id)
+    )
+    for user_id, day, habit_type, category_id, count in habit_rows:
+        for dimension, key in _keys(habit_type, category_id):
+            totals[(user_id, dimension, day, key)][4] += count
+
+    return [
+        {
+            "user_id": user_id, "dimension": dimension, "day": day, "key": key,
+            "tasks": t[0], "completed": t[1], "planned_minutes": t[2], "completed_minutes": t[3],
+            "habit_completions": t[4],
+        }
+        for (user_id, dimension, day, key), t in totals.items()
+    ]
+
+
+def snapshot_overdue(conn, today: date, user_ids: Optional[Iterable[int]] = None) -> None:
+    """Record today's pending / overdue counts (all users, or just user_ids)"""
+    if user_ids is not None:
+        user_ids = set(user_ids)
+
+    def pending(table):
+        condition = table.c.completed == False  # noqa: E712
+        return condition if user_ids is None else and_(condition, table.c.user_id.in_(user_ids))
+
+    tasks = archive.with_archive(["user_id", "start_date", "completed"], pending)
+    query = (
+        select(tasks.c.user_id, func.count(), func.sum(cast(tasks.c.start_date < today, Integer)))
+        .group_by(tasks.c.user_id)
+    )
+    counts = {user_id: (pending, overdue or 0) for user_id, pending, overdue in conn.execute(query)}
+    # Utilizadores sem nada pendente também ficam com o ponto do dia (a zero)
+    for user_id in user_ids or ():
+        counts.setdefault(user_id, (0, 0))
+    if not counts:
+        return
+
+    table = models.InsightOverdue.__table__
+    stmt = sqlite.insert(table)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={"pending": stmt.excluded.pending, "overdue": stmt.excluded.overdue},
+        ),
+        [{"user_id": user_id, "day": today, "pending": p, "overdue": o} for user_id, (p, o) in counts.items()],
+    )
+
+
+def refresh(engine: Engine, limit: int = INSIGHTS_BATCH_DAYS) -> int:
+    """Recompute up to limit dirty buckets in one transaction; returns how many were refreshed"""
+    dirty = models.InsightDirty.__table__
+    daily = models.InsightDaily.__table__
+    with engine.begin() as conn:
+        # Começa por uma escrita: a transação fica com o lock de escrita e nenhum trigger se perde pelo meio
+        claimed = conn.execute(
+            delete(dirty)
+            .where(tuple_(dirty.c.user_id, dirty.c.day).in_(select(dirty.c.user_id, dirty.c.day).limit(limit)))
+            .returning(dirty.c.user_id, dirty.c.day)
+        ).all()
+        if not claimed:
+            return 0
+        buckets = [tuple(row) for row in claimed]
+
+        conn.execute(delete(daily).where(tuple_(daily.c.user_id, daily.c.day).in_(buckets)))
+        rows = aggregate(conn, buckets)
+        if rows:
+            conn.execute(insert(daily), rows)
+        snapshot_overdue(conn, date.today(), {user_id for user_id, _ in buckets})
+    return len(buckets)
+
+
+def refresh_all(engine: Engine) -> int:
+    """Drain every dirty bucket; returns how many were refreshed"""
+    total = 0
+    while True:
+        count = refresh(engine)
+        total += count
+        if count < INSIGHTS_BATCH_DAYS:
+            return total
+
+
+def rebuild(engine: Engine) -> int:
+    """Recompute every summary from scratch"""
+    with engine.begin() as conn:
+        conn.execute(delete(models.InsightDaily.__table__))
+        mark_all(conn)
+        snapshot_overdue(conn, date.today())
+    return refresh_all(engine)
+
+
+class Refresher:
+    """Background thread draining the dirty buckets of every open database"""
+
+    def __init__(self, interval: float = INSIGHTS_REFRESH_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot_day = {}                # engine -> último dia com snapshot de todos os utilizadores
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="insights-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def tick(self) -> int:
+        """Refresh every open database once"""
+        refreshed = 0
+        today = date.today()
+        for engine in tenancy.strategy.open_engines():
+            if engine.dialect.name != "sqlite":
+                continue
+            if self._snapshot_day.get(engine.url) != today:
+                with engine.begin() as conn:
+                    snapshot_overdue(conn, today)
+                self._snapshot_day[engine.url] = today
+            refreshed += refresh_all(engine)
+        return refreshed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:
+                # Tenta outra vez no próximo ciclo; as marcas ficam na tabela
+                logger.exception("Insights refresh failed")
+
+
+refresher = Refresher()
+
+
+# -------------------------------
+# Relatórios pesados (process pool)
+# -------------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_report_engines = {}                           # no processo filho: url -> engine
+
+
+def report_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o processo pai tem threads (writer, refresher) que não devem ser copiadas por fork
+            _pool = ProcessPoolExecutor(INSIGHTS_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def run_report(report, engine: Engine, *args):
+    """Run report(url, user_id, *args) in the process pool for the current user"""
+    url = engine.url.render_as_string(hide_password=False)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(report_pool(), report, url, tenancy.current_user_id(), *args)
+
+
+def _report_engine(url: str) -> Engine:
+    engine = _report_engines.get(url)
+    if engine is None:
+        engine = database.configure_engine(create_engine(url, **database.engine_options(url)), url)
+        _report_engines[url] = engine
+    return engine
+
+
+def _rate(completed: int, total: int) -> Optional[float]:
+    return round(completed / total, 4) if total else None
+
+
+def _group(conn, tasks, column) -> list:
+    rows = conn.execute(
+        select(column.label("group"), func.count(), func.sum(cast(tasks.c.completed, Integer)))
+        .group_by(column)
+        .order_by(column)
+    )
+    return [
+        {"group": group, "tasks": count, "completed": completed or 0, "completion_rate": _rate(completed or 0, count)}
+        for group, count, completed in rows
+    ]
+
+
+def pattern_report(url: str, user_id: int, start: date, end: date) -> dict:
+    """Completion patterns between start and end: by weekday, by start hour and by planned duration"""
+    tasks = archive.with_archive(
+        AGGREGATED_COLUMNS,
+        lambda table: and_(table.c.user_id == user_id, table.c.start_date >= start, table.c.start_date <= end),
+    )
+    planned = planned_minutes_expression(tasks)
+    # 0 = segunda, como date.weekday()
+    weekday = (cast(func.strftime("%w", tasks.c.start_date), Integer) + 6) % 7
+    hour = cast(func.substr(tasks.c.start_time, 1, 2), Integer)
+    duration = case(
+        (planned == 0, "unplanned"),
+        *[(planned < bound, f"<{bound}") for bound in DURATION_BUCKETS],
+        else_=f">={DURATION_BUCKETS[-1]}",
+    )
+
+    with _report_engine(url).connect() as conn:
+        by_hour = [row for row in _group(conn, tasks, hour) if row["group"] is not None]
+        return {
+            "from": start,
+            "to": end,
+            "by_weekday": _group(conn, tasks, weekday),
+            "by_hour": by_hour,
+            "by_planned_duration": _group(conn, tasks, duration),
+        }
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m backend.analytics rebuild")
+        sys.exit(2)
+
+    install_analytics(database.engine)
+    print(f"Rebuilt {rebuild(database.engine)} day(s) of insights on {database.SQLALCHEMY_DATABASE_URL}")
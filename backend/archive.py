@@ -0,0 +1,272 @@
+"""Hot/cold archival of finished tasks.
+
+Done one-off tasks whose day is more than ``ARCHIVE_AFTER_DAYS`` in the
+past (and, with ``ARCHIVE_INCOMPLETE_AFTER_DAYS``, long-overdue ones that
+were never done) move from ``tasks`` into ``tasks_archive``. They keep
+their ids. Recurring tasks never move: they are habits, not history. The
+hot table and its indexes then hold recent and upcoming work plus live
+habits, so list, overdue and upcoming queries cost the same whether a
+user has one year of history or ten.
+
+Moves run in a background thread, in batches of ``ARCHIVE_BATCH_SIZE``.
+Each batch is one transaction: ``INSERT ... SELECT`` into the archive,
+then ``DELETE`` from ``tasks``, with a pause between batches so request
+writes are never locked out for long. The delete triggers notice the
+archive row, so archiving leaves no sync tombstone (clients keep the
+task) and keeps the task's tags. The insights aggregate both tables.
+
+Reads stay on the hot table unless they need the archive:
+
+* by id (``get_task``): a miss in ``tasks`` falls through to the archive;
+* by date range (calendar, insight reports): the archive's
+  ``(user_id, start_date)`` index answers the same range, which costs one
+  empty probe until the range reaches archived days;
+* writes (update, complete, delete): the task is first restored into
+  ``tasks``, so every trigger, event and cache sees an ordinary write.
+
+Full-text search, ``GET /tasks/`` and exports cover hot tasks only.
+
+    python -m backend.archive run
+"""
+import logging
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend import cache, events, tenancy
+from backend.models import archive as models, task as task_models
+
+logger = logging.getLogger(__name__)
+
+# 0 desliga o arquivo (as tarefas ficam todas em tasks)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# Tarefas nunca concluídas também saem, passado este tempo (0 = ficam sempre em tasks, como atrasadas)
+ARCHIVE_INCOMPLETE_AFTER_DAYS = int(os.getenv("ARCHIVE_INCOMPLETE_AFTER_DAYS", "0"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+# Pausa entre lotes, para as escritas dos pedidos passarem à frente
+ARCHIVE_PAUSE_MS = float(os.getenv("ARCHIVE_PAUSE_MS", "50"))
+
+# Colunas copiadas entre as duas tabelas (o arquivo só acrescenta archived_at)
+COLUMNS = [column.name for column in task_models.Task.__table__.columns]
+
+
+def _tasks():
+    return task_models.Task.__table__
+
+
+def _archive():
+    return models.ArchivedTask.__table__
+
+
+def eligible(table, today: date):
+    """Condition on table (tasks) selecting the tasks the policy moves to the archive"""
+    # Sem start_date conta o dia da última escrita (a conclusão, normalmente)
+    day = func.coalesce(table.c.start_date, func.date(table.c.updated_at), func.date(table.c.created_at))
+    rules = [and_(table.c.completed == True, day < today - timedelta(days=ARCHIVE_AFTER_DAYS))]  # noqa: E712
+    if ARCHIVE_INCOMPLETE_AFTER_DAYS > 0:
+        rules.append(and_(
+            table.c.completed == False,  # noqa: E712
+            table.c.start_date < today - timedelta(days=ARCHIVE_INCOMPLETE_AFTER_DAYS),
+        ))
+    return and_(table.c.schedule_type.is_(None), or_(*rules))
+
+
+# -------------------------------
+# Mover para o arquivo e de volta
+# -------------------------------
+def archive_batch(engine: Engine, today: date, after: int = 0, limit: int = ARCHIVE_BATCH_SIZE) -> List[tuple]:
+    """Move up to limit eligible tasks with id > after in one transaction; returns their (id, user_id)"""
+    tasks, archived = _tasks(), _archive()
+    with engine.begin() as conn:
+        # Começa pela escrita: a seleção vê o estado mais recente e nenhuma outra escrita entra pelo meio
+        moved = conn.execute(
+            insert(archived)
+            .from_select(
+                COLUMNS,
+                select(*[tasks.c[name] for name in COLUMNS])
+                .where(tasks.c.id > after, eligible(tasks, today))
+                .order_by(tasks.c.id)
+                .limit(limit),
+            )
+            .returning(archived.c.id, archived.c.user_id)
+        ).all()
+        if moved:
+            conn.execute(delete(tasks).where(tasks.c.id.in_([task_id for task_id, _ in moved])))
+    moved.sort()
+    return [tuple(row) for row in moved]
+
+
+def _announce(moved: Iterable[tuple]) -> None:
+    """Invalidate the cached reads and tell subscribers (tag index, WebSocket clients) what moved"""
+    by_user = defaultdict(list)
+    for task_id, user_id in moved:
+        by_user[user_id].append(task_id)
+    for user_id, ids in by_user.items():
+        with tenancy.as_user(user_id):
+            cache.backend.invalidate(cache.user_tags(("tasks", "tasks_archive")))
+        events.emit("tasks.archived", None, lambda ids=ids: {"ids": ids}, user_id=user_id)
+
+
+def archive_engine(engine: Engine, today: Optional[date] = None, stop: Optional[threading.Event] = None) -> int:
+    """Archive every eligible task of one database, batch by batch; returns how many moved"""
+    today = today or date.today()
+    total, after = 0, 0
+    while True:
+        moved = archive_batch(engine, today, after)
+        _announce(moved)
+        total += len(moved)
+        if len(moved) < ARCHIVE_BATCH_SIZE:
+            return total
+        after = moved[-1][0]
+        if stop is not None and stop.wait(ARCHIVE_PAUSE_MS / 1000):
+            return total
+
+
+def restore(db: Session, task_ids: Iterable[int]) -> List[int]:
+    """Move the current user's archived tasks among task_ids back to tasks; the caller commits"""
+    task_ids = set(task_ids)
+    if not task_ids:
+        return []
+    tasks, archived = _tasks(), _archive()
+    restored = list(db.execute(
+        insert(tasks)
+        .from_select(
+            COLUMNS,
+            tenancy.owned(select(*[archived.c[name] for name in COLUMNS]), archived).where(archived.c.id.in_(task_ids)),
+        )
+        .returning(tasks.c.id)
+    ).scalars())
+    if restored:
+        db.execute(delete(archived).where(archived.c.id.in_(restored)))
+    return restored
+
+
+def announce_restored(task_ids: List[int]) -> None:
+    """Change event for tasks restored by a write, once it has committed"""
+    if task_ids:
+        events.emit("tasks.restored", None, lambda: {"ids": task_ids})
+
+
+# -------------------------------
+# Leituras que caem no arquivo
+# -------------------------------
+def get(db: Session, task_id: int) -> Optional[task_models.Task]:
+    """The current user's archived task task_id, as a detached Task"""
+    archived = _archive()
+    row = db.execute(
+        tenancy.owned(select(*[archived.c[name] for name in COLUMNS]), archived).where(archived.c.id == task_id)
+    ).first()
+    return task_models.Task(**row._mapping) if row is not None else None
+
+
+def titles(db: Session, task_ids: Iterable[int]) -> dict:
+    """Titles of the current user's archived tasks among task_ids"""
+    archived = _archive()
+    query = tenancy.owned(select(archived.c.id, archived.c.title), archived).where(archived.c.id.in_(set(task_ids)))
+    return dict(db.execute(query).all())
+
+
+def in_range(db: Session, start: date, end: date) -> List[task_models.Task]:
+    """The current user's archived tasks dated between start and end (archived tasks never repeat)"""
+    # Uma procura no índice (user_id, start_date): vazia enquanto o intervalo não chega a dias arquivados
+    archived = _archive()
+    rows = db.execute(
+        tenancy.owned(select(*[archived.c[name] for name in COLUMNS]), archived)
+        .where(archived.c.start_date >= start, archived.c.start_date <= end)
+    )
+    return [task_models.Task(**row._mapping) for row in rows]
+
+
+def with_archive(columns: List[str], where=None):
+    """tasks UNION ALL tasks_archive as a subquery of the given columns, each side filtered by where(table)"""
+    sides = []
+    for table in (_tasks(), _archive()):
+        side = select(*[table.c[name] for name in columns])
+        if where is not None:
+            side = side.where(where(table))
+        sides.append(side)
+    return union_all(*sides).subquery()
+
+
+# -------------------------------
+# Thread de fundo
+# -------------------------------
+class Archiver:
+    """Background thread archiving every database on an interval"""
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.counters = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return ARCHIVE_AFTER_DAYS > 0 and self.interval > 0
+
+    def start(self) -> None:
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="task-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def tick(self) -> int:
+        """Archive every database once; returns how many tasks moved"""
+        moved = 0
+        today = date.today()
+        for user_id in tenancy.strategy.partitions():
+            if self._stop.is_set():
+                break
+            with tenancy.as_user(user_id or tenancy.DEFAULT_USER_ID):
+                moved += archive_engine(tenancy.strategy.engine(), today, self._stop)
+        self.counters["runs"] += 1
+        self.counters["archived"] += moved
+        return moved
+
+    def _run(self) -> None:
+        # Primeira passagem logo no arranque, depois de intervalo a intervalo
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                # Tenta outra vez no próximo ciclo; um lote a meio foi revertido por inteiro
+                logger.exception("Task archival failed")
+            if self._stop.wait(self.interval):
+                return
+
+
+archiver = Archiver()
+
+
+def render_prometheus() -> str:
+    """Archiver counters in the Prometheus text exposition format"""
+    return "\n".join([
+        "# TYPE archive_runs_total counter",
+        f"archive_runs_total {archiver.counters['runs']}",
+        "# TYPE archive_tasks_total counter",
+        f"archive_tasks_total {archiver.counters['archived']}",
+    ]) + "\n"
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["run"]:
+        print("usage: python -m backend.archive run")
+        sys.exit(2)
+
+    from backend import database
+
+    print(f"Archived {archive_engine(database.engine)} task(s) on {database.SQLALCHEMY_DATABASE_URL}")
@@ -0,0 +1,246 @@
+"""Async versions of the core task and category routes.
+
+Only registered when DB_ASYNC=1; they run on the event loop with an
+AsyncSession instead of going through the threadpool.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date
+from backend import database, habits, serialization, sync, tags as tag_index
+from backend.constants import MAX_PAGE_SIZE, MAX_CALENDAR_WINDOW_DAYS
+from backend.crud import task as task_crud
+from backend.crud import task_async, category_async
+from backend.schemas import task as task_schemas, category as category_schemas
+
+router = APIRouter()
+
+
+# -------------------------------
+# 🟦 Rotas para Tasks
+# -------------------------------
+@router.post(
+    "/tasks/",
+    response_model=task_schemas.Task,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create a new task",
+    description="Create a new task with the given details."
+)
+async def create_task(task: task_schemas.TaskCreate, db: AsyncSession = Depends(database.get_async_db)):
+    try:
+        return await task_async.create_task(db, task)
+    except task_crud.CategoryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get(
+    "/tasks/",
+    response_model=task_schemas.TaskList,
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get all tasks",
+    description="Retrieve a page of tasks ordered by start_date. Pass next_cursor back as cursor to get the next page."
+)
+async def read_tasks(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    completed: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    schedule_type: Optional[task_schemas.ScheduleType] = None,
+    habit_type: Optional[task_schemas.HabitType] = None,
+    overdue_only: bool = False,
+    include_total: bool = False,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of task fields to return, e.g. id,title,start_date"),
+    tags: Optional[str] = Query(None, description='Tag expression, e.g. work AND (urgent OR "high effort") AND NOT done'),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    try:
+        after = task_crud.decode_cursor(cursor) if cursor else None
+        selected = serialization.parse_fields(fields)
+        if tags is not None:
+            tag_index.parse(tags)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    filters = dict(
+        completed=completed,
+        category_id=category_id,
+        schedule_type=schedule_type.value if schedule_type else None,
+        habit_type=habit_type.value if habit_type else None,
+        overdue_only=overdue_only,
+        tags=tags,
+    )
+    rows, next_cursor = task_crud.paginate(
+        await task_async.get_task_rows(db, selected, limit=limit + 1, after=after, **filters), limit
+    )
+
+    # Caminho rápido: linhas -> JSON sem construir um modelo Pydantic por tarefa
+    return serialization.json_response({
+        "tasks": serialization.rows_to_dicts(rows, selected),
+        "size": len(rows),
+        "next_cursor": next_cursor,
+        "total": await task_async.get_tasks_count(db, **filters) if include_total else None,
+    }, response)
+
+@router.get(
+    "/tasks/search",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Search tasks",
+    description="Full-text search over title, description and notes, ranked by relevance. The last word is matched as a prefix."
+)
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await task_async.search_tasks(db, q, skip=skip, limit=limit)
+
+@router.get(
+    "/tasks/today",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get today's tasks",
+    description="Tasks scheduled for today, ordered by start time"
+)
+async def read_today_tasks(db: AsyncSession = Depends(database.get_async_db)):
+    return await task_async.get_today_tasks(db)
+
+@router.get(
+    "/tasks/upcoming",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get upcoming tasks",
+    description="Incomplete tasks starting within the next days"
+)
+async def read_upcoming_tasks(
+    days: int = Query(7, ge=1, le=MAX_CALENDAR_WINDOW_DAYS),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await task_async.get_upcoming_tasks(db, days=days, limit=limit)
+
+@router.get(
+    "/tasks/overdue",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get overdue tasks",
+    description="Incomplete tasks whose start date has passed"
+)
+async def read_overdue_tasks(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await task_async.get_overdue_tasks(db, limit=limit)
+
+@router.get(
+    "/tasks/{task_id}",
+    response_model=task_schemas.Task,
+    summary="Get task by ID",
+    description="Retrieve a specific task by its ID"
+)
+async def read_task(task_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_task = await task_async.get_task(db, task_id)
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.put(
+    "/tasks/{task_id}",
+    response_model=task_schemas.Task,
+    summary="Update task",
+    description="Update an existing task with new data"
+)
+async def update_task(
+    task_id: int,
+    task: task_schemas.TaskUpdate,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    try:
+        db_task = await task_async.update_task(db, task_id, task)
+    except task_crud.CategoryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.post(
+    "/tasks/{task_id}/complete",
+    response_model=task_schemas.Task,
+    summary="Mark a task as completed",
+    description="Mark a task as completed in a single UPDATE ... RETURNING statement. For habits this also records the occurrence and updates the streaks."
+)
+async def complete_task(
+    task_id: int,
+    on: Optional[date] = Query(None, description="Habits only: the occurrence to mark, default the latest one due"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    try:
+        db_task = await task_async.mark_task_completed(db, task_id, on=on)
+    except habits.OccurrenceError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.post(
+    "/tasks/{task_id}/incomplete",
+    response_model=task_schemas.Task,
+    summary="Mark a task as not completed",
+    description="Mark a task as not completed in a single UPDATE ... RETURNING statement. For habits this also records the occurrence and updates the streaks."
+)
+async def incomplete_task(
+    task_id: int,
+    on: Optional[date] = Query(None, description="Habits only: the occurrence to mark, default the latest one due"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    try:
+        db_task = await task_async.mark_task_incomplete(db, task_id, on=on)
+    except habits.OccurrenceError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.delete(
+    "/tasks/{task_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Delete task",
+    description="Delete a task by its ID"
+)
+async def delete_task(task_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    success = await task_async.delete_task(db, task_id)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+
+
+# -------------------------------
+# 🟩 Rotas para Categories
+# -------------------------------
+@router.post("/categories/", response_model=category_schemas.Category)
+async def create_category(category: category_schemas.CategoryCreate, db: AsyncSession = Depends(database.get_async_db)):
+    return await category_async.create_category(db, category)
+
+
+@router.get(
+    "/categories/",
+    response_model=list[category_schemas.Category],
+    dependencies=[Depends(sync.etag_guard)],
+)
+async def read_categories(db: AsyncSession = Depends(database.get_async_db)):
+    return await category_async.get_categories(db)
@@ -0,0 +1,122 @@
+"""Hot queries with years of finished history in ``tasks`` and after archiving it.
+
+Seeds a throwaway database with the usual recent mix of tasks plus
+``--history`` finished one-off tasks spread over the past years, times the
+hot reads (list pages, counts, overdue, upcoming, calendar ranges),
+archives the history in batches and times the same reads again, plus a
+lookup by id that falls through to the archive.
+
+    python -m backend.benchmarks.archive --tasks 20000 --history 500000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from backend import archive, migrations
+from backend.benchmarks.seed import BATCH_SIZE, seed, task_row
+from backend.crud import task as task_crud
+from backend.models import archive as archive_models, task as task_models
+
+
+def _p(samples, q: int) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else samples[0] * 1000
+
+
+def _time(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _queries():
+    today = date.today()
+    return {
+        "list": lambda db: task_crud.get_tasks(db),
+        "list (pending)": lambda db: task_crud.get_tasks(db, completed=False),
+        "count (pending)": lambda db: task_crud.get_tasks_count.__wrapped__(db, completed=False),
+        "count (all)": lambda db: task_crud.get_tasks_count.__wrapped__(db),
+        "overdue": lambda db: task_crud.get_overdue_tasks.__wrapped__(db),
+        "upcoming": lambda db: task_crud.get_upcoming_tasks.__wrapped__(db, days=14),
+        # Só a leitura: expandir as ocorrências dos hábitos custa o mesmo com ou sem arquivo
+        "calendar month": lambda db: task_crud.get_tasks_in_range(db, today, today + timedelta(days=30)),
+        "calendar (old)": lambda db: task_crud.get_tasks_in_range(db, today - timedelta(days=400), today - timedelta(days=370)),
+    }
+
+
+def _seed_history(engine, n_tasks: int, years: int) -> None:
+    """n_tasks completed one-off tasks dated between years ago and the archive cutoff"""
+    rng = random.Random(7)
+    today = date.today()
+    oldest = years * 365
+    newest = archive.ARCHIVE_AFTER_DAYS + 1
+    with engine.begin() as conn:
+        batch = []
+        for _ in range(n_tasks):
+            row = task_row(rng, [], today)
+            row.update(
+                schedule_type=None, completed=True, start_date=today - timedelta(days=rng.randint(newest, oldest))
+            )
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                conn.execute(insert(task_models.Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(task_models.Task), batch)
+
+
+def _report(label: str, db, repeat: int) -> dict:
+    results = {}
+    for name, query in _queries().items():
+        samples = _time(lambda: query(db), repeat)
+        results[name] = _p(samples, 50)
+        print(f"{label:<8} {name:<16} p50 {results[name]:>8.2f} ms  p99 {_p(samples, 99):>8.2f} ms")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=20_000, help="Recent tasks (the working set)")
+    parser.add_argument("--history", type=int, default=500_000, help="Finished tasks older than the cutoff")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrations.upgrade(engine)
+        seed(engine, 20, args.tasks)
+        _seed_history(engine, args.history, args.years)
+        print(f"seeded    {args.tasks} recent + {args.history} finished tasks over {args.years} years")
+
+        db = sessionmaker(bind=engine)()
+        before = _report("hot+old", db, args.requests)
+
+        started = time.perf_counter()
+        moved = archive.archive_engine(engine)
+        elapsed = time.perf_counter() - started
+        print(f"archived  {moved} tasks in {elapsed:.2f}s ({moved / elapsed:,.0f} tasks/s,"
+              f" batches of {archive.ARCHIVE_BATCH_SIZE})")
+
+        after = _report("hot", db, args.requests)
+        for name in before:
+            print(f"{name:<16} {before[name] / after[name]:>6.1f}x faster")
+
+        archived_id = db.execute(select(func.min(archive_models.ArchivedTask.__table__.c.id))).scalar()
+        lookup = _time(lambda: task_crud.get_task(db, archived_id), args.requests)
+        print(f"get archived task by id  p50 {_p(lookup, 50):>6.2f} ms")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""First screen: one request per section against one ``GET /bootstrap``.
+
+Seeds a throwaway database and times, with the cache off, the sections
+the app loads on open (today, upcoming, categories, counts) the way
+separate requests run them, one after the other, against
+``bootstrap.load`` running their queries concurrently. Each separate
+request also pays a network round trip, so the report adds ``--rtt-ms``
+per request to show what a mobile client waits for.
+
+    python -m backend.benchmarks.bootstrap --tasks 50000 --rtt-ms 80
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import bootstrap, cache, database, migrations
+from backend.benchmarks.seed import seed
+from backend.schemas.bootstrap import BootstrapSection
+
+
+def _p(samples, q: int) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else samples[0] * 1000
+
+
+def _time(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _sequential(sections) -> None:
+    # Um pedido por secção, cada um com a sua sessão, como os GET separados do cliente
+    for section in sections:
+        for name in bootstrap.SECTIONS[section]:
+            bootstrap._query(name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=80, help="Network round trip added per HTTP request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False}
+        )
+        database.configure_engine(engine, str(engine.url))
+        migrations.upgrade(engine)
+        seed(engine, 20, args.tasks)
+        # As secções abrem sessões pela fábrica das dependências; a cache mediria só o primeiro pedido
+        database.engine = engine
+        database.session_factory = sessionmaker(bind=engine)
+        cache.backend = cache.NullCache()
+
+        sections = list(BootstrapSection)
+        loop = asyncio.new_event_loop()
+        sequential = _time(lambda: _sequential(sections), args.requests)
+        concurrent = _time(lambda: loop.run_until_complete(bootstrap.load(sections)), args.requests)
+        loop.close()
+
+        rtt = args.rtt_ms
+        print(f"seeded     {args.tasks} tasks; sections: {', '.join(s.value for s in sections)}")
+        for label, samples, round_trips in (
+            (f"{len(sections)} requests", sequential, len(sections)),
+            ("/bootstrap", concurrent, 1),
+        ):
+            server = _p(samples, 50)
+            print(f"{label:<12} server p50 {server:>7.2f} ms  p99 {_p(samples, 99):>7.2f} ms"
+                  f"  client at {rtt:.0f} ms RTT ~{server + round_trips * rtt:>7.1f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare the FTS5 search path with the old ILIKE scan.
+
+    python -m backend.benchmarks.fts_search --tasks 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, or_
+from sqlalchemy.orm import sessionmaker
+
+from backend import search
+from backend.database import Base
+from backend.models import task as models
+from backend.models import category as category_models  # noqa: F401 (regista a tabela)
+from backend.crud import task as task_crud
+
+COMMON_WORDS = (
+    "run read write water gym yoga walk cook study code review meeting plan "
+    "email call stretch meditate journal piano guitar swim bike clean shop"
+).split()
+
+# Vocabulário sintético grande para que os termos sejam seletivos como em dados reais
+RARE_WORDS = [f"w{i:05d}" for i in range(20_000)]
+
+# Termo comum, prefixo, duas palavras, termo raro e termo sem resultados
+QUERIES = ["water", "medit", "code review", "w01234", "nothingmatches"]
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    words = []
+    for _ in range(n):
+        pool = COMMON_WORDS if rng.random() < 0.1 else RARE_WORDS
+        words.append(rng.choice(pool))
+    return " ".join(words)
+
+
+def seed(engine, n_tasks: int, seed_value: int = 42) -> None:
+    """Insert n_tasks synthetic rows in batches"""
+    rng = random.Random(seed_value)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(n_tasks):
+            batch.append({
+                "title": _sentence(rng, 3),
+                "description": _sentence(rng, 12),
+                "notes": _sentence(rng, 6) if i % 3 == 0 else None,
+                "completed": False,
+                "all_day": False,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(models.Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.Task), batch)
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def ilike_search(db, term: str, limit: int):
+    pattern = f"%{term}%"
+    return db.query(models.Task).filter(
+        or_(
+            models.Task.title.ilike(pattern),
+            models.Task.description.ilike(pattern),
+            models.Task.notes.ilike(pattern),
+        )
+    ).limit(limit).all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        search.install_fts(engine)
+
+        started = time.perf_counter()
+        seed(engine, args.tasks)
+        print(f"seeded {args.tasks} tasks in {time.perf_counter() - started:.1f}s")
+
+        db = sessionmaker(bind=engine)()
+        print(f"{'query':<18}{'ilike ms':>10}{'fts ms':>10}{'speedup':>10}")
+        for term in QUERIES:
+            ilike_ms = _time(lambda: ilike_search(db, term, args.limit), args.repeat)
+            fts_ms = _time(lambda: task_crud.search_tasks(db, term, limit=args.limit), args.repeat)
+            print(f"{term:<18}{ilike_ms:>10.2f}{fts_ms:>10.2f}{ilike_ms / fts_ms:>9.1f}x")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Write throughput under concurrency: one commit per request vs group commit.
+
+Runs the same mix of small writes (create a task, check one off) from a
+number of threads, first with each call committing on its own session
+and then through the group-commit writer.
+
+    python -m backend.benchmarks.group_commit --threads 1 8 32 --synchronous FULL
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend import database, migrations
+from backend.crud import task as task_crud
+from backend.schemas import task as schemas
+from backend.write_queue import GroupCommitWriter
+
+
+def _operation(i: int, n_tasks: int):
+    if i % 2:
+        return task_crud.mark_task_completed, ((i * 7919) % n_tasks + 1,), {}
+    task = schemas.TaskCreate(title=f"bench {i}", start_date=date.today() + timedelta(days=1))
+    return task_crud.create_task, (task,), {}
+
+
+def _run(threads: int, ops_per_thread: int, n_tasks: int, call) -> float:
+    def worker(offset):
+        for i in range(offset, offset + ops_per_thread):
+            func, args, kwargs = _operation(i, n_tasks)
+            call(func, *args, **kwargs)
+
+    pool = [threading.Thread(target=worker, args=(t * ops_per_thread,)) for t in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return threads * ops_per_thread / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ops", type=int, default=200, help="writes per thread")
+    parser.add_argument("--synchronous", default="FULL", help="SQLite synchronous PRAGMA (FULL makes every commit fsync)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = database.configure_engine(create_engine(url, **database.engine_options(url)), url)
+        event.listen(engine, "connect", lambda conn, record: conn.execute(f"PRAGMA synchronous={args.synchronous}"))
+        migrations.upgrade(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        n_tasks = 1000
+        with Session() as db:
+            task_crud.bulk_create_tasks(db, [schemas.TaskCreate(title=f"seed {i}") for i in range(n_tasks)])
+
+        def direct(func, *call_args, **kwargs):
+            with Session() as db:
+                return func(db, *call_args, **kwargs)
+
+        writer = GroupCommitWriter(engine)
+        print(f"{'threads':>8}{'direct ops/s':>15}{'group ops/s':>15}{'speedup':>10}")
+        for threads in args.threads:
+            direct_rate = _run(threads, args.ops, n_tasks, direct)
+            group_rate = _run(threads, args.ops, n_tasks, lambda *a, **k: writer.submit(*a, **k).result())
+            print(f"{threads:>8}{direct_rate:>15.0f}{group_rate:>15.0f}{group_rate / direct_rate:>9.1f}x")
+        writer.stop()
+        print(f"groups: {writer.counters['groups']}, operations: {writer.counters['operations']}, "
+              f"largest group: {writer.counters['max_group_size']}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cost of the precomputed insights against aggregating on every request.
+
+Seeds a throwaway database, builds the summaries from scratch, then
+compares reading a window from ``insights_daily`` with running the same
+GROUP BY over ``tasks`` live, and times the incremental refresh after a
+burst of writes.
+
+    python -m backend.benchmarks.insights --tasks 500000 --writes 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import Integer, cast, create_engine, func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from backend import analytics, migrations, sync
+from backend.benchmarks.seed import seed
+from backend.crud import insight as insight_crud
+from backend.models import task as task_models
+
+
+def _p(samples, q: float) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else samples[0] * 1000
+
+
+def _time(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=90, help="Window read by each request")
+    parser.add_argument("--writes", type=int, default=1000, help="Tasks completed before the incremental refresh")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrations.upgrade(engine)
+        seed(engine, 20, args.tasks)
+        sync.install_sync(engine)
+        analytics.install_analytics(engine)
+
+        started = time.perf_counter()
+        days = analytics.rebuild(engine)
+        print(f"rebuild      {days:>8} days  {time.perf_counter() - started:>8.2f}s")
+
+        end = date.today()
+        start = end - timedelta(days=args.days - 1)
+        db = sessionmaker(bind=engine)()
+        tasks = task_models.Task
+        planned = analytics.planned_minutes_expression(tasks.__table__)
+        live = (
+            select(tasks.start_date, tasks.category_id, func.count(), func.sum(cast(tasks.completed, Integer)), func.sum(planned))
+            .where(tasks.user_id == 1, tasks.start_date >= start, tasks.start_date <= end)
+            .group_by(tasks.start_date, tasks.category_id)
+        )
+        precomputed = _time(lambda: insight_crud.get_summary(db, "week", "category", start, end), args.requests)
+        aggregated = _time(lambda: db.execute(live).all(), args.requests)
+        for name, samples in (("precomputed", precomputed), ("live GROUP BY", aggregated)):
+            print(f"{name:<13} p50 {_p(samples, 50):>8.2f} ms  p99 {_p(samples, 99):>8.2f} ms")
+        db.close()
+
+        rng = random.Random(7)
+        with engine.begin() as conn:
+            max_id = conn.execute(select(func.max(tasks.id))).scalar()
+            for task_id in rng.sample(range(1, max_id + 1), min(args.writes, max_id)):
+                conn.execute(update(tasks).where(tasks.id == task_id).values(completed=True))
+        started = time.perf_counter()
+        days = analytics.refresh_all(engine)
+        print(f"refresh      {days:>8} days  {time.perf_counter() - started:>8.2f}s  after {args.writes} writes")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Load test for the HTTP API against a throwaway, seeded SQLite database.
+
+    pip install -r backend/benchmarks/requirements.txt
+    python -m backend.benchmarks.load --mode inprocess --tasks 20000 --output before.json
+    python -m backend.benchmarks.load --mode uvicorn --tasks 20000 --output after.json --compare before.json
+    python -m backend.benchmarks.load --mode uvicorn --workers 4 --concurrency 64 --compare one-worker.json
+
+``inprocess`` drives the ASGI app directly through httpx (no sockets, so
+it measures the app and the database); ``uvicorn`` starts the production
+server (``python -m backend.server``) in a subprocess with ``--workers``
+workers and goes through the network stack. The report records how long
+the server took to answer ``/readyz``. Every scenario runs
+``--requests`` requests over ``--concurrency`` concurrent workers and
+reports p50/p95/p99 latency and throughput. The request parameters come
+from ``--seed``, so two runs on the same tree issue the same requests.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+SEARCH_TERMS = ("read", "book", "code", "yoga not", "sp", "review budget")
+UPDATE_FIELDS = ({"notes": "benchmark"}, {"title": "review slides"}, {"habit_type": "learning"})
+# list pede uma destas primeiras páginas de GET /tasks/ ao acaso
+LIST_PAGE_SIZE = 100
+LIST_PAGES = 21
+
+
+# -------------------------------
+# Cenários: (nome, função que devolve (método, url, corpo))
+# -------------------------------
+def build_scenarios(rng: random.Random, task_ids, deletable_ids, category_ids, cursors):
+    from backend.benchmarks import seed as seed_data
+
+    deletable = iter(deletable_ids)
+
+    def new_task():
+        row = seed_data.task_row(rng, category_ids, datetime.now().date())
+        # TaskCreate não aceita datas no passado
+        row["start_date"] = datetime.now().date() + timedelta(days=rng.randint(0, 60))
+        for key in ("start_date", "start_time", "end_time"):
+            if row[key] is not None:
+                row[key] = row[key].isoformat()
+        row.pop("completed")
+        return row
+
+    def list_page():
+        cursor = rng.choice(cursors)
+        return f"/tasks/?limit={LIST_PAGE_SIZE}" + (f"&cursor={cursor}" if cursor else "")
+
+    return (
+        ("list", lambda: ("GET", list_page(), None)),
+        ("list_fields", lambda: ("GET", "/tasks/?limit=100&fields=title,completed,start_date", None)),
+        ("get", lambda: ("GET", f"/tasks/{rng.choice(task_ids)}", None)),
+        ("search", lambda: ("GET", f"/tasks/search?q={rng.choice(SEARCH_TERMS)}&limit=20", None)),
+        ("overdue", lambda: ("GET", "/tasks/overdue?limit=100", None)),
+        ("today", lambda: ("GET", "/tasks/today", None)),
+        ("upcoming", lambda: ("GET", f"/tasks/upcoming?days={rng.choice((7, 14, 30))}", None)),
+        ("create", lambda: ("POST", "/tasks/", new_task())),
+        ("update", lambda: ("PUT", f"/tasks/{rng.choice(task_ids)}", rng.choice(UPDATE_FIELDS))),
+        ("complete", lambda: ("POST", f"/tasks/{rng.choice(task_ids)}/complete", None)),
+        ("delete", lambda: ("DELETE", f"/tasks/{next(deletable)}", None)),
+    )
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    # Pedidos gerados antes de medir, para o gerador não entrar nas latências
+    pending = [make_request() for _ in range(requests)]
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            method, url, body = pending.pop()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)) if latencies else None,
+        "p95_ms": ms(percentile(latencies, 95)) if latencies else None,
+        "p99_ms": ms(percentile(latencies, 99)) if latencies else None,
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+# -------------------------------
+# Memória
+# -------------------------------
+def self_peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS devolve bytes, Linux devolve KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def process_peak_rss_kb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def server_peak_rss_kb(pid: int):
+    """Peak RSS of the server and its workers (forked children), summed"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            pids = [pid] + [int(child) for child in children.read().split()]
+    except OSError:
+        pids = [pid]
+    peaks = [peak for peak in map(process_peak_rss_kb, pids) if peak is not None]
+    return sum(peaks) if peaks else None
+
+
+# -------------------------------
+# Modos de execução
+# -------------------------------
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 60.0) -> float:
+    """Poll /readyz until it answers 200; returns the seconds since the server was started"""
+    started = time.monotonic()
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return time.monotonic() - started
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError("server did not become ready in time")
+
+
+async def run_all(args, scenarios) -> tuple:
+    results, server, ready_seconds = {}, None, None
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    if args.mode == "inprocess":
+        from backend.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", limits=limits)
+    else:
+        port = args.port or _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "backend.server", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.workers)],
+            env={**os.environ, "SERVER_LOG_LEVEL": "warning"},
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        ready_seconds = await _wait_until_ready(base_url, server)
+        client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0)
+
+    try:
+        async with client:
+            # Aquecimento: ligações, caches do SQLite e imports tardios fora das medições
+            for name, make_request in scenarios:
+                if name not in ("create", "update", "complete", "delete"):
+                    method, url, body = make_request()
+                    await client.request(method, url, json=body)
+
+            for name, make_request in scenarios:
+                if args.only and name not in args.only:
+                    continue
+                results[name] = await run_scenario(client, make_request, args.requests, args.concurrency)
+                print(f"{name:12} {json.dumps(results[name])}", file=sys.stderr)
+
+        server_rss = server_peak_rss_kb(server.pid) if server is not None else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    return results, server_rss, ready_seconds
+
+
+# -------------------------------
+# Comparação entre execuções
+# -------------------------------
+def compare(baseline: dict, current: dict) -> str:
+    lines = [f"{'scenario':12} {'p50':>18} {'p95':>18} {'p99':>18} {'rps':>18}"]
+    for name, stats in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            old, new = before.get(key), stats.get(key)
+            change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+            cells.append(f"{new} ({change})".rjust(18))
+        lines.append(f"{name:12} " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="server workers (uvicorn mode)")
+    parser.add_argument("--port", type=int, default=0, help="uvicorn port (default: a free one)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    args = parser.parse_args(argv)
+
+    if args.tasks < args.requests * 2:
+        parser.error("--tasks must be at least twice --requests (delete needs its own ids)")
+
+    workdir = tempfile.mkdtemp(prefix="productivity-bench-")
+    # Tem de estar definido antes de importar backend.database / backend.main
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SLOW_QUERY_MS", "1000000")
+
+    try:
+        # Imports só aqui: os models abrem a engine de DATABASE_URL ao serem importados
+        from backend import tenancy
+        from backend.benchmarks import seed as seed_data
+        from backend.database import engine
+
+        # Esquema, FTS e triggers de sync (o import da app já não os cria)
+        tenancy.prepare_database(engine)
+
+        seeded_at = time.perf_counter()
+        ids = seed_data.seed(engine, args.categories, args.tasks, args.seed)
+        seed_seconds = time.perf_counter() - seeded_at
+        if args.mode == "uvicorn":
+            # O servidor abre a base de dados por conta própria
+            engine.dispose()
+
+        task_ids = ids["task_ids"]
+        rng = random.Random(args.seed)
+        # Paginação por cursor: as posições das páginas vêm dos dados semeados, antes de qualquer escrita
+        cursors = seed_data.page_cursors(engine, LIST_PAGE_SIZE, LIST_PAGES)
+        scenarios = build_scenarios(
+            rng, task_ids[:-args.requests], task_ids[-args.requests:], ids["category_ids"], cursors
+        )
+        results, server_rss, ready_seconds = asyncio.run(run_all(args, scenarios))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "mode": args.mode,
+            "git_revision": _git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "categories": args.categories,
+            "tasks": args.tasks,
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers if args.mode == "uvicorn" else None,
+            "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 3),
+            "ready_seconds": round(ready_seconds, 3) if ready_seconds is not None else None,
+        },
+        "scenarios": results,
+        "peak_rss_kb": {
+            # Em inprocess o cliente e a app partilham o processo
+            "client": self_peak_rss_kb(),
+            "server": server_rss,
+        },
+    }
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            print(compare(json.load(baseline), report), file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""A day of offline edits: one request per edit against one ``POST /sync/operations``.
+
+Seeds a throwaway database, builds ``--ops`` edits the way a phone
+collects them offline (mostly completion toggles, then edits, a few new
+and deleted tasks) and replays them two ways: one crud write per edit,
+each in its own session and transaction like separate requests, and the
+whole day through ``apply_operations``. Reports statements and time per
+edit for both, with ``--rtt-ms`` added per request for what the client
+waits for, at a few batch sizes to show the replay stays linear.
+
+    python -m backend.benchmarks.operations --tasks 20000 --ops 1000 --rtt-ms 80
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import migrations
+from backend.benchmarks.seed import seed
+from backend.benchmarks.write_statements import StatementCounter
+from backend.crud import sync as sync_crud, task as task_crud
+from backend.schemas import sync as schemas, task as task_schemas
+
+# (tipo, peso) de um dia de uso offline
+MIX = (("complete", 0.45), ("uncomplete", 0.10), ("update", 0.30), ("create", 0.10), ("delete", 0.05))
+
+
+def _operations(rng: random.Random, task_ids: list, n_ops: int, prefix: str) -> list:
+    """n_ops operations over the day before now, in the order they were made"""
+    started = datetime.now(timezone.utc) - timedelta(days=1)
+    ops = []
+    for i in range(n_ops):
+        kind = rng.choices([kind for kind, _ in MIX], [weight for _, weight in MIX])[0]
+        op = {"op_id": f"{prefix}-{i}", "type": kind, "timestamp": started + timedelta(seconds=i * 86400 // n_ops)}
+        if kind == "create":
+            op.update(client_id=f"{prefix}-c{i}", fields={"title": f"offline {i}"})
+        else:
+            op["task_id"] = task_ids.pop() if kind == "delete" else rng.choice(task_ids)
+            if kind == "update":
+                op["fields"] = {"title": f"edited {i}", "notes": "offline"}
+        ops.append(schemas.Operation.model_validate(op))
+    return ops
+
+
+def _one_by_one(db_factory, ops: list) -> None:
+    # Um pedido por edição: sessão e transação próprias, como os PUT/POST/DELETE do cliente
+    for op in ops:
+        db = db_factory()
+        if op.type is schemas.OperationType.CREATE:
+            task_crud.create_task(db, task_schemas.TaskCreate(**op.fields))
+        elif op.type is schemas.OperationType.UPDATE:
+            task_crud.update_task(db, op.task_id, task_schemas.TaskUpdate(**op.fields))
+        elif op.type is schemas.OperationType.COMPLETE:
+            task_crud.mark_task_completed(db, op.task_id)
+        elif op.type is schemas.OperationType.UNCOMPLETE:
+            task_crud.mark_task_incomplete(db, op.task_id)
+        else:
+            task_crud.delete_task(db, op.task_id)
+        db.close()
+
+
+def _replay(db_factory, ops: list) -> None:
+    db = db_factory()
+    sync_crud.apply_operations(db, ops)
+    db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--ops", type=int, default=1000, help="Edits in the largest batch")
+    parser.add_argument("--rtt-ms", type=float, default=80, help="Network round trip added per HTTP request")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrations.upgrade(engine)
+        task_ids = seed(engine, 20, args.tasks)["task_ids"]
+        rng.shuffle(task_ids)
+        db_factory = sessionmaker(bind=engine)
+        counter = StatementCounter(engine)
+
+        print(f"seeded {args.tasks} tasks")
+        print(f"{'edits':>6} {'path':<12}{'stmts/edit':>12}{'ms/edit':>10}{'server ms':>11}{'client ms':>11}")
+        sizes = sorted({max(1, args.ops // 10), max(1, args.ops // 2), args.ops})
+        for size in sizes:
+            for label, run, requests in (
+                ("one by one", _one_by_one, size),
+                ("replay", _replay, 1),
+            ):
+                ops = _operations(rng, task_ids, size, f"{label}-{size}")
+                counter.count = 0
+                started = time.perf_counter()
+                run(db_factory, ops)
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"{size:>6} {label:<12}{counter.count / size:>12.2f}{elapsed / size:>10.3f}"
+                      f"{elapsed:>11.1f}{elapsed + requests * args.rtt_ms:>11.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
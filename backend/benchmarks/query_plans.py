@@ -0,0 +1,94 @@
+"""Check the query plans of the hot task queries against the migrated schema.
+
+Builds a throwaway database through the migrations, seeds it, records the
+SQL each crud read emits and runs ``EXPLAIN QUERY PLAN`` on it. Exits 1 if
+any of them sorts in a temporary B-tree or scans ``tasks`` without an
+index, so an index change that silently regresses a query shows up here.
+
+    python -m backend.benchmarks.query_plans --tasks 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import migrations
+from backend.benchmarks.seed import seed
+from backend.crud import task as task_crud, sync as sync_crud
+
+
+def _queries(category_id: int):
+    today = date.today()
+    return {
+        "list": lambda db: task_crud.get_tasks(db),
+        "list (keyset)": lambda db: task_crud.get_tasks(db, after=(today, 5000)),
+        "list (pending)": lambda db: task_crud.get_tasks(db, completed=False),
+        "list (overdue_only)": lambda db: task_crud.get_tasks(db, overdue_only=True),
+        "list rows (fields)": lambda db: task_crud.get_task_rows(db, ["title", "completed"]),
+        "count (pending)": lambda db: task_crud.get_tasks_count.__wrapped__(db, completed=False),
+        "get by id": lambda db: task_crud.get_task(db, 42),
+        "by category": lambda db: task_crud.get_tasks_by_category(db, category_id),
+        "overdue": lambda db: task_crud.get_overdue_tasks.__wrapped__(db),
+        "today": lambda db: task_crud.get_today_tasks.__wrapped__(db),
+        "upcoming": lambda db: task_crud.get_upcoming_tasks.__wrapped__(db, days=14),
+        "calendar range": lambda db: task_crud.get_tasks_in_range(db, today, today + timedelta(days=30)),
+        "sync changes": lambda db: sync_crud.get_changes(db, since=100),
+    }
+
+
+def _bad_steps(plan) -> list:
+    # Ordenação fora de um índice, ou leitura da tabela inteira
+    return [
+        detail for detail in plan
+        if "USE TEMP B-TREE" in detail
+        or (detail.startswith("SCAN tasks") and "INDEX" not in detail)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--categories", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+        migrations.upgrade(engine)
+        seed(engine, args.categories, args.tasks)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, params, *rest:
+                     statements.append((statement, params)))
+
+        failures = 0
+        db = sessionmaker(bind=engine)()
+        for name, run in _queries(category_id=1).items():
+            statements.clear()
+            run(db)
+            # A primeira instrução que lê tasks é a consulta principal (joinedload e afins vêm depois)
+            statement, params = next(
+                (stmt, params) for stmt, params in statements
+                if stmt.lstrip().upper().startswith("SELECT") and "FROM tasks" in stmt
+            )
+            with engine.connect() as conn:
+                plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params)]
+            bad = _bad_steps(plan)
+            failures += bool(bad)
+            print(f"{'FAIL' if bad else 'ok':<6}{name}")
+            for detail in plan:
+                print(f"      {detail}")
+        db.close()
+        engine.dispose()
+
+    print(f"{failures} query plan(s) regressed" if failures else "all query plans use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
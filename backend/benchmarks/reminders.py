@@ -0,0 +1,75 @@
+"""Startup, memory and CPU cost of the reminder scheduler.
+
+Seeds a throwaway database, rebuilds the heap from it (one streaming
+pass), then replays task updates through the scheduler the way change
+events deliver them and measures the idle CPU of the scheduler thread.
+
+    python -m backend.benchmarks.reminders --tasks 100000 --updates 100000
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, select
+
+from backend import database, migrations, reminders
+from backend.benchmarks.seed import seed
+from backend.models import task as task_models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--idle", type=float, default=5.0, help="Seconds to measure the idle thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrations.upgrade(engine)
+        seed(engine, 20, args.tasks)
+        # O scheduler lê pela estratégia de tenancy (partilhada): aponta-a para a BD do benchmark
+        database.engine = engine
+
+        scheduler = reminders.Scheduler(reminders.QueueSink())
+        tracemalloc.start()
+        started = time.perf_counter()
+        scheduled = scheduler.rebuild()
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"rebuild   {scheduled:>8} entries  {elapsed:>6.2f}s  heap {current / 1024 / 1024:.1f} MB"
+              f"  (peak {peak / 1024 / 1024:.1f} MB)")
+
+        columns = [task_models.Task.__table__.c[name] for name in reminders.SCHEDULE_COLUMNS]
+        with engine.connect() as conn:
+            rows = [SimpleNamespace(**row._mapping) for row in conn.execute(select(*columns))]
+        rng = random.Random(3)
+        now = datetime.now()
+        started = time.perf_counter()
+        for _ in range(args.updates):
+            task = rng.choice(rows)
+            task.start_date = now.date() + timedelta(days=rng.randint(0, 60))
+            scheduler.schedule(task, now)
+        elapsed = time.perf_counter() - started
+        stats = scheduler.stats()
+        print(f"updates   {args.updates / elapsed:>8.0f}/s  scheduled {stats['scheduled']}  heap {stats['heap']}")
+
+        scheduler.start()
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        time.sleep(args.idle)
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        scheduler.stop()
+        cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+        print(f"idle      {cpu * 1000:>8.1f} ms CPU in {args.idle:.0f}s")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
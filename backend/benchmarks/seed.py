@@ -0,0 +1,96 @@
+"""Synthetic data for benchmarks.
+
+Generates a reproducible mix of categories and tasks that looks like real
+usage: mostly one-off and daily tasks, some weekly/monthly habits, dates
+spread from six months ago to two months ahead, older tasks mostly done.
+"""
+import random
+from datetime import date, time, timedelta
+
+from sqlalchemy import asc, insert, nullsfirst, select
+
+from backend.models import task as task_models, category as category_models
+
+SCHEDULE_MIX = ((None, 0.35), ("daily", 0.30), ("weekly", 0.15), ("every_other_day", 0.10), ("monthly", 0.10))
+HABIT_TYPES = (None, "health", "productivity", "learning", "social", "personal")
+UNITS = ((None, None), ("minutes", (10, 90)), ("hours", (1, 4)))
+VERBS = "read write run walk study review plan call clean cook practice drink stretch journal".split()
+OBJECTS = "book report email water guitar spanish code budget garden yoga notes invoice slides".split()
+
+BATCH_SIZE = 5000
+
+
+def _weighted(rng: random.Random, options):
+    roll, acc = rng.random(), 0.0
+    for value, weight in options:
+        acc += weight
+        if roll < acc:
+            return value
+    return options[-1][0]
+
+
+def task_row(rng: random.Random, category_ids, today: date) -> dict:
+    """One synthetic task as a column dict"""
+    start_date = today + timedelta(days=rng.randint(-180, 60))
+    timed = rng.random() < 0.6
+    start = time(rng.randint(6, 20), rng.choice((0, 15, 30, 45))) if timed else None
+    end = time(start.hour + 1, start.minute) if timed and start.hour < 23 else None
+    unit, bounds = rng.choice(UNITS)
+    return {
+        "title": f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}",
+        "description": f"{rng.choice(VERBS)} the {rng.choice(OBJECTS)} before {rng.choice(OBJECTS)}" if rng.random() < 0.5 else None,
+        "completed": start_date < today and rng.random() < 0.7,
+        "schedule_type": _weighted(rng, SCHEDULE_MIX),
+        "unit": unit,
+        "unit_value": rng.randint(*bounds) if bounds else None,
+        "start_date": start_date,
+        "start_time": start,
+        "end_time": end,
+        "all_day": not timed,
+        "habit_type": rng.choice(HABIT_TYPES),
+        "notes": f"{rng.choice(OBJECTS)} {rng.choice(OBJECTS)}" if rng.random() < 0.3 else None,
+        "category_id": rng.choice(category_ids) if category_ids and rng.random() < 0.8 else None,
+    }
+
+
+def seed(engine, n_categories: int, n_tasks: int, seed_value: int = 42) -> dict:
+    """Insert n_categories and n_tasks synthetic rows; returns the generated id ranges"""
+    rng = random.Random(seed_value)
+    today = date.today()
+
+    with engine.begin() as conn:
+        category_ids = []
+        if n_categories:
+            # Os ids vêm do RETURNING: com vários utilizadores na mesma BD não começam em 1
+            category_ids = list(conn.execute(
+                insert(category_models.Category).returning(
+                    category_models.Category.id, sort_by_parameter_order=True
+                ),
+                [{"name": f"category-{i}"} for i in range(n_categories)],
+            ).scalars())
+
+        batch = []
+        for _ in range(n_tasks):
+            batch.append(task_row(rng, category_ids, today))
+            if len(batch) == BATCH_SIZE:
+                conn.execute(insert(task_models.Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(task_models.Task), batch)
+
+    return {"category_ids": category_ids, "task_ids": list(range(1, n_tasks + 1))}
+
+
+def page_cursors(engine, page_size: int, pages: int) -> list:
+    """Cursors of the first pages of GET /tasks/ (None for the first page), read from the seeded rows"""
+    from backend.crud.task import encode_cursor
+
+    task = task_models.Task
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(task.start_date, task.id)
+            .order_by(nullsfirst(asc(task.start_date)), asc(task.id))
+            .limit(page_size * (pages - 1))
+        ).all()
+    # O cursor de uma página é a posição da última linha da anterior
+    return [None] + [encode_cursor(row) for row in rows[page_size - 1::page_size]]
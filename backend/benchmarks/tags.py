@@ -0,0 +1,122 @@
+"""Tag expression filters: posting bitmaps against one SQL subquery per tag.
+
+Seeds a throwaway database with tasks and a skewed set of tags (a few
+tags on many tasks, most on few), loads the in-memory index, then times a
+page of ``GET /tasks/`` filtered by each expression through the bitmaps
+and through the equivalent EXISTS/NOT EXISTS query, the match count from
+the bitmaps and from SQL, and the per-tag summary.
+
+    python -m backend.benchmarks.tags --tasks 100000 --tags 300
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import and_, asc, create_engine, exists, func, insert, not_, nullsfirst, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from backend import database, migrations, tags
+from backend.benchmarks.seed import seed
+from backend.crud import tag as tag_crud, task as task_crud
+from backend.models import tag as tag_models, task as task_models
+
+EXPRESSIONS = (
+    "tag-0",
+    "tag-0 AND tag-1",
+    "tag-0 AND (tag-2 OR tag-3) AND NOT tag-1",
+    "tag-5 OR tag-50 OR tag-150 OR tag-250",
+    "NOT tag-0 AND NOT tag-4",
+)
+
+
+def _p(samples, q: float) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else samples[0] * 1000
+
+
+def _time(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _sql_condition(tree, tag_ids: dict):
+    """The same expression as correlated EXISTS subqueries on task_tags"""
+    kind = tree[0]
+    if kind == "tag":
+        assignment = tag_models.TaskTag
+        return exists().where(assignment.task_id == task_models.Task.id, assignment.tag_id == tag_ids.get(tree[1], 0))
+    if kind == "not":
+        return not_(_sql_condition(tree[1], tag_ids))
+    combine = and_ if kind == "and" else or_
+    return combine(_sql_condition(tree[1], tag_ids), _sql_condition(tree[2], tag_ids))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=300)
+    parser.add_argument("--per-task", type=int, default=4, help="Maximum tags per task")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrations.upgrade(engine)
+        seed(engine, 20, args.tasks)
+        tags.install_tags(engine)
+        # O índice lê pela estratégia de tenancy (partilhada): aponta-a para a BD do benchmark
+        database.engine = engine
+
+        rng = random.Random(5)
+        weights = [1 / (rank + 1) for rank in range(args.tags)]
+        with engine.begin() as conn:
+            tag_ids = list(conn.execute(
+                insert(tag_models.Tag).returning(tag_models.Tag.id, sort_by_parameter_order=True),
+                [{"name": f"tag-{i}", "user_id": 1} for i in range(args.tags)],
+            ).scalars())
+            task_ids = list(conn.execute(select(task_models.Task.id)).scalars())
+            rows = []
+            for task_id in task_ids:
+                for tag_id in set(rng.choices(tag_ids, weights, k=rng.randint(0, args.per_task))):
+                    rows.append({"user_id": 1, "tag_id": tag_id, "task_id": task_id})
+            conn.execute(insert(tag_models.TaskTag), rows)
+        print(f"seeded    {len(task_ids):>8} tasks  {len(rows)} assignments over {args.tags} tags")
+
+        started = time.perf_counter()
+        tags.count_matching("tag-0")
+        stats = tags.indexes.stats()
+        print(f"load      {time.perf_counter() - started:>8.2f}s  {stats['bytes'] / 1024 / 1024:.1f} MB of bitmaps")
+
+        db = sessionmaker(bind=engine)()
+        table = task_models.Task.__table__
+        with engine.connect() as conn:
+            names = tags.resolve(conn, [f"tag-{i}" for i in range(args.tags)])
+        for expression in EXPRESSIONS:
+            condition = _sql_condition(tags.parse(expression), names)
+            page = (
+                select(table.c.id, table.c.title, table.c.start_date).where(table.c.user_id == 1, condition)
+                .order_by(nullsfirst(asc(table.c.start_date)), asc(table.c.id)).limit(100)
+            )
+            total = select(func.count()).select_from(table).where(table.c.user_id == 1, condition)
+            filtered = _time(lambda: task_crud.get_task_rows(db, ["title"], tags=expression), args.requests)
+            joined = _time(lambda: db.execute(page).all(), max(args.requests // 5, 2))
+            counted = _time(lambda: tags.count_matching(expression), args.requests)
+            matches, = db.execute(total).one()
+            scanned = _time(lambda: db.execute(total).one(), 2)
+            print(f"{expression[:42]:<42} {matches:>6} tasks  page p50 {_p(filtered, 50):>6.2f} ms (EXISTS only"
+                  f" {_p(joined, 50):>6.2f})  count p50 {_p(counted, 50):>5.2f} ms (SQL {_p(scanned, 50):>7.2f})")
+
+        summary = _time(lambda: tag_crud.get_summary(db, "NOT tag-0"), args.requests)
+        print(f"summary   {len(tag_ids)} tags  p50 {_p(summary, 50):>7.2f} ms  p99 {_p(summary, 99):>7.2f} ms")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
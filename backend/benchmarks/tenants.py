@@ -0,0 +1,128 @@
+"""Does adding tenants slow the existing ones down?
+
+Grows the number of tenants step by step (each with its own categories
+and tasks) and, at every step, times the same screen queries for one
+probe tenant: first page of the list, today, upcoming and the pending
+count. With ``shared`` every tenant lives in one database and the probe
+only reads its own index ranges; with ``database`` every tenant gets its
+own SQLite file behind the engine LRU. The ``churn`` column runs the
+probe queries round-robin over every tenant, so with more tenants than
+``--max-engines`` most requests first have to open a file; ``fds`` is
+the number of open file descriptors afterwards.
+
+    python -m backend.benchmarks.tenants --tenants 10 100 1000 5000 --strategy shared
+    python -m backend.benchmarks.tenants --tenants 10 100 1000 --strategy database --max-engines 64
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend import cache, database, migrations, tenancy
+from backend.benchmarks.seed import seed
+from backend.crud import task as task_crud
+
+PROBE_USER = 1
+
+
+def _screen(db: Session) -> None:
+    task_crud.get_task_rows(db, ["title", "start_date", "completed"], limit=51)
+    task_crud.get_today_tasks(db)
+    task_crud.get_upcoming_tasks(db, days=7)
+    task_crud.get_tasks_count(db, completed=False)
+
+
+def _timed(user_ids, open_session, requests: int) -> list:
+    samples = []
+    for i in range(requests):
+        with tenancy.as_user(user_ids[i % len(user_ids)]):
+            started = time.perf_counter()
+            with open_session() as db:
+                _screen(db)
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+class _Shared:
+    def __init__(self, directory: str):
+        url = f"sqlite:///{os.path.join(directory, 'shared.db')}"
+        self.engine = database.configure_engine(create_engine(url, **database.engine_options(url)), url)
+        migrations.upgrade(self.engine)
+
+    def add_tenant(self, user_id: int, categories: int, tasks: int) -> None:
+        with tenancy.as_user(user_id):
+            seed(self.engine, categories, tasks, seed_value=user_id)
+
+    def session(self) -> Session:
+        return Session(bind=self.engine, autoflush=False)
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+class _PerTenant:
+    def __init__(self, directory: str, max_engines: int):
+        self.partitioning = tenancy.DatabasePerTenant(os.path.join(directory, "tenants"), max_engines)
+
+    def add_tenant(self, user_id: int, categories: int, tasks: int) -> None:
+        with tenancy.as_user(user_id):
+            seed(self.partitioning.engine(), categories, tasks, seed_value=user_id)
+
+    def session(self) -> Session:
+        return self.partitioning.session()
+
+    def close(self) -> None:
+        self.partitioning.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--strategy", choices=("shared", "database"), default="shared")
+    parser.add_argument("--categories", type=int, default=5, help="categories per tenant")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per tenant")
+    parser.add_argument("--requests", type=int, default=300, help="probe screens timed per step")
+    parser.add_argument("--max-engines", type=int, default=tenancy.TENANT_MAX_ENGINES)
+    args = parser.parse_args()
+
+    # Sem cache: mede-se a base de dados, não o LRU de resultados
+    cache.backend = cache.NullCache()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _Shared(tmp) if args.strategy == "shared" else _PerTenant(tmp, args.max_engines)
+        print("latencies in ms per screen (4 queries)")
+        print(f"{'tenants':>8}{'rows':>10}{'probe p50':>11}{'probe p99':>11}{'churn p50':>11}{'churn p99':>11}{'fds':>6}")
+        created = 0
+        for target in sorted(args.tenants):
+            for user_id in range(created + 1, target + 1):
+                store.add_tenant(user_id, args.categories, args.tasks)
+            created = target
+
+            probe = _timed([PROBE_USER], store.session, args.requests)
+            churn = _timed(list(range(1, created + 1)), store.session, args.requests)
+            print(
+                f"{created:>8}{created * args.tasks:>10}"
+                f"{statistics.median(probe):>11.2f}{statistics.quantiles(probe, n=100)[98]:>11.2f}"
+                f"{statistics.median(churn):>11.2f}{statistics.quantiles(churn, n=100)[98]:>11.2f}"
+                f"{_fds():>6}"
+            )
+        if isinstance(store, _PerTenant):
+            stats = store.partitioning.stats()
+            print(f"engine LRU: {stats.get('opens', 0)} opens, {stats.get('evictions', 0)} evictions, "
+                  f"{stats.get('open', 0)} open (max {args.max_engines})")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
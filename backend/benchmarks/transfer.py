@@ -0,0 +1,103 @@
+"""Memory and throughput of the streaming export and the chunked import.
+
+Seeds a throwaway database, exports every task to a temporary file and
+imports that file back, sampling the process' anonymous memory (heap, not
+the SQLite mmap of the database file) while each step runs.
+
+    python -m backend.benchmarks.transfer --tasks 1000000 --format csv
+"""
+import argparse
+import os
+import resource
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import migrations, transfer
+from backend.benchmarks.seed import seed
+from backend.serialization import TASK_FIELDS
+
+
+def _rss_anon_kb() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Fora de Linux: pico do RSS total
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class PeakMemory:
+    """Sample RssAnon in a background thread; peak_mb is the growth over the starting value"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_anon_kb())
+
+    def __enter__(self):
+        self.start = self.peak = _rss_anon_kb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_anon_kb())
+
+    @property
+    def peak_mb(self) -> float:
+        return (self.peak - self.start) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--format", choices=sorted(transfer.FORMATS), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        migrations.upgrade(engine)
+        started = time.perf_counter()
+        seed(engine, 20, args.tasks)
+        print(f"seeded {args.tasks} tasks in {time.perf_counter() - started:.1f}s")
+
+        path = os.path.join(tmp, f"tasks.{args.format}")
+        fields = ["id", *[name for name in TASK_FIELDS if name != "id"]]
+        with PeakMemory() as memory, open(path, "wb") as out:
+            started = time.perf_counter()
+            chunks = transfer.export_chunks(engine, args.format, fields)
+            for chunk in transfer.gzip_chunks(chunks) if args.gzip else chunks:
+                out.write(chunk)
+            elapsed = time.perf_counter() - started
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"export  {args.tasks / elapsed:>10.0f} rows/s  {size_mb:>8.1f} MB  heap +{memory.peak_mb:.1f} MB")
+
+        db = sessionmaker(bind=engine)()
+        with PeakMemory() as memory, open(path, "rb") as upload:
+            started = time.perf_counter()
+            report = transfer.import_tasks(db, upload, args.format)
+            elapsed = time.perf_counter() - started
+        db.close()
+        print(
+            f"import  {report['imported'] / elapsed:>10.0f} rows/s  {report['failed']:>5} failed"
+            f"  heap +{memory.peak_mb:.1f} MB"
+        )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Statements and latency per write request: ORM load/mutate/refresh vs UPDATE ... RETURNING.
+
+    python -m backend.benchmarks.write_statements --ops 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import task as models
+from backend.models import category as category_models  # noqa: F401 (regista a tabela)
+from backend.crud import task as task_crud
+from backend.schemas import task as schemas
+
+
+# -------------------------------
+# Caminho antigo (SELECT + mutate + commit + refresh)
+# -------------------------------
+def legacy_mark_task_completed(db, task_id):
+    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    if not db_task:
+        return None
+    db_task.mark_completed()
+    db.commit()
+    db.refresh(db_task)
+    return db_task
+
+
+def legacy_update_task(db, task_id, task_update):
+    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    if not db_task:
+        return None
+    for key, value in task_update.model_dump(exclude_unset=True).items():
+        setattr(db_task, key, value)
+    db.commit()
+    db.refresh(db_task)
+    return db_task
+
+
+def legacy_delete_task(db, task_id):
+    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    if not db_task:
+        return False
+    db.delete(db_task)
+    db.commit()
+    return True
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def run(label, engine, counter, op, ops):
+    Session = sessionmaker(bind=engine)
+    counter.count = 0
+    started = time.perf_counter()
+    for task_id in range(1, ops + 1):
+        # Uma sessão por pedido, como o get_db
+        db = Session()
+        result = op(db, task_id)
+        # A serialização da resposta lê os atributos
+        if hasattr(result, "title"):
+            result.title, result.completed
+        db.close()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{counter.count / ops:>12.1f}{elapsed / ops * 1e6:>14.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    update = schemas.TaskUpdate(title="renamed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(insert(models.Task), [
+                {"title": f"task {i}", "completed": False, "all_day": False} for i in range(args.ops)
+            ])
+        counter = StatementCounter(engine)
+
+        print(f"{'operation':<28}{'stmts/req':>12}{'us/req':>14}")
+        run("complete (before)", engine, counter, legacy_mark_task_completed, args.ops)
+        run("complete (returning)", engine, counter, task_crud.mark_task_completed, args.ops)
+        run("update (before)", engine, counter, lambda db, i: legacy_update_task(db, i, update), args.ops)
+        run("update (returning)", engine, counter, lambda db, i: task_crud.update_task(db, i, update), args.ops)
+        run("delete (before)", engine, counter, legacy_delete_task, args.ops // 2)
+        run("delete (returning)", engine, counter,
+            lambda db, i: task_crud.delete_task(db, i + args.ops // 2), args.ops // 2)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
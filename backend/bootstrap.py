@@ -0,0 +1,257 @@
+"""One round trip for the app's first screen: ``GET /bootstrap`` and ``POST /batch``.
+
+``GET /bootstrap`` returns today's tasks, the upcoming ones, the
+categories and the task counts (total, completed, pending, overdue) in
+one response. Each query (the counts are three) runs concurrently on its
+own connection from the threadpool, so the response costs about as much
+as the slowest query rather than the sum of them.
+
+Separate connections mean separate snapshots. The queries are made to
+agree through the user's sync revision, which every task, category and
+tag write bumps. It is read before and after the sections run. If it did
+not move, no write landed in between, and every query saw that
+revision. If it moved, the queries run again, up to
+``BOOTSTRAP_RETRIES`` times. Under a steady stream of writes they then
+run one after the other in a single read transaction. The revision goes
+back to the client as the ETag basis and as ``since`` for ``GET /sync``.
+
+``POST /batch`` does the same for arbitrary GET routes. Each request
+goes through the whole app (middleware, validation, ETags) concurrently
+and comes back as status, headers and decoded body. The revision check
+reports whether they all saw the same data rather than retrying forever.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from typing import Iterable, List, Tuple
+from urllib.parse import urlsplit
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from backend import database, sync, tenancy
+from backend.crud import category as category_crud, task as task_crud
+from backend.schemas import bootstrap as schemas, category as category_schemas, task as task_schemas
+
+logger = logging.getLogger(__name__)
+
+# Novas tentativas concorrentes quando uma escrita cai a meio, antes da leitura num só snapshot
+BOOTSTRAP_RETRIES = int(os.getenv("BOOTSTRAP_RETRIES", "2"))
+BOOTSTRAP_UPCOMING_DAYS = int(os.getenv("BOOTSTRAP_UPCOMING_DAYS", "7"))
+BOOTSTRAP_UPCOMING_LIMIT = int(os.getenv("BOOTSTRAP_UPCOMING_LIMIT", "100"))
+# Novas tentativas de um POST /batch inteiro
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "1"))
+
+# Rotas que não fazem sentido dentro de um batch (recursão, streams)
+BATCH_EXCLUDED_PATHS = ("/batch", "/export", "/ws/", "/metrics")
+# Cabeçalhos do pedido exterior que não passam para os pedidos do batch
+_HOP_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"if-none-match", b"accept-encoding"}
+
+counters = Counter()
+
+
+def _plain(fn):
+    # Sem a cache (por processo): só uma leitura à base de dados entre as duas revisões prova que a viu
+    return getattr(fn, "__wrapped__", fn)
+
+
+def _tasks(tasks) -> list:
+    return [task_schemas.Task.model_validate(task) for task in tasks]
+
+
+def _today(db: Session, cached: bool = True):
+    return _tasks((task_crud.get_today_tasks if cached else _plain(task_crud.get_today_tasks))(db))
+
+
+def _upcoming(db: Session, cached: bool = True):
+    fn = task_crud.get_upcoming_tasks if cached else _plain(task_crud.get_upcoming_tasks)
+    return _tasks(fn(db, days=BOOTSTRAP_UPCOMING_DAYS, limit=BOOTSTRAP_UPCOMING_LIMIT))
+
+
+def _categories(db: Session, cached: bool = True):
+    fn = category_crud.get_categories if cached else _plain(category_crud.get_categories)
+    return [category_schemas.Category.model_validate(category) for category in fn(db)]
+
+
+def _count(**filters):
+    def query(db: Session, cached: bool = True) -> int:
+        return (task_crud.get_tasks_count if cached else _plain(task_crud.get_tasks_count))(db, **filters)
+    return query
+
+
+# Cada query corre na sua ligação; as contagens são três, para correrem lado a lado
+QUERIES = {
+    "today": _today,
+    "upcoming": _upcoming,
+    "categories": _categories,
+    "total": _count(),
+    "completed": _count(completed=True),
+    "overdue": _count(overdue_only=True),
+}
+
+SECTIONS = {
+    schemas.BootstrapSection.TODAY: ("today",),
+    schemas.BootstrapSection.UPCOMING: ("upcoming",),
+    schemas.BootstrapSection.CATEGORIES: ("categories",),
+    schemas.BootstrapSection.COUNTS: ("total", "completed", "overdue"),
+}
+
+
+def _assemble(revision: int, sections: List[schemas.BootstrapSection], results: dict) -> schemas.Bootstrap:
+    values = {}
+    for section in sections:
+        if section is schemas.BootstrapSection.COUNTS:
+            total, completed = results["total"], results["completed"]
+            values[section.value] = schemas.TaskCounts(
+                total=total, completed=completed, pending=total - completed, overdue=results["overdue"]
+            )
+        else:
+            values[section.value] = results[SECTIONS[section][0]]
+    return schemas.Bootstrap(revision=revision, **values)
+
+
+def _revision() -> int:
+    db = database.session_factory()
+    try:
+        return sync.current_revision(db)
+    finally:
+        db.close()
+
+
+def _query(name: str):
+    """One query on its own session (threadpool), straight from the database"""
+    db = database.session_factory()
+    try:
+        return QUERIES[name](db, cached=False)
+    finally:
+        db.close()
+
+
+def begin_snapshot(db: Session) -> None:
+    """Start a read transaction on db: every following query sees the same snapshot"""
+    if db.get_bind().dialect.name == "sqlite":
+        # O pysqlite só abre a transação antes de uma escrita: sem BEGIN cada SELECT vê o seu próprio estado
+        db.connection().exec_driver_sql("BEGIN")
+    else:
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+
+def _snapshot(names: List[str]) -> Tuple[int, dict]:
+    """Every query, one after the other, in a single read transaction"""
+    db = database.session_factory()
+    try:
+        begin_snapshot(db)
+        results = {name: QUERIES[name](db, cached=False) for name in names}
+        return sync.current_revision(db), results
+    finally:
+        db.close()
+
+
+async def load(sections: Iterable[schemas.BootstrapSection]) -> schemas.Bootstrap:
+    """The requested sections of the current user's bootstrap, all at one revision"""
+    sections = list(dict.fromkeys(sections))
+    names = [name for section in sections for name in SECTIONS[section]]
+    counters["loads"] += 1
+    for attempt in range(BOOTSTRAP_RETRIES + 1):
+        if attempt:
+            counters["retries"] += 1
+        before = await run_in_threadpool(_revision)
+        values = await asyncio.gather(*[run_in_threadpool(_query, name) for name in names])
+        after = await run_in_threadpool(_revision)
+        if before == after:
+            return _assemble(after, sections, dict(zip(names, values)))
+
+    # Escritas contínuas: uma só transação de leitura, sequencial mas coerente
+    counters["snapshots"] += 1
+    revision, results = await run_in_threadpool(_snapshot, names)
+    return _assemble(revision, sections, results)
+
+
+# -------------------------------
+# POST /batch
+# -------------------------------
+def _decode(headers: dict, body: bytes):
+    if not body:
+        return None
+    if headers.get("content-type", "").startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", "replace")
+
+
+async def _dispatch(app, item: schemas.BatchRequestItem, base_headers: list) -> schemas.BatchResponseItem:
+    """Run one GET through the whole ASGI app and collect its response"""
+    url = urlsplit(item.path)
+    if url.path.startswith(BATCH_EXCLUDED_PATHS):
+        return schemas.BatchResponseItem(status=400, body={"detail": f"{url.path} cannot be batched"})
+
+    headers = list(base_headers)
+    for name, value in item.headers.items():
+        key = name.lower().encode("latin-1")
+        # O utilizador é sempre o do pedido exterior
+        if key != tenancy.USER_HEADER.lower().encode("latin-1"):
+            headers.append((key, value.encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": None,
+        "server": None,
+    }
+    response = {"status": 500, "headers": {}}
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {
+                name.decode("latin-1").lower(): value.decode("latin-1") for name, value in message.get("headers", ())
+            }
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # O ServerErrorMiddleware já respondeu 500; o erro não deve derrubar os outros pedidos
+        logger.exception("Batched request %s failed", item.path)
+    headers = {name: value for name, value in response["headers"].items() if name in ("etag", "content-type")}
+    try:
+        body = _decode(response["headers"], b"".join(chunks))
+    except ValueError:
+        body = None
+    return schemas.BatchResponseItem(status=response["status"], headers=headers, body=body)
+
+
+async def batch(app, items: List[schemas.BatchRequestItem], outer_headers: Iterable[tuple]) -> schemas.BatchResponse:
+    """Run every request concurrently; retried while a write lands in the middle"""
+    base_headers = [(name, value) for name, value in outer_headers if name not in _HOP_HEADERS]
+    counters["batches"] += 1
+    for attempt in range(BATCH_RETRIES + 1):
+        if attempt:
+            counters["batch_retries"] += 1
+        before = await run_in_threadpool(_revision)
+        responses = await asyncio.gather(*[_dispatch(app, item, base_headers) for item in items])
+        after = await run_in_threadpool(_revision)
+        if before == after:
+            break
+    return schemas.BatchResponse(revision=after, consistent=before == after, responses=responses)
+
+
+def render_prometheus() -> str:
+    """Bootstrap and batch counters in the Prometheus text exposition format"""
+    lines = []
+    for name in ("loads", "retries", "snapshots", "batches", "batch_retries"):
+        lines += [f"# TYPE bootstrap_{name}_total counter", f"bootstrap_{name}_total {counters[name]}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,316 @@
+"""In-process read cache for hot crud queries.
+
+Decorated read functions (``@cached(...)``) are keyed on the function,
+its arguments (the session excluded), the current user and, for queries
+that depend on ``date.today()``, the current date - so yesterday's
+"today" list is never served after midnight and simply ages out of the
+LRU.
+
+Invalidation follows writes, not timers: the SQLAlchemy session hooks at
+the bottom collect which tables a transaction wrote to (ORM flushes and
+Core ``insert``/``update``/``delete`` run through the session alike) and
+drop every entry tagged with those tables when it commits. Tags are per
+user (``tasks:7``), so one tenant's writes never evict another tenant's
+entries. The TTL is only a safety net.
+
+Results are stored as session-free copies (ORM rows are rebuilt as
+transient instances), so a cached value never expires or lazy-loads
+under another request.
+
+The backend is pluggable through ``CACHE_BACKEND`` ("module:Class"). The
+default ``LRUCache`` lives in one process: with several uvicorn workers a
+write in one worker does not invalidate the others (they catch up within
+``CACHE_TTL_SECONDS``), so multi-worker deployments should plug in a
+shared backend implementing the same interface. ``CACHE_ENABLED=0``
+turns caching off.
+"""
+import functools
+import importlib
+import inspect
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from typing import Any, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from backend import tenancy
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# Limite total de linhas guardadas (uma lista de N tarefas conta N)
+CACHE_MAX_ROWS = int(os.getenv("CACHE_MAX_ROWS", "50000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """Storage for cached results, tagged by the tables they were read from"""
+
+    def get(self, key) -> Any:
+        """The cached value, or _MISSING"""
+        raise NotImplementedError
+
+    def set(self, key, value, tags: Tuple[str, ...], ttl: float, version) -> None:
+        """Store value unless one of its tags was invalidated since version was taken"""
+        raise NotImplementedError
+
+    def version(self, tags: Tuple[str, ...]):
+        """Opaque token that changes whenever any of tags is invalidated"""
+        raise NotImplementedError
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Drop every entry carrying one of tags"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Counters for /metrics"""
+        return {}
+
+
+class NullCache(CacheBackend):
+    """Caching disabled: every call goes to the database"""
+
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value, tags, ttl, version):
+        pass
+
+    def version(self, tags):
+        return None
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+def _cost(value) -> int:
+    return len(value) if isinstance(value, (list, tuple)) else 1
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe LRU bounded by entries and by total rows, with a TTL per entry"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_rows: int = CACHE_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.counters = Counter()
+        self._entries = OrderedDict()          # key -> (value, expires_at, tags, cost)
+        self._by_tag = {}                      # tag -> set(keys)
+        self._versions = Counter()             # tag -> nº de invalidações
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return _MISSING
+            if entry[1] < time.monotonic():
+                self._remove(key)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value, tags, ttl, version):
+        cost = _cost(value)
+        if cost > self.max_rows:
+            return
+        with self._lock:
+            # Uma escrita fez commit enquanto a consulta corria: o valor já pode estar desatualizado
+            if version != self._version(tags):
+                self.counters["stale_skips"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags, cost)
+            self._rows += cost
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def _version(self, tags):
+        return tuple(self._versions[tag] for tag in tags)
+
+    def version(self, tags):
+        with self._lock:
+            return self._version(tags)
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] += 1
+                for key in self._by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.counters["invalidations"] += 1
+
+    def _remove(self, key):
+        value, expires_at, tags, cost = self._entries.pop(key)
+        self._rows -= cost
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self._rows = 0
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries), "rows": self._rows}
+
+
+def _load_backend() -> CacheBackend:
+    if not CACHE_ENABLED:
+        return NullCache()
+    path = os.getenv("CACHE_BACKEND")
+    if not path:
+        return LRUCache()
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+backend = _load_backend()
+
+
+# -------------------------------
+# Decorador para funções de leitura do crud
+# -------------------------------
+def snapshot(value):
+    """Session-free copy of a query result: ORM rows become transient instances"""
+    if isinstance(value, list):
+        return [snapshot(item) for item in value]
+    state = sa_inspect(value, raiseerr=False)
+    if state is None or not hasattr(state, "mapper"):
+        return value
+    mapper = state.mapper
+    return mapper.class_(**{attr.key: getattr(value, attr.key) for attr in mapper.column_attrs})
+
+
+def user_tags(tables: Iterable[str]) -> Tuple[str, ...]:
+    """Invalidation tags of tables for the current user"""
+    user_id = tenancy.current_user_id()
+    return tuple(f"{table}:{user_id}" for table in tables)
+
+
+def _make_key(func, signature, args, kwargs, date_dependent: bool):
+    # O primeiro argumento é a sessão; não faz parte da chave
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = tuple(bound.arguments.items())[1:]
+    return (
+        func.__module__, func.__qualname__, tenancy.current_user_id(), arguments,
+        date.today() if date_dependent else None,
+    )
+
+
+def cached(tables: Iterable[str], date_dependent: bool = False, ttl: Optional[float] = None):
+    """Cache a crud read function; entries are dropped when a commit writes to any of tables"""
+    tables = tuple(tables)
+    ttl = CACHE_TTL_SECONDS if ttl is None else ttl
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = _make_key(func, signature, args, kwargs, date_dependent)
+                value = backend.get(key)
+                if value is not _MISSING:
+                    return snapshot(value)
+                tags = user_tags(tables)
+                version = backend.version(tags)
+                result = await func(*args, **kwargs)
+                backend.set(key, snapshot(result), tags, ttl, version)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(func, signature, args, kwargs, date_dependent)
+            value = backend.get(key)
+            if value is not _MISSING:
+                # Cópia por chamada: quem chama pode mexer nos objetos sem estragar a cache
+                return snapshot(value)
+            tags = user_tags(tables)
+            version = backend.version(tags)
+            result = func(*args, **kwargs)
+            backend.set(key, snapshot(result), tags, ttl, version)
+            return result
+        return wrapper
+    return decorator
+
+
+def render_prometheus() -> str:
+    """Cache counters in the Prometheus text exposition format"""
+    stats = backend.stats()
+    lines = []
+    for name in ("hits", "misses", "evictions", "expirations", "invalidations", "stale_skips"):
+        lines += [f"# TYPE cache_{name}_total counter", f"cache_{name}_total {stats.get(name, 0)}"]
+    for name in ("entries", "rows"):
+        lines += [f"# TYPE cache_{name} gauge", f"cache_{name} {stats.get(name, 0)}"]
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Invalidação a partir das escritas da sessão (sync e async)
+# -------------------------------
+def _written_tables(session: Session) -> set:
+    return session.info.setdefault("cache_written_tables", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    tables = _written_tables(session)
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        mapper = sa_inspect(instance).mapper
+        tables.update(table.name for table in mapper.tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    # insert()/update()/delete() executados pela sessão (RETURNING, bulk executemany)
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _written_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    tables = session.info.pop("cache_written_tables", None)
+    if not tables:
+        return
+    tags = user_tags(tables)
+    # Sessão dentro de um group commit: o commit foi só um SAVEPOINT, invalida quem fizer o commit real
+    deferred = session.info.get("cache_deferred_tables")
+    if deferred is not None:
+        deferred.update(tags)
+    else:
+        backend.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("cache_written_tables", None)
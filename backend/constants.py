@@ -0,0 +1,20 @@
+# Tamanho máximo de uma página de tarefas
+MAX_PAGE_SIZE = 500
+
+# Janela máxima (em dias) aceite pelo endpoint do calendário
+MAX_CALENDAR_WINDOW_DAYS = 366
+
+# Número máximo de itens num pedido bulk
+MAX_BULK_SIZE = 1000
+
+# Linhas lidas da BD / escritas na resposta de cada vez numa exportação
+EXPORT_BATCH_SIZE = 1000
+
+# Linhas por transação numa importação
+IMPORT_BATCH_SIZE = 1000
+
+# Erros de importação devolvidos na resposta (os restantes só são contados)
+MAX_IMPORT_ERRORS = 1000
+
+# Pedidos num POST /batch
+MAX_BATCH_REQUESTS = 20
@@ -1,13 +1,20 @@
 from sqlalchemy.orm import Session
 from backend.models import category as models
 from backend.schemas import category as schemas
+from backend import cache, events, tenancy
 
+def category_payload(category: models.Category):
+    """Lazy JSON payload of a category for change events"""
+    return lambda: schemas.Category.model_validate(category).model_dump(mode="json")
+
+@cache.cached(tables=("categories",))
 def get_categories(db: Session):
-    return db.query(models.Category).all()
+    return tenancy.owned(db.query(models.Category), models.Category).all()
 
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(**category.dict())
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    events.emit("category.created", db_category.id, category_payload(db_category))
     return db_category
@@ -0,0 +1,20 @@
+"""Async versions of backend.crud.category for use with database.get_async_db"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import category as models
+from backend.schemas import category as schemas
+from backend import cache, events, tenancy
+from backend.crud.category import category_payload
+
+@cache.cached(tables=("categories",))
+async def get_categories(db: AsyncSession):
+    result = await db.scalars(tenancy.owned(select(models.Category), models.Category))
+    return list(result)
+
+async def create_category(db: AsyncSession, category: schemas.CategoryCreate):
+    db_category = models.Category(**category.dict())
+    db.add(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    events.emit("category.created", db_category.id, category_payload(db_category))
+    return db_category
@@ -0,0 +1,34 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from typing import Optional, List
+from backend.models import task as task_models
+from backend.models import habit as models
+from backend import habits, tenancy
+
+
+def get_habit_stats(
+    db: Session,
+    task_id: Optional[int] = None,
+    habit_type: Optional[str] = None,
+    category_id: Optional[int] = None,
+) -> List[dict]:
+    """Streaks and completion rates of every recurring task, one stats row each"""
+    query = (
+        select(task_models.Task, models.HabitStats)
+        .outerjoin(models.HabitStats, models.HabitStats.task_id == task_models.Task.id)
+        .where(task_models.Task.schedule_type.isnot(None), task_models.Task.start_date.isnot(None))
+        .order_by(task_models.Task.id)
+    )
+    query = tenancy.owned(query, task_models.Task)
+    if task_id is not None:
+        query = query.where(task_models.Task.id == task_id)
+    if habit_type is not None:
+        query = query.where(task_models.Task.habit_type == habit_type)
+    if category_id is not None:
+        query = query.where(task_models.Task.category_id == category_id)
+
+    return [
+        habits.summarize(task, stats)
+        for task, stats in db.execute(query)
+        if habits.habit_rule(task) is not None
+    ]
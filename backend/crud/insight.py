@@ -0,0 +1,73 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from typing import Optional, List
+from datetime import date
+from backend.models import insight as models
+from backend.crud.time_entry import _labels, week_start
+from backend import tenancy
+
+
+def _rate(completed: int, tasks: int) -> Optional[float]:
+    return round(completed / tasks, 4) if tasks else None
+
+
+def pending_days(db: Session) -> int:
+    """Days of the current user still waiting for the refresher"""
+    return db.scalar(tenancy.owned(select(func.count()).select_from(models.InsightDirty), models.InsightDirty))
+
+
+# -------------------------------
+# Resumos (só lêem insights_daily: uma linha por dia e chave)
+# -------------------------------
+def get_summary(db: Session, period: str, dimension: str, start: date, end: date, key: Optional[str] = None) -> List[dict]:
+    """Task counts, completions and planned time per day or week and key between start and end (inclusive)"""
+    if period == "week":
+        start = week_start(start)
+
+    daily = models.InsightDaily
+    # Colunas em vez de entidades ORM: um intervalo longo por categoria são milhares de linhas
+    query = tenancy.owned(select(
+        daily.day, daily.key, daily.tasks, daily.completed, daily.planned_minutes,
+        daily.completed_minutes, daily.habit_completions,
+    ), daily).where(
+        daily.dimension == dimension,
+        daily.day >= start,
+        daily.day <= end,
+    )
+    if key is not None:
+        query = query.where(daily.key == key)
+
+    # As semanas somam os dias (no máximo MAX_CALENDAR_WINDOW_DAYS por chave)
+    totals = {}
+    for day, row_key, *values in db.execute(query):
+        bucket = (week_start(day) if period == "week" else day, row_key)
+        total = totals.get(bucket)
+        if total is None:
+            totals[bucket] = values
+        else:
+            totals[bucket] = [a + b for a, b in zip(total, values)]
+
+    labels = _labels(db, dimension, {row_key for _, row_key in totals}) if dimension == "category" else {}
+    return [
+        {
+            "period_start": period_start,
+            "key": row_key or None,
+            "label": labels.get(row_key),
+            "tasks": t[0],
+            "completed": t[1],
+            "completion_rate": _rate(t[1], t[0]),
+            "planned_minutes": t[2],
+            "completed_minutes": t[3],
+            "habit_completions": t[4],
+        }
+        for (period_start, row_key), t in sorted(totals.items())
+    ]
+
+
+def get_overdue_trend(db: Session, start: date, end: date) -> List[models.InsightOverdue]:
+    """Daily pending / overdue snapshots between start and end (inclusive)"""
+    query = tenancy.owned(select(models.InsightOverdue), models.InsightOverdue).where(
+        models.InsightOverdue.day >= start,
+        models.InsightOverdue.day <= end,
+    )
+    return db.scalars(query.order_by(models.InsightOverdue.day)).all()
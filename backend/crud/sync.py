@@ -0,0 +1,356 @@
+import os
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, asc, bindparam, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.crud import time_entry as time_crud
+from backend.crud.task import task_payload, unknown_categories
+from backend.models import task as task_models, category as category_models, sync as models
+from backend.schemas import sync as schemas, task as task_schemas
+from backend import archive, events, habits, sync, tenancy
+
+# Operações e client ids guardados para reconhecer reenvios (um cliente offline mais tempo do que isto
+# pode ver uma operação repetida aplicada outra vez)
+OPERATION_RETENTION_DAYS = int(os.getenv("SYNC_OPERATION_RETENTION_DAYS", "30"))
+
+# Chave da resposta para cada tipo de tombstone
+DELETED_KEYS = {"task": "deleted_tasks", "category": "deleted_categories"}
+
+
+def get_changes(db: Session, since: int, limit: int = 500) -> dict:
+    """Get the current user's rows changed and deleted after revision since, oldest first"""
+    # Lê a revisão primeiro: tudo o que for escrito depois fica para o próximo sync
+    upto = sync.current_revision(db)
+
+    def changed(model):
+        return tenancy.owned(db.query(model), model).filter(
+            and_(model.revision > since, model.revision <= upto)
+        ).order_by(asc(model.revision)).limit(limit + 1).all()
+
+    events = (
+        [(row.revision, "tasks", row) for row in changed(task_models.Task)]
+        + [(row.revision, "categories", row) for row in changed(category_models.Category)]
+        + [(row.revision, DELETED_KEYS[row.entity], row.entity_id) for row in changed(models.Tombstone)]
+    )
+    events.sort(key=lambda event: event[0])
+
+    has_more = len(events) > limit
+    if has_more:
+        events = events[:limit]
+        upto = events[-1][0]
+
+    changes = {"revision": upto, "has_more": has_more, "tasks": [], "categories": [],
+               "deleted_tasks": [], "deleted_categories": []}
+    for _, key, value in events:
+        changes[key].append(value)
+    return changes
+
+
+# -------------------------------
+# Operações offline
+# -------------------------------
+class _Target:
+    """A task as the batch leaves it, replayed in memory before anything is written"""
+
+    def __init__(self, values: dict, clocks: dict, created_at: datetime):
+        self.values = values
+        self.clocks = clocks
+        self.created_at = created_at
+        self.task_id: Optional[int] = values.get("id")
+        self.new = self.task_id is None  # criada pelo lote
+        self.changed = {}                # campo -> timestamp da operação que o escreveu
+        self.habit_days = {}             # dia da ocorrência -> completed (a última operação desse dia)
+        self.deleted = False
+
+    def merge(self, fields: dict, timestamp: datetime) -> List[str]:
+        """Apply the fields written at or after their clock; returns the ones a later write already beat"""
+        ignored = []
+        for field, value in fields.items():
+            # Campos nunca escritos desde a criação valem o que valiam na criação
+            if timestamp >= self.clocks.get(field, self.created_at):
+                self.values[field] = value
+                self.clocks[field] = self.changed[field] = timestamp
+            else:
+                ignored.append(field)
+        return ignored
+
+    def task(self) -> SimpleNamespace:
+        # Só para as regras dos hábitos (id e campos do horário): sem o custo de instanciar o modelo
+        return SimpleNamespace(**self.values)
+
+
+def _utc(timestamp: datetime, now: datetime) -> datetime:
+    """Naive UTC, like the clocks SQLite writes, and never after now (a device clock running ahead)"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(timestamp, now)
+
+
+def _error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc']) or 'fields'}: {err['msg']}" for err in e.errors())
+
+
+def _fields(op: schemas.Operation) -> dict:
+    """The task fields an update, complete or uncomplete writes"""
+    if op.type is schemas.OperationType.COMPLETE:
+        return {"completed": True}
+    if op.type is schemas.OperationType.UNCOMPLETE:
+        return {"completed": False}
+    # Como no PUT: só os campos enviados, e None não apaga nada
+    patch = task_schemas.TaskPatch.model_validate(op.fields).model_dump(exclude_unset=True)
+    return {field: value for field, value in patch.items() if value is not None}
+
+
+def _occurrence(target: _Target, op: schemas.Operation, timestamp: datetime) -> Optional[date]:
+    """The habit occurrence a completion refers to: op.on, else the one due when it was made"""
+    rule = habits.habit_rule(target.task())
+    if rule is None:
+        if op.on is not None:
+            raise habits.OccurrenceError("Only recurring tasks track completions per occurrence")
+        return None
+    return habits.resolve_occurrence(rule, op.on) if op.on is not None else rule.on_or_before(timestamp.date())
+
+
+def _load(db: Session, task_ids: set) -> dict:
+    """_Target per task id, with its field clocks"""
+    tasks, clocks = task_models.Task.__table__, models.FieldClock.__table__
+    if not task_ids:
+        return {}
+    targets = {
+        row.id: _Target(dict(row._mapping), {}, row.created_at or datetime.min)
+        for row in db.execute(tenancy.owned(select(tasks).where(tasks.c.id.in_(task_ids)), tasks))
+    }
+    if targets:
+        for task_id, field, updated_at in db.execute(
+            select(clocks.c.task_id, clocks.c.field, clocks.c.updated_at).where(clocks.c.task_id.in_(targets))
+        ):
+            targets[task_id].clocks[field] = updated_at
+    return targets
+
+
+def _upsert_clocks(db: Session, rows: List[dict]) -> None:
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(models.FieldClock.__table__)
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=["task_id", "field"], set_={"updated_at": stmt.excluded.updated_at}),
+        rows,
+    )
+
+
+def apply_operations(db: Session, operations: List[schemas.Operation]) -> dict:
+    """Replay a batch of offline operations in one transaction, merging each field last writer wins
+
+    Operations run in order against an in-memory copy of the tasks they
+    name, so the writes are one INSERT, one UPDATE per set of fields and
+    one DELETE, whatever the number of operations. Resent operations
+    (same op_id) and creates of a client id already created are no-ops.
+    A field is written only if the operation is at least as recent as the
+    field's last write; deletes always win.
+    """
+    tasks = task_models.Task.__table__
+    client_ids, applied = models.ClientTaskId.__table__, models.AppliedOperation.__table__
+    Status, Type = schemas.OperationStatus, schemas.OperationType
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    try:
+        done = dict(db.execute(
+            tenancy.owned(select(applied.c.op_id, applied.c.task_id), applied)
+            .where(applied.c.op_id.in_({op.op_id for op in operations}))
+        ).all())
+        mapped = dict(db.execute(
+            tenancy.owned(select(client_ids.c.client_id, client_ids.c.task_id), client_ids)
+            .where(client_ids.c.client_id.in_({op.client_id for op in operations if op.client_id}))
+        ).all())
+
+        # Tarefas arquivadas voltam para tasks antes de as operações lhes tocarem
+        pending = [op for op in operations if op.op_id not in done]
+        task_ids = {op.task_id for op in pending if op.task_id} | {
+            mapped[op.client_id] for op in pending if op.task_id is None and op.client_id in mapped
+        }
+        restored = archive.restore(db, task_ids)
+        targets = _load(db, task_ids)
+        created = {}                     # client_id -> _Target ainda por inserir
+        categories = {}                  # category_id -> se é do utilizador (uma query por id novo)
+
+        def foreign_category(values: dict) -> Optional[str]:
+            category_id = values.get("category_id")
+            if category_id is None:
+                return None
+            if category_id not in categories:
+                categories[category_id] = not unknown_categories(db, [category_id])
+            return None if categories[category_id] else f"Category with id {category_id} not found"
+
+        results, owners, first = [], [], {}
+        for op in operations:
+            result = schemas.OperationResult(op_id=op.op_id, status=Status.APPLIED, task_id=op.task_id)
+            results.append(result)
+            if op.op_id in done or op.op_id in first:
+                result.status = Status.DUPLICATE
+                result.task_id = done.get(op.op_id, result.task_id)
+                continue
+            first[op.op_id] = result
+            timestamp = _utc(op.timestamp, now)
+
+            if op.type is Type.CREATE:
+                if op.client_id in created or op.client_id in mapped:
+                    result.status = Status.DUPLICATE
+                    result.task_id = mapped.get(op.client_id)
+                    owners.append((result, created.get(op.client_id)))
+                    continue
+                try:
+                    values = task_schemas.TaskImport.model_validate(op.fields).model_dump()
+                except ValidationError as e:
+                    result.status, result.error = Status.INVALID, _error(e)
+                    continue
+                if error := foreign_category(values):
+                    result.status, result.error = Status.INVALID, error
+                    continue
+                # A criação data a tarefa: os campos valem desde o momento em que foi feita offline
+                created[op.client_id] = _Target({**values, "created_at": timestamp}, {}, timestamp)
+                owners.append((result, created[op.client_id]))
+                continue
+
+            if op.task_id is not None:
+                target = targets.get(op.task_id)
+            else:
+                target = created.get(op.client_id) or targets.get(mapped.get(op.client_id))
+                result.task_id = mapped.get(op.client_id)
+            if target is None:
+                result.status = Status.NOT_FOUND
+                continue
+            owners.append((result, target))
+            if target.deleted:
+                result.status = Status.DELETED
+                continue
+            if op.type is Type.DELETE:
+                target.deleted = True
+                continue
+
+            try:
+                fields = _fields(op)
+                day = _occurrence(target, op, timestamp) if "completed" in fields else None
+            except (ValidationError, habits.OccurrenceError) as e:
+                result.status = Status.INVALID
+                result.error = _error(e) if isinstance(e, ValidationError) else str(e)
+                continue
+            if error := foreign_category(fields):
+                result.status, result.error = Status.INVALID, error
+                continue
+            # As ocorrências de um hábito são um conjunto por dia: não competem pelo relógio de completed
+            if day is not None:
+                target.habit_days.pop(day, None)
+                target.habit_days[day] = fields["completed"]
+            result.ignored_fields = target.merge(fields, timestamp)
+            if result.ignored_fields:
+                result.status = Status.STALE if len(result.ignored_fields) == len(fields) else Status.PARTIAL
+
+        # Ids que já não existem: apagados (com tombstone) ou nunca deste utilizador
+        missing = {result.task_id for result in results if result.status is Status.NOT_FOUND and result.task_id}
+        if missing:
+            tombstones = models.Tombstone.__table__
+            gone = set(db.scalars(
+                tenancy.owned(select(tombstones.c.entity_id), tombstones)
+                .where(tombstones.c.entity == "task", tombstones.c.entity_id.in_(missing))
+            ))
+            for result in results:
+                if result.status is Status.NOT_FOUND and result.task_id in gone:
+                    result.status = Status.DELETED
+
+        # Escritas: um INSERT, um UPDATE por conjunto de campos, um DELETE
+        inserts = [target for target in created.values() if not target.deleted]
+        if inserts:
+            rows = db.execute(
+                insert(tasks).returning(*tasks.c, sort_by_parameter_order=True),
+                [target.values for target in inserts],
+            )
+            for target, row in zip(inserts, rows):
+                target.values, target.task_id = dict(row._mapping), row.id
+
+        existing = [target for target in targets.values() if not target.deleted]
+        groups = {}
+        for target in existing:
+            if target.changed:
+                groups.setdefault(tuple(sorted(target.changed)), []).append(
+                    {"_id": target.task_id, **{field: target.values[field] for field in target.changed}}
+                )
+        stmt = tenancy.owned(update(tasks).where(tasks.c.id == bindparam("_id")), tasks)
+        for params in groups.values():
+            db.execute(stmt, params)
+
+        deleted = []
+        deleted_ids = [target.task_id for target in targets.values() if target.deleted]
+        if deleted_ids:
+            deleted = list(db.scalars(
+                tenancy.owned(delete(tasks).where(tasks.c.id.in_(deleted_ids)), tasks).returning(tasks.c.id)
+            ))
+            time_crud.discard_task_entries(db, deleted)
+            habits.forget(db, deleted)
+
+        # Os triggers marcaram os campos com a hora do servidor; ficam com a da operação
+        clock_rows = [
+            {"task_id": target.task_id, "field": field, "updated_at": timestamp}
+            for target in inserts + existing for field, timestamp in target.changed.items()
+        ]
+        if clock_rows:
+            _upsert_clocks(db, clock_rows)
+
+        for target in inserts + existing:
+            task = target.task()
+            for day, completed in target.habit_days.items():
+                try:
+                    (habits.record_completion if completed else habits.record_uncompletion)(db, task, day)
+                except habits.OccurrenceError:
+                    # O horário mudou mais à frente no lote: o recompute abaixo reconstrói a história
+                    pass
+            if not target.new and habits.SCHEDULE_FIELDS & target.changed.keys():
+                habits.schedule_changed(db, task)
+
+        for result, target in owners:
+            if target is not None and target.task_id is not None:
+                result.task_id = target.task_id
+        for result in results:
+            # Repetida dentro do próprio lote: o mesmo id que a primeira
+            if result.status is Status.DUPLICATE and result.op_id in first and first[result.op_id] is not result:
+                result.task_id = first[result.op_id].task_id
+        ids = {client_id: target.task_id for client_id, target in created.items() if target.task_id is not None}
+        if ids:
+            db.execute(insert(client_ids), [
+                {"client_id": client_id, "task_id": task_id} for client_id, task_id in ids.items()
+            ])
+        logged = [result for result in results if result.status is not Status.DUPLICATE]
+        if logged:
+            db.execute(insert(applied), [
+                {"op_id": result.op_id, "status": result.status.value, "task_id": result.task_id} for result in logged
+            ])
+
+        cutoff = now - timedelta(days=OPERATION_RETENTION_DAYS)
+        db.execute(tenancy.owned(delete(applied).where(applied.c.applied_at < cutoff), applied))
+        db.execute(tenancy.owned(delete(client_ids).where(client_ids.c.created_at < cutoff), client_ids))
+
+        # Estado final de todas as tarefas tocadas, lido na mesma transação
+        touched = {target.task_id for target in inserts + existing}
+        final = [
+            task_models.Task(**row._mapping)
+            for row in db.execute(tenancy.owned(select(tasks).where(tasks.c.id.in_(touched)), tasks))
+        ] if touched else []
+        revision = sync.current_revision(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+
+    archive.announce_restored(restored)
+    new_ids = {target.task_id for target in inserts}
+    changed_ids = {target.task_id for target in existing if target.changed}
+    for task in final:
+        if task.id in new_ids:
+            events.emit("task.created", task.id, task_payload(task))
+        elif task.id in changed_ids:
+            events.emit("task.updated", task.id, task_payload(task))
+    for task_id in deleted:
+        events.emit("task.deleted", task_id)
+
+    return {"revision": revision, "results": results, "ids": ids, "tasks": final, "deleted_tasks": deleted}
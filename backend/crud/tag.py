@@ -0,0 +1,166 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, literal, true
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Optional, List
+from backend.models import tag as models, task as task_models
+from backend.schemas import tag as schemas
+from backend import archive, cache, events, sync, tags, tenancy
+
+
+def tag_payload(tag: models.Tag):
+    """Lazy JSON payload of a tag for change events"""
+    return lambda: schemas.Tag.model_validate(tag).model_dump(mode="json")
+
+
+def _commit(db: Session) -> None:
+    """Commit a tag write, bumping the revision so list ETags see it"""
+    try:
+        sync.touch(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+
+
+@cache.cached(tables=("tags",))
+def get_tags(db: Session) -> List[models.Tag]:
+    """Every tag of the current user, by name"""
+    return tenancy.owned(db.query(models.Tag), models.Tag).order_by(models.Tag.name).all()
+
+
+def get_tag(db: Session, tag_id: int) -> Optional[models.Tag]:
+    return tenancy.owned(db.query(models.Tag), models.Tag).filter(models.Tag.id == tag_id).first()
+
+
+def create_tag(db: Session, tag: schemas.TagCreate) -> models.Tag:
+    """Create a tag; raises IntegrityError if the user already has one with that name"""
+    db_tag = models.Tag(**tag.dict())
+    db.add(db_tag)
+    _commit(db)
+    db.refresh(db_tag)
+    events.emit("tag.created", db_tag.id, tag_payload(db_tag))
+    return db_tag
+
+
+def update_tag(db: Session, tag_id: int, tag_update: schemas.TagUpdate) -> Optional[models.Tag]:
+    """Rename or recolor a tag; expressions refer to tags by name, so they follow the new one"""
+    update_data = {k: v for k, v in tag_update.dict(exclude_unset=True).items() if v is not None}
+    if not update_data:
+        return get_tag(db, tag_id)
+
+    table = models.Tag.__table__
+    stmt = tenancy.owned(update(table).where(table.c.id == tag_id), table).values(**update_data).returning(*table.c)
+    try:
+        row = db.execute(stmt).first()
+    except Exception as e:
+        # Nome repetido (IntegrityError): a rota responde 409
+        db.rollback()
+        raise e
+    _commit(db)
+    if row is None:
+        return None
+    tag = models.Tag(**row._mapping)
+    events.emit("tag.updated", tag.id, tag_payload(tag))
+    return tag
+
+
+def delete_tag(db: Session, tag_id: int) -> bool:
+    """Delete a tag and (through the tags_tags_ad trigger) its assignments"""
+    table = models.Tag.__table__
+    deleted_id = db.execute(
+        tenancy.owned(delete(table).where(table.c.id == tag_id), table).returning(table.c.id)
+    ).scalar()
+    _commit(db)
+    if deleted_id is not None:
+        events.emit("tag.deleted", deleted_id)
+    return deleted_id is not None
+
+
+def _owned_ids(db: Session, entity, ids: List[int]) -> List[int]:
+    """The ids among ids that exist and belong to the current user, in ascending order"""
+    query = tenancy.owned(select(entity.id), entity).where(entity.id.in_(set(ids)))
+    return sorted(db.scalars(query))
+
+
+def assign_tags(db: Session, assignment: schemas.TagAssignment) -> dict:
+    """Add every tag to every task (already assigned pairs are left alone); unknown ids are skipped"""
+    tag_ids = _owned_ids(db, models.Tag, assignment.tag_ids)
+    # Uma escrita numa tarefa arquivada devolve-a a tasks
+    restored = archive.restore(db, assignment.task_ids) if tag_ids else []
+    task_ids = _owned_ids(db, task_models.Task, assignment.task_ids)
+    changed = 0
+    if tag_ids and task_ids:
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        table = models.TaskTag.__table__
+        pairs = (
+            # Produto cartesiano tags × tarefas, de propósito
+            select(literal(tenancy.current_user_id()), models.Tag.id, task_models.Task.id)
+            .select_from(models.Tag).join(task_models.Task, true())
+            .where(models.Tag.id.in_(tag_ids), task_models.Task.id.in_(task_ids))
+        )
+        changed = db.execute(
+            dialect.insert(table).from_select(["user_id", "tag_id", "task_id"], pairs).on_conflict_do_nothing()
+        ).rowcount
+        _commit(db)
+        archive.announce_restored(restored)
+        events.emit("tags.assigned", None, lambda: {"tag_ids": tag_ids, "task_ids": task_ids})
+    return {"tag_ids": tag_ids, "task_ids": task_ids, "changed": changed}
+
+
+def unassign_tags(db: Session, assignment: schemas.TagAssignment) -> dict:
+    """Remove every tag from every task"""
+    table = models.TaskTag.__table__
+    tag_ids = _owned_ids(db, models.Tag, assignment.tag_ids)
+    restored = archive.restore(db, assignment.task_ids) if tag_ids else []
+    task_ids = _owned_ids(db, task_models.Task, assignment.task_ids)
+    changed = 0
+    if tag_ids and task_ids:
+        changed = db.execute(
+            tenancy.owned(delete(table), table).where(table.c.tag_id.in_(tag_ids), table.c.task_id.in_(task_ids))
+        ).rowcount
+        _commit(db)
+        archive.announce_restored(restored)
+        events.emit("tags.unassigned", None, lambda: {"tag_ids": tag_ids, "task_ids": task_ids})
+    return {"tag_ids": tag_ids, "task_ids": task_ids, "changed": changed}
+
+
+def get_task_tags(db: Session, task_id: int) -> List[models.Tag]:
+    """Tags of one task, by name"""
+    query = (
+        tenancy.owned(db.query(models.Tag), models.Tag)
+        .join(models.TaskTag, models.TaskTag.tag_id == models.Tag.id)
+        .filter(models.TaskTag.task_id == task_id)
+    )
+    return query.order_by(models.Tag.name).all()
+
+
+def set_task_tags(db: Session, task_id: int, task_tags: schemas.TaskTags) -> List[models.Tag]:
+    """Replace the tags of one (existing, owned) task; unknown tag ids are skipped"""
+    table = models.TaskTag.__table__
+    tag_ids = _owned_ids(db, models.Tag, task_tags.tag_ids) if task_tags.tag_ids else []
+    restored = archive.restore(db, [task_id])
+    db.execute(tenancy.owned(delete(table), table).where(table.c.task_id == task_id))
+    if tag_ids:
+        db.execute(table.insert(), [
+            {"user_id": tenancy.current_user_id(), "tag_id": tag_id, "task_id": task_id} for tag_id in tag_ids
+        ])
+    _commit(db)
+    archive.announce_restored(restored)
+    events.emit("task.tags", task_id, lambda: {"task_id": task_id, "tag_ids": tag_ids})
+    return get_task_tags(db, task_id)
+
+
+def get_summary(db: Session, expression: Optional[str] = None) -> List[dict]:
+    """Tasks, completed tasks and completion rate per tag, optionally among the tasks matching expression"""
+    all_tags = get_tags(db)
+    counts = tags.summarize([tag.id for tag in all_tags], expression)
+    rows = []
+    for tag in all_tags:
+        total, completed = counts[tag.id]
+        rows.append({
+            "tag": tag,
+            "tasks": total,
+            "completed": completed,
+            "completion_rate": round(completed / total, 4) if total else None,
+        })
+    return rows
@@ -1,43 +1,95 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, asc
-from typing import Optional, List
+from sqlalchemy import and_, or_, desc, asc, nullsfirst, update, delete, insert, select, bindparam
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, List, Tuple
 from datetime import date, datetime
-from backend.models import task as models
+import base64
+import json
+from backend.crud import time_entry as time_crud
+from backend.models import task as models, category as category_models
 from backend.schemas import task as schemas
+from backend import archive, cache, events, habits, recurrence, search, tags as tag_index, tenancy
+
+
+def task_payload(task: models.Task):
+    """Lazy JSON payload of a task for change events"""
+    return lambda: schemas.Task.model_validate(task).model_dump(mode="json")
+
+
+class CategoryError(ValueError):
+    """The task names a category the current user does not have"""
+
+
+def unknown_categories(db: Session, category_ids) -> set:
+    """The ids among category_ids that are not categories of the current user"""
+    ids = {category_id for category_id in category_ids if category_id is not None}
+    if not ids:
+        return set()
+    table = category_models.Category.__table__
+    return ids - set(db.scalars(tenancy.owned(select(table.c.id), table).where(table.c.id.in_(ids))))
+
+
+def check_category(db: Session, category_id: Optional[int]) -> None:
+    """Raise CategoryError unless category_id is None or one of the current user's categories"""
+    # Sem foreign_keys no SQLite (e com utilizadores a partilhar tabelas) nada mais o impede
+    if unknown_categories(db, [category_id]):
+        raise CategoryError(f"Category with id {category_id} not found")
 
 
 def create_task(db: Session, task: schemas.TaskCreate) -> models.Task:
     """Create a new task"""
+    check_category(db, task.category_id)
     db_task = models.Task(**task.dict())
     db.add(db_task)
     try:
         db.commit()
         db.refresh(db_task)
+        events.emit("task.created", db_task.id, task_payload(db_task))
         return db_task
     except Exception as e:
         db.rollback()
         raise e
 
 
-def get_tasks(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def encode_cursor(task: models.Task) -> str:
+    """Encode the (start_date, id) position of a task as an opaque cursor"""
+    position = {
+        "start_date": task.start_date.isoformat() if task.start_date else None,
+        "id": task.id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[date], int]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        start_date = position["start_date"]
+        return (date.fromisoformat(start_date) if start_date else None, int(position["id"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def paginate(tasks: List[models.Task], limit: int) -> Tuple[List[models.Task], Optional[str]]:
+    """Split a limit + 1 fetch into the page and the cursor for the next one"""
+    if len(tasks) <= limit:
+        return tasks, None
+    page = tasks[:limit]
+    return page, encode_cursor(page[-1])
+
+
+def _filter_tasks(
+    query,
     completed: Optional[bool] = None,
     category_id: Optional[int] = None,
     schedule_type: Optional[str] = None,
     habit_type: Optional[str] = None,
     overdue_only: bool = False,
-    include_category: bool = False
-) -> List[models.Task]:
-    """Get tasks with optional filtering"""
-    query = db.query(models.Task)
-    
-    # Add joins if needed
-    if include_category:
-        query = query.options(joinedload(models.Task.category))
+    tags: Optional[str] = None
+):
+    """Apply the current user and the common task list filters to a query"""
+    query = tenancy.owned(query, models.Task)
     
-    # Apply filters
     if completed is not None:
         query = query.filter(models.Task.completed == completed)
     
@@ -59,20 +111,114 @@ def get_tasks(
             )
         )
     
-    # Order by creation date (newest first) and then by start_date
-    query = query.order_by(asc(models.Task.start_date))
+    # Expressão de tags (ex.: work AND NOT done), resolvida nos bitmaps de backend/tags.py
+    if tags is not None:
+        query = query.filter(tag_index.clause(tags, models.Task.id))
+    
+    return query
+
+
+def _after_cursor(query, after: Tuple[Optional[date], int]):
+    """Keep only rows that sort after the given (start_date, id) position"""
+    start_date, task_id = after
+    
+    # NULL start_date sorts first, so every dated task comes after an undated one
+    if start_date is None:
+        return query.filter(
+            or_(
+                models.Task.start_date.isnot(None),
+                and_(models.Task.start_date.is_(None), models.Task.id > task_id)
+            )
+        )
+    
+    return query.filter(
+        or_(
+            models.Task.start_date > start_date,
+            and_(models.Task.start_date == start_date, models.Task.id > task_id)
+        )
+    )
+
+
+def get_tasks(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    completed: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    schedule_type: Optional[str] = None,
+    habit_type: Optional[str] = None,
+    overdue_only: bool = False,
+    include_category: bool = False,
+    after: Optional[Tuple[Optional[date], int]] = None,
+    tags: Optional[str] = None
+) -> List[models.Task]:
+    """Get tasks with optional filtering, paginated by offset or by keyset (after)"""
+    query = db.query(models.Task)
+    
+    # Add joins if needed
+    if include_category:
+        query = query.options(joinedload(models.Task.category))
+    
+    # Apply filters
+    query = _filter_tasks(query, completed, category_id, schedule_type, habit_type, overdue_only, tags)
     
-    return query.offset(skip).limit(limit).all()
+    # Keyset pagination: seek straight to the cursor position instead of OFFSET
+    if after is not None:
+        query = _after_cursor(query, after)
+    
+    # Order by start_date, with id as a tie-breaker so the ordering is total
+    query = query.order_by(nullsfirst(asc(models.Task.start_date)), asc(models.Task.id))
+    
+    if skip:
+        query = query.offset(skip)
+    
+    return query.limit(limit).all()
+
+
+def task_rows_statement(
+    fields: List[str],
+    limit: int = 100,
+    completed: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    schedule_type: Optional[str] = None,
+    habit_type: Optional[str] = None,
+    overdue_only: bool = False,
+    after: Optional[Tuple[Optional[date], int]] = None,
+    tags: Optional[str] = None
+):
+    """Same query as get_tasks, selecting only the given columns as plain rows"""
+    table = models.Task.__table__
+    # id e start_date são sempre necessários para o cursor
+    columns = [table.c[name] for name in dict.fromkeys(["id", "start_date", *fields])]
+    
+    query = _filter_tasks(select(*columns), completed, category_id, schedule_type, habit_type, overdue_only, tags)
+    if after is not None:
+        query = _after_cursor(query, after)
+    
+    return query.order_by(nullsfirst(asc(table.c.start_date)), asc(table.c.id)).limit(limit)
+
+
+def get_task_rows(db: Session, fields: List[str], limit: int = 100, **filters) -> list:
+    """Get tasks as lightweight rows (no ORM objects) for the fast list path"""
+    return db.execute(task_rows_statement(fields, limit, **filters)).all()
+
+
+def export_statement(fields: List[str], **filters):
+    """Every task matching the list filters, as plain rows of the given columns in id order"""
+    table = models.Task.__table__
+    query = _filter_tasks(select(*[table.c[name] for name in fields]), **filters)
+    return query.order_by(asc(table.c.id))
 
 
 def get_task(db: Session, task_id: int, include_category: bool = False) -> Optional[models.Task]:
-    """Get a specific task by ID"""
+    """Get a specific task by ID (from the archive if it was archived)"""
     query = db.query(models.Task)
     
     if include_category:
         query = query.options(joinedload(models.Task.category))
     
-    return query.filter(models.Task.id == task_id).first()
+    task = tenancy.owned(query, models.Task).filter(models.Task.id == task_id).first()
+    return task if task is not None else archive.get(db, task_id)
 
 
 def get_tasks_by_category(
@@ -83,7 +229,7 @@ def get_tasks_by_category(
     completed: Optional[bool] = None
 ) -> List[models.Task]:
     """Get all tasks for a specific category"""
-    query = db.query(models.Task).filter(models.Task.category_id == category_id)
+    query = tenancy.owned(db.query(models.Task), models.Task).filter(models.Task.category_id == category_id)
     
     if completed is not None:
         query = query.filter(models.Task.completed == completed)
@@ -91,23 +237,79 @@ def get_tasks_by_category(
     return query.order_by(desc(models.Task.created_at)).offset(skip).limit(limit).all()
 
 
+@cache.cached(tables=("tasks", "tags", "task_tags"), date_dependent=True)
 def get_tasks_count(
     db: Session,
     completed: Optional[bool] = None,
-    category_id: Optional[int] = None
+    category_id: Optional[int] = None,
+    schedule_type: Optional[str] = None,
+    habit_type: Optional[str] = None,
+    overdue_only: bool = False,
+    tags: Optional[str] = None
 ) -> int:
     """Get total count of tasks with optional filtering"""
-    query = db.query(models.Task)
+    if tags is not None and category_id is None and schedule_type is None and habit_type is None and not overdue_only:
+        # Só tags (e completed): a contagem sai dos bitmaps
+        return tag_index.count_matching(tags, completed)
     
-    if completed is not None:
-        query = query.filter(models.Task.completed == completed)
-    
-    if category_id is not None:
-        query = query.filter(models.Task.category_id == category_id)
+    query = _filter_tasks(
+        db.query(models.Task), completed, category_id, schedule_type, habit_type, overdue_only, tags
+    )
     
     return query.count()
 
 
+def _task_from_row(row) -> models.Task:
+    """Build a detached Task from a RETURNING row, without touching the session"""
+    return models.Task(**row._mapping)
+
+
+def _update_returning(db: Session, task_id: int, values: dict, after=None) -> Optional[models.Task]:
+    """UPDATE ... RETURNING in a single statement, then commit; after(db, task) runs in the same transaction"""
+    table = models.Task.__table__
+    stmt = tenancy.owned(update(table).where(table.c.id == task_id), table).values(**values).returning(*table.c)
+    
+    restored = []
+    try:
+        row = db.execute(stmt).first()
+        if row is None:
+            # Tarefa arquivada: volta para tasks e a escrita repete-se lá
+            restored = archive.restore(db, [task_id])
+            row = db.execute(stmt).first() if restored else None
+        task = _task_from_row(row) if row is not None else None
+        if task is not None and after is not None:
+            after(db, task)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    
+    archive.announce_restored(restored)
+    return task
+
+
+def _habit_hook(update_data: dict, on: Optional[date] = None):
+    """Keep the habit history in step with a write that touches completion or the schedule"""
+    schedule_changed = bool(habits.SCHEDULE_FIELDS & update_data.keys())
+    if "completed" not in update_data and not schedule_changed:
+        return None
+
+    def hook(db: Session, task: models.Task) -> None:
+        if schedule_changed:
+            habits.schedule_changed(db, task)
+        if update_data.get("completed") is True:
+            habits.record_completion(db, task, on)
+        elif update_data.get("completed") is False:
+            habits.record_uncompletion(db, task, on)
+    return hook
+
+
+def _emit_updated(event_type: str, task: Optional[models.Task]) -> Optional[models.Task]:
+    if task is not None:
+        events.emit(event_type, task.id, task_payload(task))
+    return task
+
+
 def update_task(
     db: Session, 
     task_id: int, 
@@ -115,11 +317,6 @@ def update_task(
     partial: bool = True
 ) -> Optional[models.Task]:
     """Update an existing task"""
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    
-    if not db_task:
-        return None
-    
     # Get update data, excluding unset values if partial update
     if partial:
         update_data = task_update.dict(exclude_unset=True)
@@ -129,70 +326,235 @@ def update_task(
     # Remove None values to avoid overwriting with None
     update_data = {k: v for k, v in update_data.items() if v is not None}
     
-    # Apply updates
-    for key, value in update_data.items():
-        if hasattr(db_task, key):
-            setattr(db_task, key, value)
+    # Nothing to change: just return the current row
+    if not update_data:
+        return get_task(db, task_id)
+    check_category(db, update_data.get("category_id"))
+    
+    return _emit_updated(
+        "task.updated", _update_returning(db, task_id, update_data, after=_habit_hook(update_data))
+    )
+
+
+def mark_task_completed(db: Session, task_id: int, on: Optional[date] = None) -> Optional[models.Task]:
+    """Mark a task as completed (for habits: the occurrence on, default the latest one due)"""
+    values = {"completed": True}
+    return _emit_updated("task.completed", _update_returning(db, task_id, values, after=_habit_hook(values, on)))
+
+
+def mark_task_incomplete(db: Session, task_id: int, on: Optional[date] = None) -> Optional[models.Task]:
+    """Mark a task as incomplete (for habits: the occurrence on, default the latest one due)"""
+    values = {"completed": False}
+    return _emit_updated("task.uncompleted", _update_returning(db, task_id, values, after=_habit_hook(values, on)))
+
+
+def delete_task(db: Session, task_id: int) -> bool:
+    """Delete a task"""
+    table = models.Task.__table__
+    stmt = tenancy.owned(delete(table).where(table.c.id == task_id), table).returning(table.c.id)
     
     try:
+        deleted_id = db.execute(stmt).scalar()
+        if deleted_id is None and archive.restore(db, [task_id]):
+            # Arquivada: apagada a partir de tasks, para os triggers deixarem a tombstone e limparem as tags
+            deleted_id = db.execute(stmt).scalar()
+        if deleted_id is not None:
+            time_crud.discard_task_entries(db, [deleted_id])
+            habits.forget(db, [deleted_id])
         db.commit()
-        db.refresh(db_task)
-        return db_task
     except Exception as e:
         db.rollback()
         raise e
+    
+    if deleted_id is not None:
+        events.emit("task.deleted", deleted_id)
+    return deleted_id is not None
 
 
-def mark_task_completed(db: Session, task_id: int) -> Optional[models.Task]:
-    """Mark a task as completed"""
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    
-    if not db_task:
-        return None
-    
-    db_task.mark_completed()
+def _savepoint_each(db: Session, items: list, apply) -> list:
+    """Apply items one by one, each in its own SAVEPOINT, collecting (task, error) pairs"""
+    results = []
+    for item in items:
+        try:
+            with db.begin_nested():
+                results.append((apply(item), None))
+        except IntegrityError as e:
+            results.append((None, str(e.orig)))
+    db.commit()
+    return results
+
+
+def bulk_create_tasks(
+    db: Session,
+    tasks: List[schemas.TaskCreate]
+) -> List[Tuple[Optional[models.Task], Optional[str]]]:
+    """Create many tasks in one transaction; returns a (task, error) pair per input"""
+    if not tasks:
+        return []
+    
+    table = models.Task.__table__
+    unknown = unknown_categories(db, [task.category_id for task in tasks])
+    results = [
+        (None, f"Category with id {task.category_id} not found") if task.category_id in unknown else None
+        for task in tasks
+    ]
+    positions = [position for position, result in enumerate(results) if result is None]
+    rows = [tasks[position].dict() for position in positions]
+    if not rows:
+        return results
+    
+    # Caminho rápido: um INSERT multi-VALUES em lotes, um único commit
+    try:
+        result = db.execute(insert(table).returning(*table.c, sort_by_parameter_order=True), rows)
+        created = [_task_from_row(row) for row in result]
+        db.commit()
+        inserted = [(task, None) for task in created]
+    except IntegrityError:
+        db.rollback()
+        # Alguma linha falhou: repete linha a linha para isolar os erros
+        inserted = _savepoint_each(
+            db, rows, lambda row: _task_from_row(db.execute(insert(table).returning(*table.c), row).first())
+        )
     
+    for position, (task, error) in zip(positions, inserted):
+        results[position] = (task, error)
+        if task is not None:
+            events.emit("task.created", task.id, task_payload(task))
+    return results
+
+
+def insert_task_batch(db: Session, rows: List[dict]) -> List[Optional[str]]:
+    """Insert already validated task rows in one transaction; returns an error (or None) per row"""
+    if not rows:
+        return []
+
+    table = models.Task.__table__
+    unknown = unknown_categories(db, [row.get("category_id") for row in rows])
+    errors = [
+        f"Category with id {row['category_id']} not found" if row.get("category_id") in unknown else None
+        for row in rows
+    ]
+    positions = [position for position, error in enumerate(errors) if error is None]
+    valid = [rows[position] for position in positions]
+    if not valid:
+        return errors
     try:
+        # Sem RETURNING nem eventos por linha: os clientes apanham as importações pelo delta sync
+        db.execute(insert(table), valid)
         db.commit()
-        db.refresh(db_task)
-        return db_task
-    except Exception as e:
+    except IntegrityError:
         db.rollback()
-        raise e
+        outcomes = _savepoint_each(db, valid, lambda row: db.execute(insert(table), row))
+        for position, (_, error) in zip(positions, outcomes):
+            errors[position] = error
+    return errors
 
 
-def mark_task_incomplete(db: Session, task_id: int) -> Optional[models.Task]:
-    """Mark a task as incomplete"""
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    
-    if not db_task:
-        return None
-    
-    db_task.mark_incomplete()
-    
+def bulk_update_tasks(
+    db: Session,
+    updates: List[Tuple[int, schemas.TaskUpdate]]
+) -> List[Tuple[Optional[models.Task], Optional[str]]]:
+    """Update many tasks in one transaction; returns a (task, error) pair per input"""
+    if not updates:
+        return []
+    
+    table = models.Task.__table__
+    values = [
+        (task_id, {k: v for k, v in task_update.dict(exclude_unset=True).items() if v is not None})
+        for task_id, task_update in updates
+    ]
+    unknown = unknown_categories(db, [data.get("category_id") for _, data in values])
+    rejected = {
+        position: f"Category with id {data['category_id']} not found"
+        for position, (_, data) in enumerate(values) if data.get("category_id") in unknown
+    }
+    
+    # executemany exige as mesmas colunas em todas as linhas: agrupa por conjunto de campos
+    groups = {}
+    for position, (task_id, data) in enumerate(values):
+        if data and position not in rejected:
+            groups.setdefault(tuple(sorted(data)), []).append((position, {"_id": task_id, **data}))
+    
+    stmt = tenancy.owned(update(table).where(table.c.id == bindparam("_id")), table)
+    # Histórico dos hábitos: completed ou campos do agendamento, como no PUT /tasks/{id}
+    hooks = {
+        position: hook for position, (_, data) in enumerate(values)
+        if position not in rejected and (hook := _habit_hook(data))
+    }
+
+    def run_hooks(positions) -> None:
+        hooked = [position for position in positions if position in hooks]
+        if not hooked:
+            return
+        ids = {values[position][0] for position in hooked}
+        rows = {row.id: row for row in db.execute(tenancy.owned(select(table).where(table.c.id.in_(ids)), table))}
+        for position in hooked:
+            row = rows.get(values[position][0])
+            if row is not None:
+                hooks[position](db, _task_from_row(row))
+
+    def apply_one(item) -> None:
+        position, params = item
+        db.execute(stmt, params)
+        run_hooks([position])
+
+    errors = dict(rejected)
+    accepted = [task_id for position, (task_id, _) in enumerate(values) if position not in rejected]
     try:
+        restored = archive.restore(db, accepted)
+        for group in groups.values():
+            db.execute(stmt, [params for _, params in group])
+        run_hooks(sorted(hooks))
         db.commit()
-        db.refresh(db_task)
-        return db_task
-    except Exception as e:
+    except IntegrityError:
         db.rollback()
-        raise e
+        restored = archive.restore(db, accepted)
+        pending = sorted((item for group in groups.values() for item in group), key=lambda item: item[0])
+        # Cada linha e o seu histórico de hábitos no mesmo SAVEPOINT
+        outcomes = _savepoint_each(db, pending, apply_one)
+        errors.update({position: error for (position, _), (_, error) in zip(pending, outcomes) if error})
+    
+    # Lê o estado final de todas as tarefas numa só query
+    ids = list({task_id for task_id, _ in values})
+    current = {row.id: row for row in db.execute(tenancy.owned(select(table).where(table.c.id.in_(ids)), table))}
+    db.commit()
+    archive.announce_restored(restored)
+    
+    results = []
+    for position, (task_id, _) in enumerate(values):
+        row = current.get(task_id)
+        if position in errors:
+            results.append((None, errors[position]))
+        elif row is None:
+            results.append((None, f"Task with id {task_id} not found"))
+        else:
+            task = _task_from_row(row)
+            events.emit("task.updated", task.id, task_payload(task))
+            results.append((task, None))
+    return results
 
 
-def delete_task(db: Session, task_id: int) -> bool:
-    """Delete a task"""
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    
-    if not db_task:
-        return False
+def bulk_delete_tasks(db: Session, task_ids: List[int]) -> List[bool]:
+    """Delete many tasks in a single statement; returns whether each id was deleted"""
+    if not task_ids:
+        return []
     
+    table = models.Task.__table__
     try:
-        db.delete(db_task)
+        archive.restore(db, task_ids)
+        deleted = set(db.execute(
+            tenancy.owned(delete(table).where(table.c.id.in_(set(task_ids))), table).returning(table.c.id)
+        ).scalars())
+        time_crud.discard_task_entries(db, list(deleted))
+        habits.forget(db, list(deleted))
         db.commit()
-        return True
     except Exception as e:
         db.rollback()
         raise e
+    
+    for task_id in deleted:
+        events.emit("task.deleted", task_id)
+    return [task_id in deleted for task_id in task_ids]
 
 
 def search_tasks(
@@ -201,23 +563,34 @@ def search_tasks(
     skip: int = 0,
     limit: int = 100
 ) -> List[models.Task]:
-    """Search tasks by title, description, or notes"""
+    """Search tasks by title, description, or notes, best matches first"""
+    if search.fts_enabled(db.get_bind()):
+        match = search.build_match_query(search_term)
+        if match is None:
+            return []
+        
+        return db.query(models.Task).from_statement(
+            search.search_statement()
+        ).params(match=match, user_id=tenancy.current_user_id(), skip=skip, limit=limit).all()
+    
+    # Fallback sem FTS5 (ex.: PostgreSQL)
     search_pattern = f"%{search_term}%"
     
-    return db.query(models.Task).filter(
+    return tenancy.owned(db.query(models.Task), models.Task).filter(
         or_(
             models.Task.title.ilike(search_pattern),
             models.Task.description.ilike(search_pattern),
             models.Task.notes.ilike(search_pattern)
         )
-    )
+    ).order_by(asc(models.Task.id)).offset(skip).limit(limit).all()
 
 
+@cache.cached(tables=("tasks",), date_dependent=True)
 def get_overdue_tasks(db: Session, limit: int = 100) -> List[models.Task]:
     """Get all overdue tasks"""
     today = date.today()
     
-    return db.query(models.Task).filter(
+    return tenancy.owned(db.query(models.Task), models.Task).filter(
         and_(
             models.Task.start_date < today,
             models.Task.completed == False
@@ -225,15 +598,17 @@ def get_overdue_tasks(db: Session, limit: int = 100) -> List[models.Task]:
     ).order_by(asc(models.Task.start_date)).limit(limit).all()
 
 
+@cache.cached(tables=("tasks",), date_dependent=True)
 def get_today_tasks(db: Session) -> List[models.Task]:
     """Get all tasks scheduled for today"""
     today = date.today()
     
-    return db.query(models.Task).filter(
+    return tenancy.owned(db.query(models.Task), models.Task).filter(
         models.Task.start_date == today
     ).order_by(asc(models.Task.start_time)).all()
 
 
+@cache.cached(tables=("tasks",), date_dependent=True)
 def get_upcoming_tasks(db: Session, days: int = 7, limit: int = 100) -> List[models.Task]:
     """Get upcoming tasks within specified days"""
     from datetime import timedelta
@@ -241,10 +616,51 @@ def get_upcoming_tasks(db: Session, days: int = 7, limit: int = 100) -> List[mod
     today = date.today()
     future_date = today + timedelta(days=days)
     
-    return db.query(models.Task).filter(
+    return tenancy.owned(db.query(models.Task), models.Task).filter(
         and_(
             models.Task.start_date >= today,
             models.Task.start_date <= future_date,
             models.Task.completed == False
         )
-    ).order_by(asc(models.Task.start_date), asc(models.Task.start_time)).limit(limit).all()
\ No newline at end of file
+    ).order_by(asc(models.Task.start_date), asc(models.Task.start_time)).limit(limit).all()
+
+
+def get_tasks_in_range(db: Session, start: date, end: date) -> List[models.Task]:
+    """Get tasks that can have an occurrence between start and end"""
+    repeating = list(recurrence.DAY_STEPS) + list(recurrence.MONTH_STEPS) + ["custom"]
+
+    hot = tenancy.owned(db.query(models.Task), models.Task).filter(
+        and_(
+            models.Task.start_date.isnot(None),
+            models.Task.start_date <= end,
+            or_(
+                models.Task.start_date >= start,
+                models.Task.schedule_type.in_(repeating)
+            )
+        )
+    ).all()
+    # O arquivo só entra se o intervalo chegar a dias já arquivados
+    return hot + archive.in_range(db, start, end)
+
+
+def get_calendar_occurrences(db: Session, start: date, end: date) -> List[dict]:
+    """Expand recurring tasks into their occurrences between start and end"""
+    tasks = get_tasks_in_range(db, start, end)
+
+    occurrences = [
+        {
+            "task_id": task.id,
+            "date": occurrence,
+            "title": task.title,
+            "completed": task.completed,
+            "start_time": task.start_time,
+            "end_time": task.end_time,
+            "all_day": task.all_day,
+            "schedule_type": task.schedule_type,
+            "habit_type": task.habit_type,
+            "category_id": task.category_id,
+        }
+        for occurrence, task in recurrence.expand(tasks, start, end)
+    ]
+    occurrences.sort(key=lambda o: (o["date"], o["start_time"] or datetime.min.time(), o["task_id"]))
+    return occurrences
@@ -0,0 +1,208 @@
+"""Async versions of backend.crud.task for use with database.get_async_db"""
+import asyncio
+from sqlalchemy import select, func, and_, asc, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+from datetime import date, timedelta
+from backend.models import task as models
+from backend.schemas import task as schemas
+from backend.crud import task as task_crud, time_entry as time_crud
+from backend.crud.task import _filter_tasks, _emit_updated, _habit_hook, task_payload
+from backend import archive, cache, events, habits, tags as tag_index, tenancy
+
+
+async def create_task(db: AsyncSession, task: schemas.TaskCreate) -> models.Task:
+    """Create a new task"""
+    await db.run_sync(task_crud.check_category, task.category_id)
+    db_task = models.Task(**task.dict())
+    db.add(db_task)
+    try:
+        await db.commit()
+        await db.refresh(db_task)
+        events.emit("task.created", db_task.id, task_payload(db_task))
+        return db_task
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+
+async def _off_loop(build, *args, **filters):
+    """Build a statement; with a tag filter (may load the tag index) in a worker thread"""
+    if filters.get("tags") is not None:
+        return await asyncio.to_thread(build, *args, **filters)
+    return build(*args, **filters)
+
+
+async def get_task_rows(db: AsyncSession, fields: List[str], limit: int = 100, **filters) -> list:
+    """Get tasks as lightweight rows (no ORM objects) for the fast list path"""
+    result = await db.execute(await _off_loop(task_crud.task_rows_statement, fields, limit, **filters))
+    return result.all()
+
+
+async def get_task(db: AsyncSession, task_id: int) -> Optional[models.Task]:
+    """Get a specific task by ID (from the archive if it was archived)"""
+    result = await db.scalars(tenancy.owned(select(models.Task).where(models.Task.id == task_id), models.Task))
+    task = result.first()
+    return task if task is not None else await db.run_sync(archive.get, task_id)
+
+
+@cache.cached(tables=("tasks", "tags", "task_tags"), date_dependent=True)
+async def get_tasks_count(
+    db: AsyncSession,
+    completed: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    schedule_type: Optional[str] = None,
+    habit_type: Optional[str] = None,
+    overdue_only: bool = False,
+    tags: Optional[str] = None
+) -> int:
+    """Get total count of tasks with optional filtering"""
+    if tags is not None and category_id is None and schedule_type is None and habit_type is None and not overdue_only:
+        return await asyncio.to_thread(tag_index.count_matching, tags, completed)
+
+    query = await _off_loop(
+        _filter_tasks, select(func.count(models.Task.id)), completed, category_id, schedule_type, habit_type,
+        overdue_only, tags=tags
+    )
+
+    return await db.scalar(query)
+
+
+async def _update_returning(db: AsyncSession, task_id: int, values: dict, after=None) -> Optional[models.Task]:
+    """UPDATE ... RETURNING in a single statement, then commit; after(session, task) runs in the same transaction"""
+    table = models.Task.__table__
+    stmt = tenancy.owned(update(table).where(table.c.id == task_id), table).values(**values).returning(*table.c)
+
+    restored = []
+    try:
+        row = (await db.execute(stmt)).first()
+        if row is None:
+            restored = await db.run_sync(archive.restore, [task_id])
+            row = (await db.execute(stmt)).first() if restored else None
+        task = task_crud._task_from_row(row) if row is not None else None
+        if task is not None and after is not None:
+            await db.run_sync(after, task)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+    archive.announce_restored(restored)
+    return task
+
+
+async def update_task(
+    db: AsyncSession,
+    task_id: int,
+    task_update: schemas.TaskUpdate,
+    partial: bool = True
+) -> Optional[models.Task]:
+    """Update an existing task"""
+    update_data = task_update.dict(exclude_unset=partial)
+    update_data = {k: v for k, v in update_data.items() if v is not None}
+
+    if not update_data:
+        return await get_task(db, task_id)
+    await db.run_sync(task_crud.check_category, update_data.get("category_id"))
+
+    return _emit_updated(
+        "task.updated", await _update_returning(db, task_id, update_data, after=_habit_hook(update_data))
+    )
+
+
+async def mark_task_completed(db: AsyncSession, task_id: int, on: Optional[date] = None) -> Optional[models.Task]:
+    """Mark a task as completed (for habits: the occurrence on, default the latest one due)"""
+    values = {"completed": True}
+    return _emit_updated(
+        "task.completed", await _update_returning(db, task_id, values, after=_habit_hook(values, on))
+    )
+
+
+async def mark_task_incomplete(db: AsyncSession, task_id: int, on: Optional[date] = None) -> Optional[models.Task]:
+    """Mark a task as incomplete (for habits: the occurrence on, default the latest one due)"""
+    values = {"completed": False}
+    return _emit_updated(
+        "task.uncompleted", await _update_returning(db, task_id, values, after=_habit_hook(values, on))
+    )
+
+
+async def delete_task(db: AsyncSession, task_id: int) -> bool:
+    """Delete a task"""
+    table = models.Task.__table__
+    stmt = tenancy.owned(delete(table).where(table.c.id == task_id), table).returning(table.c.id)
+
+    try:
+        deleted_id = (await db.execute(stmt)).scalar()
+        if deleted_id is None and await db.run_sync(archive.restore, [task_id]):
+            deleted_id = (await db.execute(stmt)).scalar()
+        if deleted_id is not None:
+            await db.run_sync(time_crud.discard_task_entries, [deleted_id])
+            await db.run_sync(habits.forget, [deleted_id])
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+    if deleted_id is not None:
+        events.emit("task.deleted", deleted_id)
+    return deleted_id is not None
+
+
+async def search_tasks(
+    db: AsyncSession,
+    search_term: str,
+    skip: int = 0,
+    limit: int = 100
+) -> List[models.Task]:
+    """Search tasks by title, description, or notes, best matches first"""
+    # A pesquisa reutiliza o caminho síncrono (FTS5 ou ILIKE) dentro da greenlet do AsyncSession
+    return await db.run_sync(
+        lambda session: task_crud.search_tasks(session, search_term, skip=skip, limit=limit)
+    )
+
+
+@cache.cached(tables=("tasks",), date_dependent=True)
+async def get_overdue_tasks(db: AsyncSession, limit: int = 100) -> List[models.Task]:
+    """Get all overdue tasks"""
+    today = date.today()
+
+    result = await db.scalars(
+        tenancy.owned(select(models.Task), models.Task).where(
+            and_(
+                models.Task.start_date < today,
+                models.Task.completed == False
+            )
+        ).order_by(asc(models.Task.start_date)).limit(limit)
+    )
+    return list(result)
+
+
+@cache.cached(tables=("tasks",), date_dependent=True)
+async def get_today_tasks(db: AsyncSession) -> List[models.Task]:
+    """Get all tasks scheduled for today"""
+    today = date.today()
+
+    result = await db.scalars(
+        tenancy.owned(select(models.Task), models.Task).where(
+            models.Task.start_date == today
+        ).order_by(asc(models.Task.start_time))
+    )
+    return list(result)
+
+
+@cache.cached(tables=("tasks",), date_dependent=True)
+async def get_upcoming_tasks(db: AsyncSession, days: int = 7, limit: int = 100) -> List[models.Task]:
+    """Get upcoming tasks within specified days"""
+    today = date.today()
+    future_date = today + timedelta(days=days)
+
+    result = await db.scalars(
+        tenancy.owned(select(models.Task), models.Task).where(
+            and_(
+                models.Task.start_date >= today,
+                models.Task.start_date <= future_date,
+                models.Task.completed == False
+            )
+        ).order_by(asc(models.Task.start_date), asc(models.Task.start_time)).limit(limit)
+    )
+    return list(result)
@@ -0,0 +1,269 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Optional, List
+from datetime import date, datetime, timedelta
+from backend.models import task as task_models, category as category_models
+from backend.models import time_entry as models
+from backend.schemas import time_entry as schemas
+from backend import archive, events, tenancy
+
+
+def entry_payload(entry: models.TimeEntry):
+    """Lazy JSON payload of a time entry for change events"""
+    return lambda: schemas.TimeEntry.model_validate(entry).model_dump(mode="json")
+
+
+def planned_minutes(task: task_models.Task) -> int:
+    """Planned time of one occurrence: the start/end span, else unit_value in minutes or hours"""
+    if task.duration_minutes:
+        return task.duration_minutes
+    if task.unit_value and task.unit == "minutes":
+        return task.unit_value
+    if task.unit_value and task.unit == "hours":
+        return task.unit_value * 60
+    return 0
+
+
+def week_start(day: date) -> date:
+    """Monday of the ISO week containing day"""
+    return day - timedelta(days=day.weekday())
+
+
+# -------------------------------
+# Rollups (mantidas na mesma transação que a escrita da entrada)
+# -------------------------------
+def _upsert(db: Session, period: str, period_start: date, dimension: str, key: str,
+            planned: int, seconds: int, quantity: float, entries: int):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = models.TimeRollup.__table__
+    stmt = dialect.insert(table).values(
+        user_id=tenancy.current_user_id(), period=period, period_start=period_start, dimension=dimension, key=key,
+        planned_minutes=planned, actual_seconds=seconds, quantity=quantity, entries=entries,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "period", "dimension", "period_start", "key"],
+        set_={
+            "planned_minutes": table.c.planned_minutes + stmt.excluded.planned_minutes,
+            "actual_seconds": table.c.actual_seconds + stmt.excluded.actual_seconds,
+            "quantity": table.c.quantity + stmt.excluded.quantity,
+            "entries": table.c.entries + stmt.excluded.entries,
+        },
+    ).returning(table.c.entries, table.c.planned_minutes)
+    return db.execute(stmt).one()
+
+
+def _apply_rollups(db: Session, entry: models.TimeEntry, sign: int, task: Optional[task_models.Task]) -> None:
+    day = entry.started_at.date()
+    seconds = sign * (entry.duration_seconds or 0)
+    quantity = sign * (entry.quantity or 0)
+    buckets = [
+        ("task", str(entry.task_id)),
+        ("category", str(entry.category_id) if entry.category_id else ""),
+        ("habit_type", entry.habit_type or ""),
+    ]
+
+    # A linha task/dia diz se esta é a primeira (ou última) entrada da task nesse dia:
+    # o planeado da ocorrência conta uma vez por task e por dia em que houve registo
+    entries, applied = _upsert(db, "day", day, "task", buckets[0][1], 0, seconds, quantity, sign)
+    planned = 0
+    if sign > 0 and entries == 1 and task is not None:
+        planned = planned_minutes(task)
+    elif sign < 0 and entries == 0:
+        planned = -applied
+    if planned:
+        _upsert(db, "day", day, "task", buckets[0][1], planned, 0, 0, 0)
+
+    _upsert(db, "week", week_start(day), "task", buckets[0][1], planned, seconds, quantity, sign)
+    for dimension, key in buckets[1:]:
+        for period, period_start in (("day", day), ("week", week_start(day))):
+            _upsert(db, period, period_start, dimension, key, planned, seconds, quantity, sign)
+
+
+# -------------------------------
+# Entradas
+# -------------------------------
+def _new_entry(task: task_models.Task, started_at: datetime, **values) -> models.TimeEntry:
+    return models.TimeEntry(
+        task_id=task.id,
+        started_at=started_at,
+        category_id=task.category_id,
+        habit_type=task.habit_type,
+        **values,
+    )
+
+
+def get_entry(db: Session, entry_id: int) -> Optional[models.TimeEntry]:
+    """Get a time entry by ID"""
+    return db.scalars(
+        tenancy.owned(select(models.TimeEntry).where(models.TimeEntry.id == entry_id), models.TimeEntry)
+    ).first()
+
+
+def get_running_entry(db: Session, task_id: int) -> Optional[models.TimeEntry]:
+    """The task's running timer, if any"""
+    return db.scalars(
+        tenancy.owned(select(models.TimeEntry), models.TimeEntry).where(
+            models.TimeEntry.task_id == task_id,
+            models.TimeEntry.ended_at.is_(None),
+        )
+    ).first()
+
+
+def get_task_entries(db: Session, task_id: int, skip: int = 0, limit: int = 100) -> List[models.TimeEntry]:
+    """Time entries of a task, newest first"""
+    return db.scalars(
+        tenancy.owned(select(models.TimeEntry), models.TimeEntry)
+        .where(models.TimeEntry.task_id == task_id)
+        .order_by(models.TimeEntry.started_at.desc(), models.TimeEntry.id.desc())
+        .offset(skip).limit(limit)
+    ).all()
+
+
+def start_timer(db: Session, task: task_models.Task) -> models.TimeEntry:
+    """Start a timer on a task; raises IntegrityError if one is already running"""
+    entry = _new_entry(task, datetime.now())
+    db.add(entry)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(entry)
+    events.emit("time_entry.started", entry.id, entry_payload(entry))
+    return entry
+
+
+def stop_timer(db: Session, task: task_models.Task, stop: schemas.TimerStop) -> Optional[models.TimeEntry]:
+    """Stop the task's running timer and add it to the rollups"""
+    entry = get_running_entry(db, task.id)
+    if entry is None:
+        return None
+
+    entry.ended_at = max(datetime.now(), entry.started_at)
+    entry.duration_seconds = round((entry.ended_at - entry.started_at).total_seconds())
+    entry.quantity = stop.quantity
+    try:
+        db.flush()
+        _apply_rollups(db, entry, 1, task)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(entry)
+    events.emit("time_entry.stopped", entry.id, entry_payload(entry))
+    return entry
+
+
+def log_time(db: Session, task: task_models.Task, log: schemas.TimeEntryLog) -> models.TimeEntry:
+    """Record a finished block of time and add it to the rollups"""
+    if log.started_at and log.ended_at:
+        started_at, ended_at = log.started_at, log.ended_at
+    else:
+        duration = timedelta(minutes=log.duration_minutes or 0)
+        if log.started_at:
+            started_at, ended_at = log.started_at, log.started_at + duration
+        else:
+            ended_at = log.ended_at or datetime.now()
+            started_at = ended_at - duration
+
+    entry = _new_entry(
+        task,
+        started_at,
+        ended_at=ended_at,
+        duration_seconds=round((ended_at - started_at).total_seconds()),
+        quantity=log.quantity,
+    )
+    db.add(entry)
+    try:
+        db.flush()
+        _apply_rollups(db, entry, 1, task)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(entry)
+    events.emit("time_entry.created", entry.id, entry_payload(entry))
+    return entry
+
+
+def delete_entry(db: Session, entry_id: int) -> bool:
+    """Delete a time entry and take it back out of the rollups"""
+    entry = get_entry(db, entry_id)
+    if entry is None:
+        return False
+    try:
+        if not entry.running:
+            _apply_rollups(db, entry, -1, None)
+        db.delete(entry)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    events.emit("time_entry.deleted", entry_id)
+    return True
+
+
+def discard_task_entries(db: Session, task_ids: List[int]) -> None:
+    """Remove the entries of deleted tasks, taking the finished ones back out of the rollups; the caller commits"""
+    # Sem PRAGMA foreign_keys o ON DELETE CASCADE não corre; as de tarefas arquivadas ficam (não passam por aqui)
+    if not task_ids:
+        return
+    owned = tenancy.owned(select(models.TimeEntry).where(models.TimeEntry.task_id.in_(task_ids)), models.TimeEntry)
+    for entry in db.scalars(owned):
+        if not entry.running:
+            _apply_rollups(db, entry, -1, None)
+    table = models.TimeEntry.__table__
+    db.execute(tenancy.owned(delete(table).where(table.c.task_id.in_(task_ids)), table))
+
+
+# -------------------------------
+# Resumos (só lêem rollups: uma linha por período e chave)
+# -------------------------------
+def _labels(db: Session, dimension: str, keys) -> dict:
+    if dimension == "habit_type":
+        return {}
+    ids = [int(key) for key in keys if key]
+    if not ids:
+        return {}
+    model, column = (
+        (task_models.Task, task_models.Task.title) if dimension == "task"
+        else (category_models.Category, category_models.Category.name)
+    )
+    query = tenancy.owned(select(model.id, column).where(model.id.in_(ids)), model)
+    labels = dict(db.execute(query).all())
+    if dimension == "task" and len(labels) < len(set(ids)):
+        # O tempo registado em tarefas arquivadas continua nos resumos
+        labels.update(archive.titles(db, set(ids) - labels.keys()))
+    return {str(row_id): label for row_id, label in labels.items()}
+
+
+def get_summary(db: Session, period: str, dimension: str, start: date, end: date, key: Optional[str] = None) -> List[dict]:
+    """Planned vs actual time per period and key between start and end (inclusive)"""
+    if period == "week":
+        start = week_start(start)
+
+    query = tenancy.owned(select(models.TimeRollup), models.TimeRollup).where(
+        models.TimeRollup.period == period,
+        models.TimeRollup.dimension == dimension,
+        models.TimeRollup.period_start >= start,
+        models.TimeRollup.period_start <= end,
+        models.TimeRollup.entries > 0,
+    )
+    if key is not None:
+        query = query.where(models.TimeRollup.key == key)
+    rollups = db.scalars(query.order_by(models.TimeRollup.period_start, models.TimeRollup.key)).all()
+
+    labels = _labels(db, dimension, {rollup.key for rollup in rollups})
+    return [
+        {
+            "period_start": rollup.period_start,
+            "key": rollup.key or None,
+            "label": labels.get(rollup.key),
+            "planned_minutes": rollup.planned_minutes,
+            "actual_minutes": round(rollup.actual_seconds / 60, 2),
+            "quantity": rollup.quantity,
+            "entries": rollup.entries,
+        }
+        for rollup in rollups
+    ]
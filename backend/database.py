@@ -1,18 +1,122 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./tasks.db"  # ou PostgreSQL se quiseres
+# -------------------------------
+# Configuração (variáveis de ambiente)
+# -------------------------------
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tasks.db")  # ou PostgreSQL se quiseres
+
+# Camada async opcional (aiosqlite / asyncpg)
+ASYNC_DB = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# Pool de ligações
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# PRAGMAs aplicados a cada ligação SQLite
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),  # negativo = KiB (64 MB)
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory(url: str) -> bool:
+    return url.rstrip("/").endswith(":memory:") or url.rstrip("/") in ("sqlite:", "sqlite+aiosqlite:")
+
+
+def async_url(url: str) -> str:
+    """Map a sync database URL to its async driver"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Set the configured PRAGMAs on a new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine / create_async_engine"""
+    options = {"pool_pre_ping": not is_sqlite(url)}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory(url):
+            return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def configure_engine(engine, url: str):
+    """Attach per-connection setup (PRAGMAs) to an engine"""
+    if is_sqlite(url):
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+
+engine = configure_engine(
+    create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL)),
+    SQLALCHEMY_DATABASE_URL,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Fábricas usadas pelas dependências; backend.tenancy troca-as pela estratégia de particionamento
+session_factory = SessionLocal
+async_session_factory = None
+
 # Dependency
 def get_db():
-    db = SessionLocal()
+    db = session_factory()
     try:
         yield db
     finally:
         db.close()
+
+
+# -------------------------------
+# Engine async (só é criado se DB_ASYNC estiver ativo)
+# -------------------------------
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(SQLALCHEMY_DATABASE_URL))
+
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+    configure_engine(async_engine.sync_engine, ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+
+# Dependency (async)
+async def get_async_db():
+    async with (async_session_factory or AsyncSessionLocal)() as db:
+        yield db
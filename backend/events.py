@@ -0,0 +1,206 @@
+"""Live task/category change events pushed to WebSocket clients.
+
+The crud write functions call ``emit``; the event goes through a broker
+to every worker's ``Hub``, which fans it out to its connected sockets.
+Each connection has a bounded queue: a client that falls behind by more
+than ``WS_QUEUE_SIZE`` events is dropped instead of slowing everyone else
+down (it should reconnect and catch up with ``GET /sync``). Events carry
+the owner's ``user_id`` and a connection only receives its own user's.
+
+The broker is pluggable through ``EVENTS_BROKER`` ("module:Class"). The
+default ``InMemoryBroker`` only reaches hubs in the same process; a
+shared broker (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) implements the
+same two methods to fan out across uvicorn workers.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from backend import tenancy
+
+logger = logging.getLogger(__name__)
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+
+
+class Broker:
+    """Transport between emitters and hubs"""
+
+    def publish(self, event: str) -> None:
+        """Send an already-encoded JSON event to every subscribed hub, in this process or others"""
+        raise NotImplementedError
+
+    def subscribe(self, hub: "Hub") -> None:
+        """Deliver every published event to hub.receive (from any thread)"""
+        raise NotImplementedError
+
+    @property
+    def has_subscribers(self) -> bool:
+        """Whether building an event is worth it; shared brokers can't know, so True"""
+        return True
+
+
+class InMemoryBroker(Broker):
+    """Delivers events to the hubs of this process (also a stand-in for a shared broker in tests)"""
+
+    def __init__(self):
+        self._hubs = []
+
+    def publish(self, event: str) -> None:
+        for hub in list(self._hubs):
+            hub.receive(event)
+
+    def subscribe(self, hub: "Hub") -> None:
+        self._hubs.append(hub)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return any(hub.connection_count for hub in self._hubs)
+
+
+class Subscription:
+    """One connected client: a bounded queue of pending events"""
+
+    def __init__(self, maxsize: int, user_id: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def offer(self, event: str) -> bool:
+        """Queue an event; returns False (and marks the subscription dropped) if the queue is full"""
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            # Esvazia a fila e deixa só o sinal de fim para o sender fechar a ligação
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+
+class Hub:
+    """Per-process fan-out of broker events to WebSocket subscriptions"""
+
+    def __init__(self, broker: Broker, queue_size: int = WS_QUEUE_SIZE):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscriptions = {}               # user_id -> set(Subscription)
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        broker.subscribe(self)
+
+    @property
+    def connection_count(self) -> int:
+        return self._count
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Register a new connection for user_id's events; must be called from the event loop"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self.queue_size, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._count -= 1
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def receive(self, event: str) -> None:
+        """Broker callback: may run on any thread, so hop onto the event loop"""
+        if not self._subscriptions or self._loop is None or self._loop.is_closed():
+            return
+        user_id = json.loads(event).get("user_id")
+        if user_id not in self._subscriptions:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(user_id, event)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, user_id, event)
+        except RuntimeError:
+            # O loop fechou entretanto (shutdown)
+            pass
+
+    def _deliver(self, user_id: int, event: str) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            if not subscription.offer(event):
+                logger.warning("Dropping slow WebSocket consumer")
+                self.unsubscribe(subscription)
+
+
+def _load_broker() -> Broker:
+    path = os.getenv("EVENTS_BROKER")
+    if not path:
+        return InMemoryBroker()
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+broker = _load_broker()
+hub = Hub(broker)
+
+
+# Eventos retidos até a escrita ficar durável (ver backend/write_queue.py)
+_deferred: ContextVar[Optional[list]] = ContextVar("deferred_events", default=None)
+
+
+@contextmanager
+def deferred(pending: list):
+    """Hold the events emitted inside the block in pending instead of publishing them"""
+    token = _deferred.set(pending)
+    try:
+        yield pending
+    finally:
+        _deferred.reset(token)
+
+
+def publish_deferred(pending: list) -> None:
+    """Publish events held by deferred, in the order they were emitted"""
+    for event_type, entity_id, payload, user_id in pending:
+        emit(event_type, entity_id, payload, user_id)
+
+
+def emit(
+    event_type: str, entity_id: Optional[int], payload: Optional[Callable[[], dict]] = None, user_id: Optional[int] = None
+) -> None:
+    """Publish a change event of user_id (default the current user); payload is only built if someone is listening"""
+    if user_id is None:
+        user_id = tenancy.current_user_id()
+    pending = _deferred.get()
+    if pending is not None:
+        pending.append((event_type, entity_id, payload, user_id))
+        return
+    if not broker.has_subscribers:
+        return
+    event = {"user_id": user_id, "type": event_type, "id": entity_id}
+    if payload is not None:
+        event["data"] = payload()
+    try:
+        # Serializado uma só vez, independentemente do número de ligações
+        broker.publish(json.dumps(event))
+    except Exception:
+        # Uma falha no broker nunca deve falhar a escrita que já foi feita
+        logger.exception("Failed to publish %s event", event_type)
@@ -0,0 +1,295 @@
+"""Streaks and completion rates for habits (recurring tasks).
+
+Completing or uncompleting a recurring task records which occurrence it
+was in ``habit_completions`` and, in the same transaction, updates the
+habit's single ``habit_stats`` row:
+
+* the most recent streak (first and last occurrence, length) and the
+  longest streak so far;
+* a bitmask of completions over the last ``RECENT_DAYS`` days, from
+  which the rolling 7/30-day completion rates are read;
+* the total number of completions.
+
+The usual writes - completing the next occurrence or undoing the last
+one - touch a constant number of rows. Anything that can reshape older
+streaks (backfilling a gap, undoing the middle of a streak, changing the
+schedule) falls back to ``recompute``, which replays that habit's
+history. Rebuild every habit, e.g. after importing history, with:
+
+    python -m backend.habits recompute
+"""
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from backend import recurrence
+from backend.models import habit as models
+
+# Dias cobertos pela máscara de conclusões recentes (cabe num inteiro de 64 bits com sinal)
+RECENT_DAYS = 62
+RECENT_MASK = (1 << RECENT_DAYS) - 1
+
+# Janelas (em dias) das taxas de conclusão
+RATE_WINDOWS = (7, 30)
+
+# Campos da task que definem as ocorrências: mudá-los obriga a recalcular
+SCHEDULE_FIELDS = frozenset({"start_date", "schedule_type", "unit", "unit_value"})
+
+
+class OccurrenceError(ValueError):
+    """The requested day is not a completable occurrence of the habit"""
+
+
+def habit_rule(task) -> Optional[recurrence.RecurrenceRule]:
+    """The task's recurrence rule, or None if the task is not a habit (does not repeat)"""
+    rule = recurrence.task_rule(task)
+    return rule if rule is not None and rule.repeats else None
+
+
+def resolve_occurrence(rule: recurrence.RecurrenceRule, on: Optional[date]) -> Optional[date]:
+    """The occurrence a completion refers to: on if given, else the latest one due (None if none is)"""
+    today = date.today()
+    if on is None:
+        return rule.on_or_before(today)
+    if on > today:
+        raise OccurrenceError("Cannot complete a future occurrence")
+    if not rule.is_occurrence(on):
+        raise OccurrenceError(f"{on.isoformat()} is not an occurrence of this habit")
+    return on
+
+
+# -------------------------------
+# Estado incremental
+# -------------------------------
+def _get_stats(db: Session, task_id: int) -> models.HabitStats:
+    stats = db.get(models.HabitStats, task_id)
+    if stats is None:
+        stats = models.HabitStats(
+            task_id=task_id, current_streak=0, longest_streak=0, recent_mask=0, total_completions=0
+        )
+        db.add(stats)
+    return stats
+
+
+def _mark_recent(stats: models.HabitStats, day: date, completed: bool) -> None:
+    if stats.recent_anchor is None or day > stats.recent_anchor:
+        shift = (day - stats.recent_anchor).days if stats.recent_anchor else RECENT_DAYS
+        stats.recent_mask = (stats.recent_mask << shift) & RECENT_MASK if shift < RECENT_DAYS else 0
+        stats.recent_anchor = day
+
+    offset = (stats.recent_anchor - day).days
+    if offset < RECENT_DAYS:
+        bit = 1 << offset
+        stats.recent_mask = stats.recent_mask | bit if completed else stats.recent_mask & ~bit
+
+
+def _is_completed(db: Session, task_id: int, day: Optional[date]) -> bool:
+    if day is None:
+        return False
+    return db.scalar(
+        select(models.HabitCompletion.id).where(
+            models.HabitCompletion.task_id == task_id,
+            models.HabitCompletion.occurrence_date == day,
+        )
+    ) is not None
+
+
+def record_completion(db: Session, task, on: Optional[date] = None) -> Optional[models.HabitStats]:
+    """Record a completed occurrence and update the streaks; the caller commits"""
+    rule = habit_rule(task)
+    if rule is None:
+        if on is not None:
+            raise OccurrenceError("Only recurring tasks track completions per occurrence")
+        return None
+    day = resolve_occurrence(rule, on)
+    if day is None:
+        return None
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    inserted = db.execute(
+        dialect.insert(models.HabitCompletion)
+        .values(task_id=task.id, occurrence_date=day)
+        .on_conflict_do_nothing()
+        .returning(models.HabitCompletion.id)
+    ).first()
+    stats = _get_stats(db, task.id)
+    if inserted is None:
+        # Já estava concluída
+        return stats
+
+    if stats.current_streak and day == rule.after(stats.streak_end):
+        stats.streak_end = day
+        stats.current_streak += 1
+    elif stats.current_streak and day == rule.before(stats.streak_start):
+        # Se a ocorrência anterior também estiver feita, duas sequências juntam-se
+        if _is_completed(db, task.id, rule.before(day)):
+            return recompute(db, task, rule)
+        stats.streak_start = day
+        stats.current_streak += 1
+    elif not stats.current_streak or day > stats.streak_end:
+        stats.streak_start = stats.streak_end = day
+        stats.current_streak = 1
+    else:
+        # Conclusão antiga, fora da sequência mais recente: pode mudar sequências passadas
+        return recompute(db, task, rule)
+
+    stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+    stats.total_completions += 1
+    _mark_recent(stats, day, True)
+    return stats
+
+
+def record_uncompletion(db: Session, task, on: Optional[date] = None) -> Optional[models.HabitStats]:
+    """Remove a completed occurrence and update the streaks; the caller commits"""
+    rule = habit_rule(task)
+    if rule is None:
+        if on is not None:
+            raise OccurrenceError("Only recurring tasks track completions per occurrence")
+        return None
+    day = resolve_occurrence(rule, on)
+    if day is None:
+        return None
+
+    deleted = db.execute(
+        delete(models.HabitCompletion)
+        .where(models.HabitCompletion.task_id == task.id, models.HabitCompletion.occurrence_date == day)
+        .returning(models.HabitCompletion.id)
+    ).first()
+    stats = _get_stats(db, task.id)
+    if deleted is None:
+        return stats
+
+    # Desfazer a última ocorrência de uma sequência que não é a mais longa é O(1);
+    # os outros casos podem mudar a sequência mais recente ou a mais longa
+    if day == stats.streak_end and 1 < stats.current_streak < stats.longest_streak:
+        stats.streak_end = rule.before(day)
+        stats.current_streak -= 1
+        stats.total_completions -= 1
+        _mark_recent(stats, day, False)
+        return stats
+    return recompute(db, task, rule)
+
+
+def recompute(db: Session, task, rule: Optional[recurrence.RecurrenceRule] = None) -> models.HabitStats:
+    """Rebuild a habit's stats from its full completion history; the caller commits"""
+    rule = rule or habit_rule(task)
+    days = db.scalars(
+        select(models.HabitCompletion.occurrence_date)
+        .where(models.HabitCompletion.task_id == task.id)
+        .order_by(models.HabitCompletion.occurrence_date)
+    ).all()
+
+    stats = _get_stats(db, task.id)
+    run, longest, start, previous = 0, 0, None, None
+    for day in days:
+        if rule is not None and previous is not None and day == rule.after(previous):
+            run += 1
+        else:
+            run, start = 1, day
+        longest = max(longest, run)
+        previous = day
+
+    stats.current_streak = run
+    stats.streak_start = start
+    stats.streak_end = previous
+    stats.longest_streak = longest
+    stats.total_completions = len(days)
+    stats.recent_anchor = previous
+    stats.recent_mask = 0
+    for day in days:
+        offset = (previous - day).days
+        if offset < RECENT_DAYS:
+            stats.recent_mask |= 1 << offset
+    return stats
+
+
+def schedule_changed(db: Session, task) -> None:
+    """Re-evaluate a habit's streaks against its new schedule; the caller commits"""
+    if db.get(models.HabitStats, task.id) is not None:
+        recompute(db, task)
+
+
+def forget(db: Session, task_ids) -> None:
+    """Drop the completions and stats of deleted tasks; the caller commits"""
+    # Sem PRAGMA foreign_keys o ON DELETE CASCADE não corre; as de tarefas arquivadas ficam (não passam por aqui)
+    if not task_ids:
+        return
+    db.execute(delete(models.HabitCompletion).where(models.HabitCompletion.task_id.in_(task_ids)))
+    db.execute(delete(models.HabitStats).where(models.HabitStats.task_id.in_(task_ids)))
+
+
+def recompute_all(db: Session) -> int:
+    """Rebuild the stats of every recurring task; returns how many were rebuilt"""
+    from backend.models import task as task_models
+
+    count = 0
+    for task in db.scalars(select(task_models.Task).where(task_models.Task.schedule_type.isnot(None))):
+        rule = habit_rule(task)
+        if rule is not None:
+            recompute(db, task, rule)
+            count += 1
+    db.commit()
+    return count
+
+
+# -------------------------------
+# Leitura (tempo constante por hábito)
+# -------------------------------
+def _recent_completed(stats: Optional[models.HabitStats], today: date, window: int) -> int:
+    if stats is None or stats.recent_anchor is None:
+        return 0
+    offset = (today - stats.recent_anchor).days
+    if offset >= window:
+        return 0
+    relative = stats.recent_mask << offset if offset >= 0 else stats.recent_mask >> -offset
+    return bin(relative & ((1 << window) - 1)).count("1")
+
+
+def summarize(task, stats: Optional[models.HabitStats], today: Optional[date] = None) -> dict:
+    """Current view of a habit's stats, from its stats row alone"""
+    rule = habit_rule(task)
+    today = today or date.today()
+
+    current = 0
+    if rule is not None and stats is not None and stats.current_streak:
+        latest_due = rule.on_or_before(today)
+        # A ocorrência de hoje ainda pode ser feita: a sequência só quebra depois de passar
+        if stats.streak_end == latest_due or (latest_due == today and stats.streak_end == rule.before(today)):
+            current = stats.current_streak
+
+    summary = {
+        "task_id": task.id,
+        "title": task.title,
+        "schedule_type": task.schedule_type,
+        "habit_type": task.habit_type,
+        "category_id": task.category_id,
+        "current_streak": current,
+        "longest_streak": stats.longest_streak if stats else 0,
+        "last_completed": stats.streak_end if stats else None,
+        "total_completions": stats.total_completions if stats else 0,
+    }
+    for window in RATE_WINDOWS:
+        scheduled = rule.count(today - timedelta(days=window - 1), today) if rule else 0
+        completed = min(_recent_completed(stats, today, window), scheduled)
+        summary[f"scheduled_{window}d"] = scheduled
+        summary[f"completed_{window}d"] = completed
+        summary[f"completion_rate_{window}d"] = round(completed / scheduled, 4) if scheduled else None
+    return summary
+
+
+if __name__ == "__main__":
+    from backend import database, migrations
+    from backend.models import task as task_models, category as category_models  # noqa: F401
+
+    if sys.argv[1:] != ["recompute"]:
+        print("usage: python -m backend.habits recompute")
+        sys.exit(2)
+
+    migrations.upgrade(database.engine)
+    with database.SessionLocal() as session:
+        rebuilt = recompute_all(session)
+    print(f"Recomputed stats for {rebuilt} habits on {database.SQLALCHEMY_DATABASE_URL}")
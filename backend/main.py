@@ -1,37 +1,95 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Body, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from backend import database
-from backend.crud import task as task_crud, category as category_crud
-from backend.schemas import task as task_schemas, category as category_schemas
-from backend.models import task as task_models, category as category_models
+from typing import Any, List, Optional
+from datetime import date
+from backend import analytics, archive, bootstrap, cache, database, events, habits, metrics, reminders, serialization, server, sync, tags as tag_index, tenancy, write_queue
+from backend.constants import MAX_PAGE_SIZE, MAX_CALENDAR_WINDOW_DAYS, MAX_BULK_SIZE
+from backend.crud import task as task_crud, category as category_crud, sync as sync_crud, time_entry as time_crud, habit as habit_crud, insight as insight_crud, tag as tag_crud
+from backend.schemas import bootstrap as bootstrap_schemas, task as task_schemas, category as category_schemas, sync as sync_schemas, time_entry as time_schemas, habit as habit_schemas, insight as insight_schemas, tag as tag_schemas
+from backend.models import task as task_models
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-# Cria a app FastAPI
-app = FastAPI(
-    title="Productivity API",
-    description="Backend para gerir tarefas, categorias e rotinas",
-    version="0.1.0",
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare this process (schema, warm connections, background jobs) and tear it down"""
+    # Com o backend.server o esquema já foi preparado uma vez no processo pai
+    if not server.schema_setup_skipped():
+        await run_in_threadpool(server.prepare_schema)
+    if server.WARMUP_CONNECTIONS:
+        with metrics.timed_startup("warm_up"):
+            await run_in_threadpool(server.warm_up)
+    jobs = server.background_jobs_enabled()
+    if jobs:
+        await run_in_threadpool(server.start_background_jobs)
+    server.mark_ready()
+    yield
+    server.mark_draining()
+    if jobs:
+        server.stop_background_jobs()
+    await run_in_threadpool(server.close_databases)
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
 
-# Adiciona o middleware de CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Ou especifique a URL do seu frontend
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
+
+
+def create_app() -> FastAPI:
+    """The API app; the schema, warm-up and background jobs run in its lifespan, not at import"""
+    app = FastAPI(
+        title="Productivity API",
+        description="Backend para gerir tarefas, categorias e rotinas",
+        version="0.1.0",
+        lifespan=lifespan,
+    )
 
-# Criar as tabelas na BD (caso não existam)
-task_models.Base.metadata.create_all(bind=database.engine)
-category_models.Base.metadata.create_all(bind=database.engine)
+    # Adiciona o middleware de CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Ou especifique a URL do seu frontend
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
+    # Rotas async (opt-in com DB_ASYNC=1); registadas primeiro para terem prioridade sobre as síncronas
+    if database.ASYNC_DB:
+        from backend import async_routes
+        app.include_router(async_routes.router)
+    app.include_router(router)
+
+    # Utilizador do pedido (X-User-Id) para o particionamento dos dados
+    app.add_middleware(tenancy.TenantMiddleware)
+
+    # Métricas por pedido (Server-Timing, /metrics, slow query log)
+    app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+# -------------------------------
+# 🩺 Saúde do processo (load balancers, orquestradores)
+# -------------------------------
+@router.get("/healthz", include_in_schema=False)
+def healthz():
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+def readyz():
+    reason = server.readiness()
+    if reason is not None:
+        return JSONResponse({"status": "unavailable", "detail": reason}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ready"}
 
 # -------------------------------
 # 🟦 Rotas para Tasks
 # -------------------------------
-@app.post(
+@router.post(
     "/tasks/", 
     response_model=task_schemas.Task,
     status_code=status.HTTP_201_CREATED,
@@ -39,22 +97,204 @@ category_models.Base.metadata.create_all(bind=database.engine)
     description="Create a new task with the given details."
 )
 def create_task(task: task_schemas.TaskCreate, db: Session = Depends(database.get_db)):
-    return task_crud.create_task(db, task)
+    try:
+        return write_queue.apply(db, task_crud.create_task, task)
+    except task_crud.CategoryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-@app.get(
+@router.get(
     "/tasks/", 
-    response_model=list[task_schemas.Task],
+    response_model=task_schemas.TaskList,
+    dependencies=[Depends(sync.etag_guard)],
     summary="Get all tasks",
-    description="Retrieve a list of all tasks."
+    description="Retrieve a page of tasks ordered by start_date. Pass next_cursor back as cursor to get the next page."
 )
 def read_tasks(
-    skip: int = 0, 
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    completed: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    schedule_type: Optional[task_schemas.ScheduleType] = None,
+    habit_type: Optional[task_schemas.HabitType] = None,
+    overdue_only: bool = False,
+    include_total: bool = False,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of task fields to return, e.g. id,title,start_date"),
+    tags: Optional[str] = Query(None, description='Tag expression, e.g. work AND (urgent OR "high effort") AND NOT done'),
+    db: Session = Depends(database.get_db)
+):
+    try:
+        after = task_crud.decode_cursor(cursor) if cursor else None
+        selected = serialization.parse_fields(fields)
+        if tags is not None:
+            tag_index.parse(tags)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    filters = dict(
+        completed=completed,
+        category_id=category_id,
+        schedule_type=schedule_type.value if schedule_type else None,
+        habit_type=habit_type.value if habit_type else None,
+        overdue_only=overdue_only,
+        tags=tags,
+    )
+    # Pede uma linha a mais para saber se existe página seguinte
+    rows, next_cursor = task_crud.paginate(
+        task_crud.get_task_rows(db, selected, limit=limit + 1, after=after, **filters), limit
+    )
+
+    # Caminho rápido: linhas -> JSON sem construir um modelo Pydantic por tarefa
+    return serialization.json_response({
+        "tasks": serialization.rows_to_dicts(rows, selected),
+        "size": len(rows),
+        "next_cursor": next_cursor,
+        "total": task_crud.get_tasks_count(db, **filters) if include_total else None,
+    }, response)
+
+# -------------------------------
+# 🟦 Rotas bulk para Tasks (antes de /tasks/{task_id} para não colidirem)
+# -------------------------------
+def _validate_items(items: list, schema) -> tuple:
+    """Validate each raw item on its own; returns ([(index, model)], {index: error})"""
+    valid, errors = [], {}
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            errors[index] = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'body'}: {err['msg']}" for err in e.errors()
+            )
+    return valid, errors
+
+
+def _bulk_result(size: int, outcomes: dict, ids: Optional[list] = None) -> task_schemas.BulkResult:
+    """Build the per-item response from {index: (task, error)}"""
+    results = []
+    for index in range(size):
+        task, error = outcomes[index]
+        results.append(task_schemas.BulkItemResult(
+            index=index,
+            ok=error is None,
+            id=task.id if task is not None else (ids[index] if ids else None),
+            task=task,
+            error=error,
+        ))
+    succeeded = sum(1 for r in results if r.ok)
+    return task_schemas.BulkResult(results=results, succeeded=succeeded, failed=size - succeeded)
+
+
+@router.post(
+    "/tasks/bulk",
+    response_model=task_schemas.BulkResult,
+    summary="Create tasks in bulk",
+    description="Create up to MAX_BULK_SIZE tasks in one transaction. Invalid items are reported per index and do not block the others."
+)
+def bulk_create_tasks(
+    items: list[Any] = Body(..., max_length=MAX_BULK_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    valid, errors = _validate_items(items, task_schemas.TaskCreate)
+    outcomes = {index: (None, error) for index, error in errors.items()}
+
+    created = task_crud.bulk_create_tasks(db, [task for _, task in valid])
+    outcomes.update({index: outcome for (index, _), outcome in zip(valid, created)})
+    return _bulk_result(len(items), outcomes)
+
+@router.patch(
+    "/tasks/bulk",
+    response_model=task_schemas.BulkResult,
+    summary="Update tasks in bulk",
+    description="Apply partial updates (each item carries its task id) in one transaction."
+)
+def bulk_update_tasks(
+    items: list[Any] = Body(..., max_length=MAX_BULK_SIZE),
     db: Session = Depends(database.get_db)
 ):
-    return task_crud.get_tasks(db)
+    valid, errors = _validate_items(items, task_schemas.TaskBulkUpdate)
+    outcomes = {index: (None, error) for index, error in errors.items()}
 
-@app.get(
+    updates = [
+        (item.id, task_schemas.TaskUpdate.model_validate(item.model_dump(exclude={"id"}, exclude_unset=True)))
+        for _, item in valid
+    ]
+    updated = task_crud.bulk_update_tasks(db, updates)
+    outcomes.update({index: outcome for (index, _), outcome in zip(valid, updated)})
+    return _bulk_result(len(items), outcomes)
+
+@router.delete(
+    "/tasks/bulk",
+    response_model=task_schemas.BulkResult,
+    summary="Delete tasks in bulk",
+    description="Delete many tasks with a single statement; ids that do not exist are reported as failures."
+)
+def bulk_delete_tasks(payload: task_schemas.TaskBulkDelete, db: Session = Depends(database.get_db)):
+    if len(payload.ids) > MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_SIZE} ids per request"
+        )
+    deleted = task_crud.bulk_delete_tasks(db, payload.ids)
+    outcomes = {
+        index: (None, None) if ok else (None, f"Task with id {task_id} not found")
+        for index, (task_id, ok) in enumerate(zip(payload.ids, deleted))
+    }
+    return _bulk_result(len(payload.ids), outcomes, ids=payload.ids)
+
+
+@router.get(
+    "/tasks/search",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Search tasks",
+    description="Full-text search over title, description and notes, ranked by relevance. The last word is matched as a prefix."
+)
+def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    return task_crud.search_tasks(db, q, skip=skip, limit=limit)
+
+@router.get(
+    "/tasks/today",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get today's tasks",
+    description="Tasks scheduled for today, ordered by start time"
+)
+def read_today_tasks(db: Session = Depends(database.get_db)):
+    return task_crud.get_today_tasks(db)
+
+@router.get(
+    "/tasks/upcoming",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get upcoming tasks",
+    description="Incomplete tasks starting within the next days"
+)
+def read_upcoming_tasks(
+    days: int = Query(7, ge=1, le=MAX_CALENDAR_WINDOW_DAYS),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    return task_crud.get_upcoming_tasks(db, days=days, limit=limit)
+
+@router.get(
+    "/tasks/overdue",
+    response_model=list[task_schemas.Task],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get overdue tasks",
+    description="Incomplete tasks whose start date has passed"
+)
+def read_overdue_tasks(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    return task_crud.get_overdue_tasks(db, limit=limit)
+
+@router.get(
     "/tasks/{task_id}", 
     response_model=task_schemas.Task,
     summary="Get task by ID",
@@ -69,7 +309,7 @@ def read_task(task_id: int, db: Session = Depends(database.get_db)):
         )
     return db_task
 
-@app.put(
+@router.put(
     "/tasks/{task_id}", 
     response_model=task_schemas.Task,
     summary="Update task",
@@ -80,7 +320,10 @@ def update_task(
     task: task_schemas.TaskUpdate, 
     db: Session = Depends(database.get_db)
 ):
-    db_task = task_crud.update_task(db, task_id, task)
+    try:
+        db_task = write_queue.apply(db, task_crud.update_task, task_id, task)
+    except task_crud.CategoryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if db_task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
@@ -88,14 +331,58 @@ def update_task(
         )
     return db_task
 
-@app.delete(
+@router.post(
+    "/tasks/{task_id}/complete",
+    response_model=task_schemas.Task,
+    summary="Mark a task as completed",
+    description="Mark a task as completed in a single UPDATE ... RETURNING statement. For habits this also records the occurrence and updates the streaks."
+)
+def complete_task(
+    task_id: int,
+    on: Optional[date] = Query(None, description="Habits only: the occurrence to mark, default the latest one due"),
+    db: Session = Depends(database.get_db)
+):
+    try:
+        db_task = write_queue.apply(db, task_crud.mark_task_completed, task_id, on=on)
+    except habits.OccurrenceError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.post(
+    "/tasks/{task_id}/incomplete",
+    response_model=task_schemas.Task,
+    summary="Mark a task as not completed",
+    description="Mark a task as not completed in a single UPDATE ... RETURNING statement. For habits this also records the occurrence and updates the streaks."
+)
+def incomplete_task(
+    task_id: int,
+    on: Optional[date] = Query(None, description="Habits only: the occurrence to mark, default the latest one due"),
+    db: Session = Depends(database.get_db)
+):
+    try:
+        db_task = write_queue.apply(db, task_crud.mark_task_incomplete, task_id, on=on)
+    except habits.OccurrenceError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.delete(
     "/tasks/{task_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete task",
     description="Delete a task by its ID"
 )
 def delete_task(task_id: int, db: Session = Depends(database.get_db)):
-    success = task_crud.delete_task(db, task_id)
+    success = write_queue.apply(db, task_crud.delete_task, task_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
@@ -103,14 +390,550 @@ def delete_task(task_id: int, db: Session = Depends(database.get_db)):
         )
 
 
+# -------------------------------
+# ⏱️ Rotas para Time Logging
+# -------------------------------
+def _get_task_or_404(db: Session, task_id: int) -> task_models.Task:
+    db_task = task_crud.get_task(db, task_id)
+    if db_task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with id {task_id} not found"
+        )
+    return db_task
+
+@router.post(
+    "/tasks/{task_id}/timer/start",
+    response_model=time_schemas.TimeEntry,
+    status_code=status.HTTP_201_CREATED,
+    summary="Start a timer",
+    description="Start timing a task. Only one timer can run per task."
+)
+def start_timer(task_id: int, db: Session = Depends(database.get_db)):
+    db_task = _get_task_or_404(db, task_id)
+    try:
+        return time_crud.start_timer(db, db_task)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A timer is already running for task {task_id}"
+        )
+
+@router.post(
+    "/tasks/{task_id}/timer/stop",
+    response_model=time_schemas.TimeEntry,
+    summary="Stop the running timer",
+    description="Stop the task's running timer and log the elapsed time"
+)
+def stop_timer(
+    task_id: int,
+    stop: time_schemas.TimerStop = Body(default_factory=time_schemas.TimerStop),
+    db: Session = Depends(database.get_db)
+):
+    db_task = _get_task_or_404(db, task_id)
+    entry = time_crud.stop_timer(db, db_task, stop)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No timer running for task {task_id}"
+        )
+    return entry
+
+@router.post(
+    "/tasks/{task_id}/time",
+    response_model=time_schemas.TimeEntry,
+    status_code=status.HTTP_201_CREATED,
+    summary="Log time",
+    description="Log a finished block of time (and/or a quantity) against a task"
+)
+def log_time(task_id: int, log: time_schemas.TimeEntryLog, db: Session = Depends(database.get_db)):
+    db_task = _get_task_or_404(db, task_id)
+    return time_crud.log_time(db, db_task, log)
+
+@router.get(
+    "/tasks/{task_id}/time",
+    response_model=list[time_schemas.TimeEntry],
+    summary="Get time entries",
+    description="Time entries of a task, newest first"
+)
+def read_time_entries(
+    task_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    _get_task_or_404(db, task_id)
+    return time_crud.get_task_entries(db, task_id, skip=skip, limit=limit)
+
+@router.delete(
+    "/time-entries/{entry_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Delete time entry",
+    description="Delete a time entry and remove it from the summaries"
+)
+def delete_time_entry(entry_id: int, db: Session = Depends(database.get_db)):
+    if not time_crud.delete_entry(db, entry_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Time entry with id {entry_id} not found"
+        )
+
+@router.get(
+    "/time/summary",
+    response_model=time_schemas.TimeSummary,
+    summary="Planned vs actual time",
+    description="Daily or weekly planned vs actual time per task, category or habit type, read from pre-aggregated rollups"
+)
+def read_time_summary(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    period: time_schemas.RollupPeriod = Query(time_schemas.RollupPeriod.DAY),
+    by: time_schemas.RollupDimension = Query(time_schemas.RollupDimension.CATEGORY),
+    key: Optional[str] = Query(None, description="Only this task id, category id or habit type"),
+    db: Session = Depends(database.get_db)
+):
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must be on or after 'from'"
+        )
+    if (end - start).days >= MAX_CALENDAR_WINDOW_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Summary window cannot exceed {MAX_CALENDAR_WINDOW_DAYS} days"
+        )
+    rows = time_crud.get_summary(db, period.value, by.value, start, end, key=key)
+    return {"period": period, "by": by, "rows": rows}
+
+
+# -------------------------------
+# 🔥 Rotas para Hábitos
+# -------------------------------
+@router.get(
+    "/habits/stats",
+    response_model=list[habit_schemas.HabitStats],
+    summary="Get habit stats",
+    description="Current and longest streak plus 7/30-day completion rates of every recurring task, read from pre-computed stats"
+)
+def read_habit_stats(
+    task_id: Optional[int] = None,
+    habit_type: Optional[task_schemas.HabitType] = None,
+    category_id: Optional[int] = None,
+    db: Session = Depends(database.get_db)
+):
+    return habit_crud.get_habit_stats(
+        db,
+        task_id=task_id,
+        habit_type=habit_type.value if habit_type else None,
+        category_id=category_id,
+    )
+
+
+# -------------------------------
+# 📊 Rotas para Insights
+# -------------------------------
+def _check_window(start: date, end: date) -> None:
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must be on or after 'from'"
+        )
+    if (end - start).days >= MAX_CALENDAR_WINDOW_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insights window cannot exceed {MAX_CALENDAR_WINDOW_DAYS} days"
+        )
+
+@router.get(
+    "/insights/summary",
+    response_model=insight_schemas.InsightSummary,
+    summary="Completion and planned-time insights",
+    description="Daily or weekly task counts, completions, habit completions and planned minutes, overall or per habit type or category, read from precomputed aggregates"
+)
+def read_insights_summary(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    period: insight_schemas.InsightPeriod = Query(insight_schemas.InsightPeriod.DAY),
+    by: insight_schemas.InsightDimension = Query(insight_schemas.InsightDimension.ALL),
+    key: Optional[str] = Query(None, description="Only this habit type or category id"),
+    db: Session = Depends(database.get_db)
+):
+    _check_window(start, end)
+    rows = insight_crud.get_summary(db, period.value, by.value, start, end, key=key)
+    return {"period": period, "by": by, "pending_days": insight_crud.pending_days(db), "rows": rows}
+
+@router.get(
+    "/insights/overdue",
+    response_model=insight_schemas.OverdueTrend,
+    summary="Overdue trend",
+    description="Daily snapshots of the pending and overdue task counts"
+)
+def read_overdue_trend(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    db: Session = Depends(database.get_db)
+):
+    _check_window(start, end)
+    return {"points": insight_crud.get_overdue_trend(db, start, end)}
+
+@router.get(
+    "/insights/patterns",
+    response_model=insight_schemas.PatternReport,
+    summary="Completion patterns",
+    description="Completion rates by weekday, start hour and planned duration, computed in a worker process"
+)
+async def read_patterns(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+):
+    _check_window(start, end)
+    # Percorre as tarefas do intervalo: corre no process pool, fora do processo que serve os pedidos
+    engine = await run_in_threadpool(tenancy.strategy.engine)
+    return await analytics.run_report(analytics.pattern_report, engine, start, end)
+
+
+# -------------------------------
+# 🟨 Rotas para o Calendário
+# -------------------------------
+@router.get(
+    "/calendar",
+    response_model=list[task_schemas.TaskOccurrence],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Get calendar occurrences",
+    description="Expand recurring tasks into the occurrences that fall inside [from, to]"
+)
+def read_calendar(
+    response: Response,
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    db: Session = Depends(database.get_db)
+):
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must be on or after 'from'"
+        )
+    if (end - start).days >= MAX_CALENDAR_WINDOW_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Calendar window cannot exceed {MAX_CALENDAR_WINDOW_DAYS} days"
+        )
+    # As ocorrências já são dicts construídos a partir da BD: serializa sem revalidar
+    return serialization.json_response(task_crud.get_calendar_occurrences(db, start, end), response)
+
+
 # -------------------------------
 # 🟩 Rotas para Categories
 # -------------------------------
-@app.post("/categories/", response_model=category_schemas.Category)
+@router.post("/categories/", response_model=category_schemas.Category)
 def create_category(category: category_schemas.CategoryCreate, db: Session = Depends(database.get_db)):
-    return category_crud.create_category(db, category)
+    return write_queue.apply(db, category_crud.create_category, category)
 
 
-@app.get("/categories/", response_model=list[category_schemas.Category])
+@router.get(
+    "/categories/",
+    response_model=list[category_schemas.Category],
+    dependencies=[Depends(sync.etag_guard)],
+)
 def read_categories(db: Session = Depends(database.get_db)):
     return category_crud.get_categories(db)
+
+
+# -------------------------------
+# 🏷️ Rotas para Tags (as fixas antes de /tags/{tag_id})
+# -------------------------------
+def _tag_name_conflict(name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"A tag named {name!r} already exists"
+    )
+
+@router.post(
+    "/tags/",
+    response_model=tag_schemas.Tag,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create a tag",
+    description="Create a tag or result label. Names are unique per user."
+)
+def create_tag(tag: tag_schemas.TagCreate, db: Session = Depends(database.get_db)):
+    try:
+        return write_queue.apply(db, tag_crud.create_tag, tag)
+    except IntegrityError:
+        raise _tag_name_conflict(tag.name)
+
+@router.get(
+    "/tags/",
+    response_model=list[tag_schemas.Tag],
+    dependencies=[Depends(sync.etag_guard)],
+)
+def read_tags(db: Session = Depends(database.get_db)):
+    return tag_crud.get_tags(db)
+
+@router.get(
+    "/tags/summary",
+    response_model=list[tag_schemas.TagSummaryRow],
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Tasks and completion rate per tag",
+    description="Tasks, completed tasks and completion rate of every tag, optionally among the tasks matching a tag expression"
+)
+def read_tags_summary(
+    tags: Optional[str] = Query(None, description='Tag expression, e.g. "high effort" AND NOT work'),
+    db: Session = Depends(database.get_db)
+):
+    try:
+        return tag_crud.get_summary(db, tags)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post(
+    "/tags/assign",
+    response_model=tag_schemas.TagAssignmentResult,
+    summary="Tag tasks in bulk",
+    description="Add every given tag to every given task. Unknown ids are skipped and left out of the response."
+)
+def assign_tags(assignment: tag_schemas.TagAssignment, db: Session = Depends(database.get_db)):
+    return write_queue.apply(db, tag_crud.assign_tags, assignment)
+
+@router.post(
+    "/tags/unassign",
+    response_model=tag_schemas.TagAssignmentResult,
+    summary="Untag tasks in bulk",
+    description="Remove every given tag from every given task."
+)
+def unassign_tags(assignment: tag_schemas.TagAssignment, db: Session = Depends(database.get_db)):
+    return write_queue.apply(db, tag_crud.unassign_tags, assignment)
+
+@router.put(
+    "/tags/{tag_id}",
+    response_model=tag_schemas.Tag,
+    summary="Update a tag",
+    description="Rename, recolor or change the kind of a tag. Tag expressions use the new name."
+)
+def update_tag(tag_id: int, tag: tag_schemas.TagUpdate, db: Session = Depends(database.get_db)):
+    try:
+        db_tag = write_queue.apply(db, tag_crud.update_tag, tag_id, tag)
+    except IntegrityError:
+        raise _tag_name_conflict(tag.name)
+    if db_tag is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tag with id {tag_id} not found"
+        )
+    return db_tag
+
+@router.delete(
+    "/tags/{tag_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Delete a tag",
+    description="Delete a tag and remove it from every task."
+)
+def delete_tag(tag_id: int, db: Session = Depends(database.get_db)):
+    if not write_queue.apply(db, tag_crud.delete_tag, tag_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tag with id {tag_id} not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get(
+    "/tasks/{task_id}/tags",
+    response_model=list[tag_schemas.Tag],
+    summary="Get the tags of a task"
+)
+def read_task_tags(task_id: int, db: Session = Depends(database.get_db)):
+    _get_task_or_404(db, task_id)
+    return tag_crud.get_task_tags(db, task_id)
+
+@router.put(
+    "/tasks/{task_id}/tags",
+    response_model=list[tag_schemas.Tag],
+    summary="Set the tags of a task",
+    description="Replace every tag of a task. Unknown tag ids are skipped."
+)
+def update_task_tags(task_id: int, task_tags: tag_schemas.TaskTags, db: Session = Depends(database.get_db)):
+    _get_task_or_404(db, task_id)
+    return write_queue.apply(db, tag_crud.set_task_tags, task_id, task_tags)
+
+
+# -------------------------------
+# 🚀 Arranque da app: várias leituras num só pedido
+# -------------------------------
+@router.get(
+    "/bootstrap",
+    response_model=bootstrap_schemas.Bootstrap,
+    # Só as secções pedidas
+    response_model_exclude_unset=True,
+    dependencies=[Depends(sync.etag_guard)],
+    summary="Load the first screen",
+    description="Today's tasks, upcoming tasks, categories and task counts in one response, all read at the same revision."
+)
+async def read_bootstrap(
+    request: Request,
+    response: Response,
+    include: Optional[str] = Query(None, description="Comma-separated subset of sections, e.g. today,counts"),
+):
+    try:
+        sections = [bootstrap_schemas.BootstrapSection(name.strip()) for name in include.split(",")] if include else list(bootstrap_schemas.BootstrapSection)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    result = await bootstrap.load(sections)
+    # ETag da revisão realmente lida (pode ter avançado desde o etag_guard)
+    response.headers["ETag"] = sync.make_etag(result.revision, request)
+    return result
+
+@router.post(
+    "/batch",
+    response_model=bootstrap_schemas.BatchResponse,
+    summary="Run several reads at once",
+    description="Run up to MAX_BATCH_REQUESTS GET requests concurrently and return each status, ETag and body. consistent tells whether they all saw the same revision."
+)
+async def run_batch(payload: bootstrap_schemas.BatchRequest, request: Request):
+    return await bootstrap.batch(request.app, payload.requests, request.scope["headers"])
+
+
+# -------------------------------
+# 🟪 Rotas para Sync
+# -------------------------------
+@router.get(
+    "/sync",
+    response_model=sync_schemas.SyncChanges,
+    summary="Get changes since a revision",
+    description="Return tasks and categories changed after since, plus the ids deleted. Start with since=0 and pass the returned revision on the next call."
+)
+def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db)
+):
+    return sync_crud.get_changes(db, since, limit)
+
+@router.post(
+    "/sync/operations",
+    response_model=sync_schemas.OperationBatchResult,
+    summary="Replay offline operations",
+    description="Apply up to MAX_BULK_SIZE operations made offline (create, update, complete, uncomplete, delete) in one transaction, in order. Each field keeps its most recent write; resent op_ids are ignored. Returns a status per operation, the server ids of the tasks created and their resulting state."
+)
+def apply_operations(payload: sync_schemas.OperationBatch, db: Session = Depends(database.get_db)):
+    return write_queue.apply(db, sync_crud.apply_operations, payload.operations)
+
+
+# -------------------------------
+# 📦 Exportar / Importar tarefas (CSV ou NDJSON)
+# -------------------------------
+@router.get(
+    "/export",
+    summary="Export tasks",
+    description="Stream every task matching the filters as CSV or NDJSON, in id order and in constant memory. gzip=true compresses the stream."
+)
+def export_tasks(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    completed: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    schedule_type: Optional[task_schemas.ScheduleType] = None,
+    habit_type: Optional[task_schemas.HabitType] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of task fields to export, e.g. id,title,start_date"),
+    tags: Optional[str] = Query(None, description="Tag expression, as in GET /tasks/"),
+):
+    try:
+        # Sem fields: todas as colunas, com o id primeiro
+        selected = serialization.parse_fields(fields or ",".join(serialization.TASK_FIELDS))
+        if tags is not None:
+            tag_index.parse(tags)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Importado só quando usado: csv, gzip e o leitor de importação não entram no arranque
+    from backend import transfer
+
+    chunks = transfer.export_chunks(
+        tenancy.strategy.engine(),
+        format,
+        selected,
+        completed=completed,
+        category_id=category_id,
+        schedule_type=schedule_type.value if schedule_type else None,
+        habit_type=habit_type.value if habit_type else None,
+        tags=tags,
+    )
+    filename, media_type = f"tasks.{format}", transfer.FORMATS[format]
+    if gzip:
+        chunks, filename, media_type = transfer.gzip_chunks(chunks), filename + ".gz", "application/gzip"
+    return StreamingResponse(
+        chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post(
+    "/import",
+    response_model=task_schemas.ImportResult,
+    summary="Import tasks",
+    description="Import tasks from a CSV or NDJSON request body (optionally gzipped), in batched transactions. Invalid lines are reported and do not block the others; imported tasks get new ids."
+)
+async def import_tasks(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(database.get_db)
+):
+    from backend import transfer
+
+    # O corpo vai para um ficheiro temporário (em disco acima de IMPORT_SPOOL_BYTES), nunca inteiro para a memória
+    with tempfile.SpooledTemporaryFile(max_size=transfer.IMPORT_SPOOL_BYTES) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        return await run_in_threadpool(transfer.import_tasks, db, upload, format)
+
+# -------------------------------
+# 📈 Métricas
+# -------------------------------
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+def read_metrics():
+    return PlainTextResponse(
+        metrics.render_prometheus() + cache.render_prometheus() + write_queue.render_prometheus()
+        + tenancy.render_prometheus() + reminders.render_prometheus() + tag_index.render_prometheus()
+        + archive.render_prometheus() + bootstrap.render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+# -------------------------------
+# 🟥 WebSocket: alterações em tempo real
+# -------------------------------
+@router.websocket("/ws/tasks")
+async def tasks_websocket(websocket: WebSocket):
+    """Push the user's task/category change events as JSON text frames"""
+    await websocket.accept()
+    subscription = events.hub.subscribe(tenancy.current_user_id())
+
+    async def send_events():
+        while True:
+            event = await subscription.queue.get()
+            if event is None:
+                # Cliente demasiado lento: foi descartado, deve reconectar e usar /sync
+                await websocket.close(code=1013, reason="slow consumer")
+                return
+            await websocket.send_text(event)
+
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(wait_for_disconnect())
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        events.hub.unsubscribe(subscription)
+        for task in (sender, receiver):
+            task.cancel()
+
+
+# App para `uvicorn backend.main:app`; `python -m backend.server` usa a mesma, pré-carregada antes do fork
+app = create_app()
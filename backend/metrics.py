@@ -0,0 +1,303 @@
+"""Per-request performance instrumentation.
+
+``MetricsMiddleware`` opens a ``RequestStats`` for every HTTP request and
+the SQLAlchemy hooks below add to it: time spent in the database, number
+of statements, rows returned/affected and commit time. At the end of the
+request the numbers go out as a ``Server-Timing`` header and into
+per-route Prometheus histograms served at ``/metrics``.
+
+Statements slower than ``SLOW_QUERY_MS`` are logged to the
+``backend.slow_queries`` logger together with their EXPLAIN QUERY PLAN.
+With ``APP_ENV=development`` the same SELECT repeated more than
+``N_PLUS_ONE_THRESHOLD`` times in one request is flagged as a likely
+N+1 (typically lazy ``Task.category`` loads).
+
+Startup is reported too: the duration of each step (``timed_startup``)
+and the seconds from the server's start to this worker being ready and
+to its first request (``mark``). ``backend.server`` passes its start time
+to spawned workers in ``SERVER_STARTED_AT``; forked ones inherit it.
+
+Metrics are per process; with several workers each one exposes its own.
+"""
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("backend.slow_queries")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+DEVELOPMENT = os.getenv("APP_ENV", "production").lower() in ("dev", "development")
+
+# Início do servidor (epoch) para os marcos de arranque
+STARTED_AT = float(os.getenv("SERVER_STARTED_AT") or time.time())
+# Sondas que não contam como o primeiro pedido
+PROBE_ROUTES = ("/healthz", "/readyz", "/metrics")
+
+# Limites (segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RequestStats:
+    """Counters for a single request"""
+    __slots__ = ("db_time", "commit_time", "statements", "rows", "selects")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.commit_time = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.selects = Counter() if DEVELOPMENT else None
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f"total;dur={total * 1000:.2f}, db;dur={self.db_time * 1000:.2f};desc=\"{self.statements} stmts\", "
+            f"commit;dur={self.commit_time * 1000:.2f}"
+        )
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record_rows(count: int) -> None:
+    """Count rows read outside the ORM (e.g. the Core fast paths)"""
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += count
+
+
+# -------------------------------
+# Agregados por rota (formato Prometheus)
+# -------------------------------
+class Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "db_time", "statements", "rows", "errors")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.db_time = Histogram()
+        self.statements = 0
+        self.rows = 0
+        self.errors = 0
+
+
+_routes = defaultdict(RouteMetrics)
+_counters = Counter()
+_startup = {}
+_milestones = {}
+
+
+def _observe(method: str, route: str, status_code: int, total: float, stats: RequestStats) -> None:
+    metrics = _routes[(method, route)]
+    metrics.latency.observe(total)
+    metrics.db_time.observe(stats.db_time)
+    metrics.statements += stats.statements
+    metrics.rows += stats.rows
+    if status_code >= 500:
+        metrics.errors += 1
+
+
+@contextmanager
+def timed_startup(step: str):
+    """Time a startup step (e.g. migrations) and expose it in /metrics"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _startup[step] = time.perf_counter() - started
+        logger.info("Startup step %s took %.1f ms", step, _startup[step] * 1000)
+
+
+def mark(milestone: str) -> None:
+    """Record, once, the seconds from the server's start to a milestone (ready, first_request)"""
+    if milestone not in _milestones:
+        _milestones[milestone] = time.time() - STARTED_AT
+        logger.info("Reached %s %.3f s after start", milestone, _milestones[milestone])
+
+
+def _labels(method: str, route: str, **extra) -> str:
+    pairs = {"method": method, "route": route, **extra}
+    return ",".join(f'{key}="{value}"' for key, value in pairs.items())
+
+
+def _histogram_lines(name: str, help_text: str, series) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in series:
+        for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+            lines.append(f"{name}_bucket{{{_labels(method, route, le=bound)}}} {count}")
+        lines.append(f"{name}_bucket{{{_labels(method, route, le='+Inf')}}} {histogram.count}")
+        lines.append(f"{name}_sum{{{_labels(method, route)}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{_labels(method, route)}}} {histogram.count}")
+    return lines
+
+
+def render_prometheus() -> str:
+    """All collected metrics in the Prometheus text exposition format"""
+    routes = sorted(_routes.items())
+    lines = _histogram_lines(
+        "http_request_duration_seconds", "Request wall time by route.",
+        [(key, m.latency) for key, m in routes],
+    )
+    lines += _histogram_lines(
+        "http_request_db_seconds", "Time spent in database calls per request, by route.",
+        [(key, m.db_time) for key, m in routes],
+    )
+    for name, attr, help_text in (
+        ("http_request_db_statements_total", "statements", "SQL statements executed, by route."),
+        ("http_request_db_rows_total", "rows", "Rows returned or affected, by route."),
+        ("http_request_errors_total", "errors", "Responses with a 5xx status, by route."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f"{name}{{{_labels(*key)}}} {getattr(m, attr)}" for key, m in routes]
+    for name, help_text in (
+        ("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS."),
+        ("db_n_plus_one_total", "Requests flagged with a repeated SELECT (development only)."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {_counters[name]}"]
+    lines += ["# HELP app_startup_seconds Duration of each startup step.", "# TYPE app_startup_seconds gauge"]
+    lines += [f'app_startup_seconds{{step="{step}"}} {seconds:.6f}' for step, seconds in sorted(_startup.items())]
+    lines += ["# HELP app_milestone_seconds Seconds from server start to each milestone.", "# TYPE app_milestone_seconds gauge"]
+    lines += [f'app_milestone_seconds{{milestone="{name}"}} {seconds:.6f}' for name, seconds in sorted(_milestones.items())]
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Hooks do SQLAlchemy (todas as engines, sync e async)
+# -------------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.db_time += elapsed
+        stats.statements += 1
+        if cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+        if stats.selects is not None and statement.lstrip()[:6].upper() == "SELECT":
+            stats.selects[statement] += 1
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        _counters["db_slow_queries_total"] += 1
+        _log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+
+def _log_slow_query(conn, statement, parameters, executemany, elapsed) -> None:
+    plan = ""
+    explainable = statement.lstrip()[:6].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+    if conn.dialect.name == "sqlite" and explainable and not executemany:
+        # Cursor DBAPI direto para não voltar a disparar estes hooks
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan = "\n".join(f"  {row[-1]}" for row in cursor.fetchall())
+        except Exception:
+            plan = "  (plan unavailable)"
+        finally:
+            cursor.close()
+    # executemany (bulk / importação): não despejar milhares de linhas no log
+    params = f"<{len(parameters)} parameter sets>" if executemany else repr(parameters)
+    slow_query_logger.warning(
+        "Slow query (%.1f ms): %s\nparams: %s\nplan:\n%s", elapsed * 1000, statement, params, plan
+    )
+
+
+@event.listens_for(Session, "loaded_as_persistent")
+def _loaded_as_persistent(session, instance):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    session.info["commit_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    started = session.info.pop("commit_start", None)
+    stats = _current.get()
+    if started is not None and stats is not None:
+        stats.commit_time += time.perf_counter() - started
+
+
+# -------------------------------
+# Middleware ASGI
+# -------------------------------
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            _observe(scope["method"], route, status_code, total, stats)
+            _check_n_plus_one(scope["method"], route, stats)
+            if route not in PROBE_ROUTES:
+                mark("first_request")
+            _current.reset(token)
+
+
+def _check_n_plus_one(method: str, route: str, stats: RequestStats) -> None:
+    if not stats.selects:
+        return
+    statement, count = stats.selects.most_common(1)[0]
+    if count > N_PLUS_ONE_THRESHOLD:
+        _counters["db_n_plus_one_total"] += 1
+        logger.warning(
+            "Possible N+1 in %s %s: the same SELECT ran %d times\n%s", method, route, count, statement
+        )
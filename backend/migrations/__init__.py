@@ -0,0 +1,123 @@
+"""Versioned schema migrations, in the style of Alembic.
+
+Each module in ``versions/`` is one revision script declaring
+``revision``, ``down_revision`` and ``upgrade(engine)`` /
+``downgrade(engine)``. The revision a database is at lives in the
+single-row ``schema_version`` table; ``upgrade`` applies the newer
+scripts in order and records each one as it completes.
+
+    python -m backend.migrations upgrade [revision]
+    python -m backend.migrations downgrade <revision|base>
+    python -m backend.migrations current
+    python -m backend.migrations history
+
+Scripts must be idempotent (``IF NOT EXISTS``, column checks): several
+workers starting together may run the same one, and databases created by
+``create_all`` before migrations existed are adopted by the baseline.
+They never import ``backend.models``: each one declares the tables and
+indexes it creates as they are at that revision, so replaying it later
+builds the same schema whatever the models have become.
+"""
+import importlib
+import logging
+import pkgutil
+from dataclasses import dataclass
+from types import ModuleType
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_version"
+
+
+@dataclass(frozen=True)
+class Migration:
+    revision: str
+    down_revision: Optional[str]
+    module: ModuleType
+
+    @property
+    def description(self) -> str:
+        return (self.module.__doc__ or "").strip().splitlines()[0] if self.module.__doc__ else ""
+
+
+def load_migrations() -> List[Migration]:
+    """All revision scripts, oldest first; raises if the history is not a single line"""
+    from backend.migrations import versions
+
+    by_parent = {}
+    for info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        migration = Migration(module.revision, module.down_revision, module)
+        if migration.down_revision in by_parent:
+            raise RuntimeError(
+                f"Revisions {by_parent[migration.down_revision].revision} and {migration.revision} "
+                f"both follow {migration.down_revision}"
+            )
+        by_parent[migration.down_revision] = migration
+
+    ordered, parent = [], None
+    while parent in by_parent:
+        ordered.append(by_parent.pop(parent))
+        parent = ordered[-1].revision
+    if by_parent:
+        raise RuntimeError(f"Unreachable revisions: {', '.join(m.revision for m in by_parent.values())}")
+    return ordered
+
+
+def current_revision(engine: Engine) -> Optional[str]:
+    """The revision the database is at (None before the first migration)"""
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (version VARCHAR(32) NOT NULL)"))
+        conn.commit()
+        return conn.execute(text(f"SELECT version FROM {VERSION_TABLE}")).scalar()
+
+
+def _stamp(engine: Engine, revision: Optional[str]) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {VERSION_TABLE}"))
+        if revision is not None:
+            conn.execute(text(f"INSERT INTO {VERSION_TABLE} (version) VALUES (:version)"), {"version": revision})
+
+
+def _index_of(migrations: List[Migration], revision: Optional[str]) -> int:
+    if revision is None:
+        return -1
+    for index, migration in enumerate(migrations):
+        if migration.revision == revision:
+            return index
+    raise ValueError(f"Unknown revision {revision}")
+
+
+def upgrade(engine: Engine, target: str = "head") -> List[str]:
+    """Apply pending revisions up to target; returns the ones applied"""
+    migrations = load_migrations()
+    start = _index_of(migrations, current_revision(engine))
+    end = len(migrations) - 1 if target == "head" else _index_of(migrations, target)
+
+    applied = []
+    for migration in migrations[start + 1:end + 1]:
+        logger.info("Applying migration %s: %s", migration.revision, migration.description)
+        migration.module.upgrade(engine)
+        _stamp(engine, migration.revision)
+        applied.append(migration.revision)
+    return applied
+
+
+def downgrade(engine: Engine, target: str) -> List[str]:
+    """Revert revisions down to target ("base" reverts everything); returns the ones reverted"""
+    migrations = load_migrations()
+    start = _index_of(migrations, current_revision(engine))
+    end = -1 if target == "base" else _index_of(migrations, target)
+
+    reverted = []
+    for index in range(start, end, -1):
+        migration = migrations[index]
+        logger.info("Reverting migration %s: %s", migration.revision, migration.description)
+        migration.module.downgrade(engine)
+        _stamp(engine, migration.down_revision)
+        reverted.append(migration.revision)
+    return reverted
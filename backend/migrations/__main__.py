@@ -0,0 +1,33 @@
+import logging
+import sys
+
+from backend import database, migrations
+
+USAGE = "usage: python -m backend.migrations upgrade [revision] | downgrade <revision|base> | current | history"
+
+
+def main(argv) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    command, args = (argv[0], argv[1:]) if argv else (None, [])
+
+    if command == "upgrade" and len(args) <= 1:
+        applied = migrations.upgrade(database.engine, *args)
+        print(f"Applied {len(applied)} migration(s); now at {migrations.current_revision(database.engine)}")
+    elif command == "downgrade" and len(args) == 1:
+        reverted = migrations.downgrade(database.engine, args[0])
+        print(f"Reverted {len(reverted)} migration(s); now at {migrations.current_revision(database.engine)}")
+    elif command == "current" and not args:
+        print(migrations.current_revision(database.engine) or "base")
+    elif command == "history" and not args:
+        current = migrations.current_revision(database.engine)
+        for migration in migrations.load_migrations():
+            marker = " (current)" if migration.revision == current else ""
+            print(f"{migration.down_revision or 'base'} -> {migration.revision}{marker}: {migration.description}")
+    else:
+        print(USAGE)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,124 @@
+"""Baseline: the tables databases had before migrations existed
+
+Frozen copy of the schema ``create_all`` produced up to then (tasks,
+categories, sync, time tracking and habits). It never follows the
+models: later revisions build on exactly this. Databases created by
+``create_all`` back then already have these tables; ``checkfirst``
+leaves them alone and the revision is simply recorded.
+"""
+from sqlalchemy import (
+    BigInteger, Boolean, CheckConstraint, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData,
+    String, Table, Text, Time, UniqueConstraint, func, text,
+)
+from sqlalchemy.engine import Engine
+
+revision = "0001"
+down_revision = None
+
+metadata = MetaData()
+
+Table(
+    "categories", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, unique=True, index=True),
+    Column("revision", Integer, nullable=True, index=True),
+    Column("updated_at", DateTime, nullable=True),
+)
+
+Table(
+    "tasks", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String(200), nullable=False, index=True),
+    Column("description", Text, nullable=True),
+    Column("completed", Boolean, nullable=False, index=True),
+    Column("schedule_type", String(20), nullable=True, index=True),
+    Column("unit", String(20), nullable=True),
+    Column("unit_value", Integer, nullable=True),
+    Column("start_date", Date, nullable=True, index=True),
+    Column("start_time", Time, nullable=True),
+    Column("end_time", Time, nullable=True),
+    Column("all_day", Boolean, nullable=False),
+    Column("habit_type", String(50), nullable=True, index=True),
+    Column("notes", Text, nullable=True),
+    Column("revision", Integer, nullable=True, index=True),
+    Column("updated_at", DateTime, nullable=True),
+    Column("category_id", Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True),
+)
+
+Table(
+    "sync_revision", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("value", Integer, nullable=False),
+    CheckConstraint("id = 1"),
+)
+
+Table(
+    "sync_tombstones", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("entity", String(20), nullable=False),
+    Column("entity_id", Integer, nullable=False),
+    Column("revision", Integer, nullable=False, index=True),
+    Column("deleted_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+)
+
+Table(
+    "time_entries", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False),
+    Column("started_at", DateTime, nullable=False),
+    Column("ended_at", DateTime, nullable=True),
+    Column("duration_seconds", Integer, nullable=True),
+    Column("quantity", Float, nullable=True),
+    Column("category_id", Integer, nullable=True),
+    Column("habit_type", String(50), nullable=True),
+    Column("created_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+    Index("ix_time_entries_task_started", "task_id", "started_at"),
+    Index(
+        "uq_time_entries_running", "task_id", unique=True,
+        sqlite_where=text("ended_at IS NULL"), postgresql_where=text("ended_at IS NULL"),
+    ),
+)
+
+Table(
+    "time_rollups", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("period", String(10), nullable=False),
+    Column("period_start", Date, nullable=False),
+    Column("dimension", String(20), nullable=False),
+    Column("key", String(50), nullable=False),
+    Column("planned_minutes", Integer, nullable=False),
+    Column("actual_seconds", Integer, nullable=False),
+    Column("quantity", Float, nullable=False),
+    Column("entries", Integer, nullable=False),
+    UniqueConstraint("period", "dimension", "period_start", "key", name="uq_time_rollups_bucket"),
+)
+
+Table(
+    "habit_completions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False),
+    Column("occurrence_date", Date, nullable=False),
+    Column("completed_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+    UniqueConstraint("task_id", "occurrence_date", name="uq_habit_completions_occurrence"),
+)
+
+Table(
+    "habit_stats", metadata,
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("current_streak", Integer, nullable=False),
+    Column("streak_start", Date, nullable=True),
+    Column("streak_end", Date, nullable=True),
+    Column("longest_streak", Integer, nullable=False),
+    Column("recent_mask", BigInteger, nullable=False),
+    Column("recent_anchor", Date, nullable=True),
+    Column("total_completions", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=True),
+)
+
+
+def upgrade(engine: Engine) -> None:
+    metadata.create_all(bind=engine, checkfirst=True)
+
+
+def downgrade(engine: Engine) -> None:
+    raise RuntimeError("The baseline cannot be reverted; drop the database instead")
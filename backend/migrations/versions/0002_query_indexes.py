@@ -0,0 +1,109 @@
+"""Composite and partial indexes for the hot task queries
+
+Replaces the single-column indexes the models used to declare on every
+filterable column (several of them never chosen by the planner, all of
+them paid for on each write) with indexes shaped after the crud queries:
+
+* ``ix_tasks_completed_start_date`` - pending/overdue filters, in date order
+* ``ix_tasks_start_date_time`` - one day's tasks, ordered by start time
+* ``ix_tasks_category_created`` - a category's tasks, newest first
+  (adds ``tasks.created_at``, backfilled from ``updated_at``)
+* ``ix_tasks_incomplete_start`` - partial, only tasks still to do
+
+``ix_tasks_start_date`` stays: it serves the default list order
+(``start_date NULLS FIRST, id``) without a sort step. The redundant
+indexes on primary keys are dropped as well.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Index, Integer, MetaData, Table, Time, text
+from sqlalchemy.engine import Engine
+
+revision = "0002"
+down_revision = "0001"
+
+# Só as colunas que os índices referem, como estavam nesta revisão
+_tasks = Table(
+    "tasks", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("completed", Boolean),
+    Column("start_date", Date),
+    Column("start_time", Time),
+    Column("created_at", DateTime),
+    Column("category_id", Integer),
+)
+
+DROPPED_INDEXES = {
+    "ix_tasks_id": "tasks (id)",
+    "ix_tasks_title": "tasks (title)",
+    "ix_tasks_completed": "tasks (completed)",
+    "ix_tasks_schedule_type": "tasks (schedule_type)",
+    "ix_tasks_habit_type": "tasks (habit_type)",
+    "ix_tasks_category_id": "tasks (category_id)",
+    "ix_categories_id": "categories (id)",
+    "ix_time_entries_id": "time_entries (id)",
+}
+
+INDEXES = (
+    Index("ix_tasks_completed_start_date", _tasks.c.completed, _tasks.c.start_date),
+    Index("ix_tasks_start_date_time", _tasks.c.start_date, _tasks.c.start_time),
+    Index("ix_tasks_category_created", _tasks.c.category_id, _tasks.c.created_at),
+    Index(
+        "ix_tasks_incomplete_start", _tasks.c.start_date, _tasks.c.start_time,
+        sqlite_where=text("completed = 0"), postgresql_where=text("completed = false"),
+    ),
+)
+NEW_INDEXES = tuple(index.name for index in INDEXES)
+
+
+def _columns(conn, table: str) -> set:
+    from sqlalchemy import inspect
+
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+@contextmanager
+def _without_trigger(conn, name: str):
+    # O preenchimento não é uma alteração das tarefas: não deve gerar revisões de sync
+    sql = None
+    if conn.dialect.name == "sqlite":
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"), {"name": name}
+        ).scalar()
+    if sql:
+        conn.execute(text(f"DROP TRIGGER {name}"))
+    yield
+    if sql:
+        conn.execute(text(sql))
+
+
+def upgrade(engine: Engine) -> None:
+    with engine.begin() as conn:
+        columns = _columns(conn, "tasks")
+        if "created_at" not in columns:
+            # SQLite não aceita um default não constante em ADD COLUMN: a coluna entra vazia e é preenchida
+            conn.execute(text("ALTER TABLE tasks ADD COLUMN created_at TIMESTAMP"))
+            source = "COALESCE(updated_at, CURRENT_TIMESTAMP)" if "updated_at" in columns else "CURRENT_TIMESTAMP"
+            with _without_trigger(conn, "tasks_sync_au"):
+                conn.execute(text(f"UPDATE tasks SET created_at = {source}"))
+
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        for index in INDEXES:
+            index.create(conn, checkfirst=True)
+
+        if conn.dialect.name == "sqlite":
+            # Estatísticas para o planeador escolher entre índices que começam pela mesma coluna
+            conn.execute(text("ANALYZE tasks"))
+
+
+def downgrade(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for name, target in DROPPED_INDEXES.items():
+            table = target.split(" ", 1)[0]
+            if conn.dialect.has_table(conn, table):
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+        # created_at fica: remover colunas em SQLite obriga a reconstruir a tabela
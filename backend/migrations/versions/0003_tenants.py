@@ -0,0 +1,169 @@
+"""Per-user ownership: user_id on every owned table, leading every index
+
+Existing rows become user 1 (``tenancy.DEFAULT_USER_ID``).
+
+* ``tasks``, ``categories``, ``time_entries``, ``time_rollups`` and
+  ``sync_tombstones`` get ``user_id``
+* the task and sync indexes are recreated with ``user_id`` first, so one
+  user's queries never read another user's index pages
+* category names become unique per user (``uq_categories_user_name``)
+* ``time_rollups`` buckets and ``sync_revision`` counters become per user;
+  SQLite cannot alter their constraints, so both tables are rebuilt
+* the sync triggers are reinstalled to bump the owner's counter
+"""
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table, Time, UniqueConstraint, text,
+)
+from sqlalchemy.engine import Engine
+
+revision = "0003"
+down_revision = "0002"
+
+metadata = MetaData()
+
+# Reconstruídas em SQLite (as restrições mudam)
+_sync_revision = Table(
+    "sync_revision", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("value", Integer, nullable=False),
+)
+
+_time_rollups = Table(
+    "time_rollups", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("period", String(10), nullable=False),
+    Column("period_start", Date, nullable=False),
+    Column("dimension", String(20), nullable=False),
+    Column("key", String(50), nullable=False),
+    Column("planned_minutes", Integer, nullable=False),
+    Column("actual_seconds", Integer, nullable=False),
+    Column("quantity", Float, nullable=False),
+    Column("entries", Integer, nullable=False),
+    UniqueConstraint("user_id", "period", "dimension", "period_start", "key", name="uq_time_rollups_bucket"),
+)
+
+# Só as colunas que os índices referem
+_tasks = Table(
+    "tasks", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("completed", Boolean),
+    Column("start_date", Date),
+    Column("start_time", Time),
+    Column("created_at", DateTime),
+    Column("category_id", Integer),
+    Column("revision", Integer),
+)
+
+_categories = Table(
+    "categories", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("name", String),
+    Column("revision", Integer),
+)
+
+INDEXES = (
+    Index("ix_tasks_user_start_date", _tasks.c.user_id, _tasks.c.start_date),
+    Index("ix_tasks_user_completed_start_date", _tasks.c.user_id, _tasks.c.completed, _tasks.c.start_date),
+    Index("ix_tasks_user_start_date_time", _tasks.c.user_id, _tasks.c.start_date, _tasks.c.start_time),
+    Index("ix_tasks_user_category_created", _tasks.c.user_id, _tasks.c.category_id, _tasks.c.created_at),
+    Index(
+        "ix_tasks_user_incomplete_start", _tasks.c.user_id, _tasks.c.start_date, _tasks.c.start_time,
+        sqlite_where=text("completed = 0"), postgresql_where=text("completed = false"),
+    ),
+    Index("ix_tasks_user_revision", _tasks.c.user_id, _tasks.c.revision),
+    Index("uq_categories_user_name", _categories.c.user_id, _categories.c.name, unique=True),
+    Index("ix_categories_user_revision", _categories.c.user_id, _categories.c.revision),
+)
+
+OWNED_TABLES = ("tasks", "categories", "time_entries", "time_rollups", "sync_tombstones")
+
+DROPPED_INDEXES = (
+    "ix_tasks_start_date",
+    "ix_tasks_revision",
+    "ix_tasks_completed_start_date",
+    "ix_tasks_start_date_time",
+    "ix_tasks_category_created",
+    "ix_tasks_incomplete_start",
+    "ix_categories_name",
+    "ix_categories_revision",
+    "ix_sync_tombstones_revision",
+)
+
+
+def _columns(conn, table: str) -> set:
+    from sqlalchemy import inspect
+
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _rebuild(conn, table, copy_sql: str) -> None:
+    # Renomeia, cria a tabela nova e copia as linhas
+    old = f"{table.name}_old"
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    table.create(conn)
+    conn.execute(text(copy_sql.format(old=old)))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+
+def _rebuild_sqlite(conn) -> None:
+    if "user_id" not in _columns(conn, "sync_revision"):
+        _rebuild(conn, _sync_revision,
+                 "INSERT INTO sync_revision (user_id, value) SELECT 1, value FROM {old}")
+
+    if "user_id" not in _columns(conn, "time_rollups"):
+        columns = "id, period, period_start, dimension, key, planned_minutes, actual_seconds, quantity, entries"
+        _rebuild(conn, _time_rollups,
+                 f"INSERT INTO time_rollups (user_id, {columns}) SELECT 1, {columns} FROM {{old}}")
+
+
+def _alter_postgresql(conn) -> None:
+    if "user_id" not in _columns(conn, "sync_revision"):
+        conn.execute(text("ALTER TABLE sync_revision DROP CONSTRAINT IF EXISTS sync_revision_id_check"))
+        conn.execute(text("ALTER TABLE sync_revision RENAME COLUMN id TO user_id"))
+    conn.execute(text("ALTER TABLE time_rollups DROP CONSTRAINT IF EXISTS uq_time_rollups_bucket"))
+
+
+def upgrade(engine: Engine) -> None:
+    from backend import sync
+
+    with engine.begin() as conn:
+        sqlite = conn.dialect.name == "sqlite"
+        if sqlite:
+            # Os triggers referem sync_revision: saem antes da reconstrução e voltam no fim
+            sync.drop_triggers(conn)
+            _rebuild_sqlite(conn)
+        else:
+            _alter_postgresql(conn)
+
+        for table in OWNED_TABLES:
+            if "user_id" not in _columns(conn, table):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1"))
+
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        columns = {table: _columns(conn, table) for table in ("tasks", "categories")}
+        for index in INDEXES:
+            # revision pode ainda não existir: install_sync cria-a com o índice
+            if {column.name for column in index.columns} <= columns[index.table.name]:
+                index.create(conn, checkfirst=True)
+        if not sqlite:
+            conn.execute(text(
+                "ALTER TABLE time_rollups ADD CONSTRAINT uq_time_rollups_bucket "
+                "UNIQUE (user_id, period, dimension, period_start, key)"
+            ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_sync_tombstones_user_revision ON sync_tombstones (user_id, revision)"
+        ))
+
+        if sqlite:
+            conn.execute(text("ANALYZE"))
+
+    sync.install_sync(engine)
+
+
+def downgrade(engine: Engine) -> None:
+    raise RuntimeError("0003 cannot be reverted: rows of different users would collide (categories, rollups)")
@@ -0,0 +1,60 @@
+"""Summary tables for the precomputed insights
+
+* ``insights_daily`` - per user and day, overall and per habit_type /
+  category: tasks, completed, planned minutes, habit completions
+* ``insights_overdue`` - daily pending / overdue snapshot per user
+* ``insights_dirty`` - buckets waiting for the refresher
+
+The tables start empty; ``analytics.install_analytics`` (run at startup)
+installs the triggers and marks every existing day for the refresher.
+"""
+from sqlalchemy import Column, Date, Integer, MetaData, String, Table
+from sqlalchemy.engine import Engine
+
+revision = "0004"
+down_revision = "0003"
+
+metadata = MetaData()
+
+Table(
+    "insights_daily", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("dimension", String(20), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("key", String(50), primary_key=True),
+    Column("tasks", Integer, nullable=False),
+    Column("completed", Integer, nullable=False),
+    Column("planned_minutes", Integer, nullable=False),
+    Column("completed_minutes", Integer, nullable=False),
+    Column("habit_completions", Integer, nullable=False),
+)
+
+Table(
+    "insights_overdue", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("day", Date, primary_key=True),
+    Column("pending", Integer, nullable=False),
+    Column("overdue", Integer, nullable=False),
+)
+
+Table(
+    "insights_dirty", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("day", Date, primary_key=True),
+)
+
+
+def upgrade(engine: Engine) -> None:
+    metadata.create_all(bind=engine, checkfirst=True)
+
+
+def downgrade(engine: Engine) -> None:
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for name in ("tasks_insights_ai", "tasks_insights_au", "tasks_insights_au_habits",
+                     "tasks_insights_bd", "tasks_insights_ad",
+                     "habit_completions_insights_ai", "habit_completions_insights_ad"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        for table in ("insights_dirty", "insights_overdue", "insights_daily"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
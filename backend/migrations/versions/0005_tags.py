@@ -0,0 +1,49 @@
+"""Task tags: ``tags`` and the ``task_tags`` assignments
+
+``tags.install_tags`` (run at startup) adds the triggers that drop the
+assignments of deleted tasks and tags.
+"""
+from sqlalchemy import Column, ForeignKeyConstraint, Index, Integer, MetaData, String, Table
+from sqlalchemy.engine import Engine
+
+revision = "0005"
+down_revision = "0004"
+
+metadata = MetaData()
+
+# Referida pelas chaves estrangeiras; vem de revisões anteriores e não é criada aqui
+Table("tasks", metadata, Column("id", Integer, primary_key=True))
+
+_tags = Table(
+    "tags", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("name", String(50), nullable=False),
+    Column("kind", String(20), nullable=False),
+    Column("color", String(20)),
+    Index("uq_tags_user_name", "user_id", "name", unique=True),
+)
+
+_task_tags = Table(
+    "task_tags", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("tag_id", Integer, primary_key=True),
+    Column("task_id", Integer, primary_key=True),
+    ForeignKeyConstraint(["tag_id"], ["tags.id"], ondelete="CASCADE"),
+    ForeignKeyConstraint(["task_id"], ["tasks.id"], ondelete="CASCADE"),
+    Index("ix_task_tags_task", "task_id"),
+)
+
+
+def upgrade(engine: Engine) -> None:
+    metadata.create_all(bind=engine, tables=[_tags, _task_tags], checkfirst=True)
+
+
+def downgrade(engine: Engine) -> None:
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for trigger in ("tasks_tags_ad", "tags_tags_ad"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        for table in ("task_tags", "tags"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
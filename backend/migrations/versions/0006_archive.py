@@ -0,0 +1,132 @@
+"""Task archive: ``tasks_archive`` and task ids that are never reused
+
+* ``tasks_archive`` holds the tasks ``backend/archive.py`` moves out of
+  the hot table, with the same columns and ids
+* SQLite: ``tasks`` is rebuilt with AUTOINCREMENT. Without it a new task
+  can get the id of an archived one (SQLite reuses ids above the highest
+  remaining row), and lookups by id fall through to the archive
+* the sync and tag delete triggers are dropped; ``sync.install_sync`` and
+  ``tags.install_tags`` reinstall them so that archiving a task leaves
+  no tombstone and keeps its tags
+"""
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, Time, func, text,
+)
+from sqlalchemy.engine import Engine
+
+revision = "0006"
+down_revision = "0005"
+
+metadata = MetaData()
+
+# Referida pela chave estrangeira de tasks; vem de revisões anteriores
+Table("categories", metadata, Column("id", Integer, primary_key=True))
+
+
+def _task_columns() -> list:
+    # As colunas de tasks nesta revisão, partilhadas pela tabela reconstruída e pelo arquivo
+    return [
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("title", String(200), nullable=False),
+        Column("description", Text),
+        Column("completed", Boolean, nullable=False),
+        Column("schedule_type", String(20)),
+        Column("unit", String(20)),
+        Column("unit_value", Integer),
+        Column("start_date", Date),
+        Column("start_time", Time),
+        Column("end_time", Time),
+        Column("all_day", Boolean, nullable=False),
+        Column("habit_type", String(50)),
+        Column("notes", Text),
+        Column("revision", Integer),
+        Column("updated_at", DateTime),
+        Column("created_at", DateTime),
+        Column("category_id", Integer),
+    ]
+
+
+TASK_COLUMNS = [column.name for column in _task_columns()]
+
+_tasks = Table(
+    "tasks", metadata,
+    *[column for column in _task_columns() if column.name != "category_id"],
+    Column("category_id", Integer, ForeignKey("categories.id", ondelete="SET NULL")),
+    Index("ix_tasks_user_start_date", "user_id", "start_date"),
+    Index("ix_tasks_user_completed_start_date", "user_id", "completed", "start_date"),
+    Index("ix_tasks_user_start_date_time", "user_id", "start_date", "start_time"),
+    Index("ix_tasks_user_category_created", "user_id", "category_id", "created_at"),
+    Index(
+        "ix_tasks_user_incomplete_start", "user_id", "start_date", "start_time",
+        sqlite_where=text("completed = 0"), postgresql_where=text("completed = false"),
+    ),
+    Index("ix_tasks_user_revision", "user_id", "revision"),
+    sqlite_autoincrement=True,
+)
+
+_tasks_archive = Table(
+    "tasks_archive", metadata,
+    *_task_columns(),
+    Column("archived_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+    Index("ix_tasks_archive_user_start_date", "user_id", "start_date"),
+)
+
+# Reinstalados (com a condição do arquivo) no arranque
+REPLACED_TRIGGERS = ("tasks_sync_ad", "tasks_tags_ad")
+
+
+def _rebuild_autoincrement(conn) -> None:
+    # Triggers que referem tasks (de tasks ou de outras tabelas) impedem a troca de tabelas: saem e voltam iguais
+    triggers = conn.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND (tbl_name = 'tasks' OR sql LIKE '%tasks%')"
+    )).all()
+    for name, _ in triggers:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS "{name}"'))
+    # Os índices são recriados com a tabela, com os mesmos nomes
+    for (name,) in conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks' AND sql IS NOT NULL"
+    )).all():
+        conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+
+    existing = {row[1] for row in conn.execute(text("PRAGMA table_info(tasks)"))}
+    columns = ", ".join(name for name in TASK_COLUMNS if name in existing)
+    # Sem reescrever as referências de outras tabelas (time_entries, task_tags, ...) para tasks_old
+    conn.execute(text("PRAGMA legacy_alter_table = ON"))
+    conn.execute(text("ALTER TABLE tasks RENAME TO tasks_old"))
+    _tasks.create(conn)
+    conn.execute(text(f"INSERT INTO tasks ({columns}) SELECT {columns} FROM tasks_old"))
+    conn.execute(text("DROP TABLE tasks_old"))
+    conn.execute(text("PRAGMA legacy_alter_table = OFF"))
+
+    for name, sql in triggers:
+        if name not in REPLACED_TRIGGERS:
+            conn.execute(text(sql))
+
+
+def upgrade(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _tasks_archive.create(conn, checkfirst=True)
+        if conn.dialect.name != "sqlite":
+            return
+        for trigger in REPLACED_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        schema = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'")).scalar()
+        if "AUTOINCREMENT" not in schema.upper():
+            _rebuild_autoincrement(conn)
+
+
+def downgrade(engine: Engine) -> None:
+    # As tarefas arquivadas voltam para tasks antes de a tabela desaparecer
+    from sqlalchemy import inspect
+
+    table = _tasks_archive.name
+    with engine.begin() as conn:
+        # Referem o arquivo; a versão anterior reinstala os seus
+        for trigger in REPLACED_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        if not inspect(conn).has_table(table):
+            return
+        columns = ", ".join(TASK_COLUMNS)
+        conn.execute(text(f"INSERT INTO tasks ({columns}) SELECT {columns} FROM {table}"))
+        conn.execute(text(f"DROP TABLE {table}"))
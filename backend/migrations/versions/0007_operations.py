@@ -0,0 +1,52 @@
+"""Offline operation log: ``sync_operations``, ``sync_client_ids`` and ``task_field_clocks``
+
+``sync.install_sync`` (run at startup) adds the triggers that keep the
+per-field clocks of ``tasks``.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func
+from sqlalchemy.engine import Engine
+
+revision = "0007"
+down_revision = "0006"
+
+metadata = MetaData()
+
+Table(
+    "task_field_clocks", metadata,
+    Column("task_id", Integer, primary_key=True, autoincrement=False),
+    Column("field", String(50), primary_key=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "sync_client_ids", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("client_id", String(64), primary_key=True),
+    Column("task_id", Integer, nullable=False),
+    Column("created_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+    Index("ix_sync_client_ids_user_created", "user_id", "created_at"),
+)
+
+Table(
+    "sync_operations", metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("op_id", String(64), primary_key=True),
+    Column("status", String(20), nullable=False),
+    Column("task_id", Integer),
+    Column("applied_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+    Index("ix_sync_operations_user_applied", "user_id", "applied_at"),
+)
+
+
+def upgrade(engine: Engine) -> None:
+    metadata.create_all(bind=engine, checkfirst=True)
+
+
+def downgrade(engine: Engine) -> None:
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for trigger in ("tasks_clock_au", "tasks_clock_ad"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        for table in ("sync_operations", "sync_client_ids", "task_field_clocks"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, Index, Table
+from sqlalchemy.sql import func
+from backend.database import Base
+from backend.models.task import Task
+
+class ArchivedTask(Base):
+    """A task moved out of the hot ``tasks`` table by backend/archive.py: the same columns plus archived_at"""
+    __table__ = Table(
+        "tasks_archive",
+        Base.metadata,
+        # Mesmas colunas (e o mesmo id) que em tasks, para mover linhas com INSERT ... SELECT
+        *[column._copy() for column in Task.__table__.columns],
+        Column("archived_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+        # Leituras que caem no arquivo: por intervalo de datas de um utilizador
+        Index("ix_tasks_archive_user_start_date", "user_id", "start_date"),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedTask(id={self.id}, title='{self.title}')>"
@@ -1,11 +1,25 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.orm import relationship
+from backend import tenancy
 from backend.database import Base
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        # Nomes únicos por utilizador
+        Index("uq_categories_user_name", "user_id", "name", unique=True),
+        Index("ix_categories_user_revision", "user_id", "revision"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
+    name = Column(String)
 
-    tasks = relationship("Task", back_populates="category")
+    # Sync (mantidos por triggers, ver backend/sync.py)
+    revision = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+    tasks = relationship(
+        "Task", back_populates="category",
+        primaryjoin="and_(Category.id == Task.category_id, Category.user_id == Task.user_id)",
+    )
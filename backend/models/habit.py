@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, BigInteger, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from backend.database import Base
+
+class HabitCompletion(Base):
+    """One completed occurrence of a recurring task"""
+    __tablename__ = "habit_completions"
+    __table_args__ = (
+        UniqueConstraint("task_id", "occurrence_date", name="uq_habit_completions_occurrence"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    occurrence_date = Column(Date, nullable=False)
+    completed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<HabitCompletion(task_id={self.task_id}, occurrence_date={self.occurrence_date})>"
+
+
+class HabitStats(Base):
+    """Streak and recent-completion state of a habit, updated on every completion (see backend/habits.py)"""
+    __tablename__ = "habit_stats"
+
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+
+    # Sequência mais recente de ocorrências seguidas concluídas
+    current_streak = Column(Integer, nullable=False, default=0)
+    streak_start = Column(Date, nullable=True)
+    streak_end = Column(Date, nullable=True)
+    longest_streak = Column(Integer, nullable=False, default=0)
+
+    # Bit i = ocorrência de (recent_anchor - i dias) concluída
+    recent_mask = Column(BigInteger, nullable=False, default=0)
+    recent_anchor = Column(Date, nullable=True)
+
+    total_completions = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True, onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<HabitStats(task_id={self.task_id}, current={self.current_streak}, longest={self.longest_streak})>"
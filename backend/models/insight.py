@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, String, Date, PrimaryKeyConstraint
+from backend.database import Base
+
+class InsightDaily(Base):
+    """Per-user task aggregates of one day (start_date), overall and per habit_type / category (see backend/analytics.py)"""
+    __tablename__ = "insights_daily"
+    __table_args__ = (
+        # Serve as leituras: utilizador + dimensão + intervalo de dias
+        PrimaryKeyConstraint("user_id", "dimension", "day", "key"),
+    )
+
+    user_id = Column(Integer, nullable=False)
+    dimension = Column(String(20), nullable=False)                # "all", "habit_type" ou "category"
+    day = Column(Date, nullable=False)
+    key = Column(String(50), nullable=False)                      # habit_type ou id da categoria; "" = sem valor / total
+
+    tasks = Column(Integer, nullable=False, default=0)            # tarefas com start_date neste dia
+    completed = Column(Integer, nullable=False, default=0)
+    planned_minutes = Column(Integer, nullable=False, default=0)
+    completed_minutes = Column(Integer, nullable=False, default=0)  # planeado das tarefas concluídas
+    habit_completions = Column(Integer, nullable=False, default=0)  # ocorrências de hábitos concluídas neste dia
+
+    def __repr__(self):
+        return f"<InsightDaily({self.user_id} {self.day} {self.dimension}={self.key!r})>"
+
+
+class InsightOverdue(Base):
+    """Snapshot of a user's pending and overdue task counts on a day, for the overdue trend"""
+    __tablename__ = "insights_overdue"
+    __table_args__ = (PrimaryKeyConstraint("user_id", "day"),)
+
+    user_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    pending = Column(Integer, nullable=False, default=0)
+    overdue = Column(Integer, nullable=False, default=0)
+
+
+class InsightDirty(Base):
+    """(user, day) buckets written since the last refresh; filled by triggers, drained by the refresher"""
+    __tablename__ = "insights_dirty"
+    __table_args__ = (PrimaryKeyConstraint("user_id", "day"),)
+
+    user_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
@@ -0,0 +1,69 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from backend import tenancy
+from backend.database import Base
+
+class SyncRevision(Base):
+    """Per-user counter shared by that user's tasks and categories; bumped on every write"""
+    __tablename__ = "sync_revision"
+
+    user_id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class Tombstone(Base):
+    """Record of a deleted row, so clients can sync deletions"""
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_revision", "user_id", "revision"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
+    entity = Column(String(20), nullable=False)                   # "task" ou "category"
+    entity_id = Column(Integer, nullable=False)
+    revision = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<Tombstone(entity='{self.entity}', entity_id={self.entity_id}, revision={self.revision})>"
+
+
+class FieldClock(Base):
+    """When each field of a task was last written, for per-field last-writer-wins (kept by triggers, see backend/sync.py)"""
+    __tablename__ = "task_field_clocks"
+
+    task_id = Column(Integer, primary_key=True)
+    field = Column(String(50), primary_key=True)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class ClientTaskId(Base):
+    """Server id of a task created offline, by the id the client gave it"""
+    __tablename__ = "sync_client_ids"
+    __table_args__ = (
+        Index("ix_sync_client_ids_user_created", "user_id", "created_at"),
+    )
+
+    user_id = Column(Integer, primary_key=True, default=tenancy.current_user_id)
+    client_id = Column(String(64), primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+class AppliedOperation(Base):
+    """An offline operation already replayed, so that resending it changes nothing"""
+    __tablename__ = "sync_operations"
+    __table_args__ = (
+        # Limpeza das operações antigas
+        Index("ix_sync_operations_user_applied", "user_id", "applied_at"),
+    )
+
+    user_id = Column(Integer, primary_key=True, default=tenancy.current_user_id)
+    op_id = Column(String(64), primary_key=True)
+    status = Column(String(20), nullable=False)
+    task_id = Column(Integer, nullable=True)
+    applied_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<AppliedOperation(op_id='{self.op_id}', status='{self.status}')>"
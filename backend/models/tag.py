@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, PrimaryKeyConstraint
+from backend import tenancy
+from backend.database import Base
+
+class Tag(Base):
+    """A user's label for tasks: a free tag or a result label such as "High Effort / Low Outcome" """
+    __tablename__ = "tags"
+    __table_args__ = (
+        # Nomes únicos por utilizador (as expressões de filtro usam o nome)
+        Index("uq_tags_user_name", "user_id", "name", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
+    name = Column(String(50), nullable=False)
+    kind = Column(String(20), nullable=False, default="tag")    # "tag" ou "result"
+    color = Column(String(20), nullable=True)
+
+    def __repr__(self):
+        return f"<Tag(id={self.id}, name='{self.name}')>"
+
+
+class TaskTag(Base):
+    """Assignment of a tag to a task; the rows behind the in-memory posting bitmaps (see backend/tags.py)"""
+    __tablename__ = "task_tags"
+    __table_args__ = (
+        # Carregar o índice de um utilizador lê só as linhas dele, já agrupadas por tag
+        PrimaryKeyConstraint("user_id", "tag_id", "task_id"),
+        # Tags de uma tarefa e limpeza quando a tarefa é apagada
+        Index("ix_task_tags_task", "task_id"),
+    )
+
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
@@ -1,35 +1,69 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Time, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Time, DateTime, Text, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
+from backend import tenancy
 from backend.database import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    # Índices desenhados para as consultas do crud (ver backend/migrations/versions/0003_tenants.py).
+    # user_id vem sempre primeiro: as consultas de um utilizador só lêem as páginas dele
+    __table_args__ = (
+        # Lista por omissão: start_date NULLS FIRST, id
+        Index("ix_tasks_user_start_date", "user_id", "start_date"),
+        # Tarefas pendentes / em atraso: completed = ? AND start_date < ? ORDER BY start_date, id
+        Index("ix_tasks_user_completed_start_date", "user_id", "completed", "start_date"),
+        # Hoje: start_date = ? ORDER BY start_time
+        Index("ix_tasks_user_start_date_time", "user_id", "start_date", "start_time"),
+        # Por categoria, mais recentes primeiro
+        Index("ix_tasks_user_category_created", "user_id", "category_id", "created_at"),
+        # Só as tarefas por fazer (upcoming / overdue); fica pequeno à medida que se concluem
+        Index(
+            "ix_tasks_user_incomplete_start", "user_id", "start_date", "start_time",
+            sqlite_where=text("completed = 0"), postgresql_where=text("completed = false"),
+        ),
+        # Delta sync por utilizador
+        Index("ix_tasks_user_revision", "user_id", "revision"),
+        # Ids nunca reutilizados: os de tarefas arquivadas continuam a identificá-las (ver backend/archive.py)
+        {"sqlite_autoincrement": True},
+    )
 
     # Primary key
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
+    
+    # Dono (ver backend/tenancy.py)
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
     
     # Basic task info
-    title = Column(String(200), nullable=False, index=True)
+    title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
-    completed = Column(Boolean, default=False, nullable=False, index=True)
+    completed = Column(Boolean, default=False, nullable=False)
     
     # Schedule and timing
-    schedule_type = Column(String(20), nullable=True, index=True)  # "weekly", "daily", etc.
+    schedule_type = Column(String(20), nullable=True)              # "weekly", "daily", etc.
     unit = Column(String(20), nullable=True)                      # e.g., "minutes"
     unit_value = Column(Integer, nullable=True)                   # e.g., 30
-    start_date = Column(Date, nullable=True, index=True)          # e.g., 2025-09-08
+    start_date = Column(Date, nullable=True)                      # e.g., 2025-09-08
     start_time = Column(Time, nullable=True)                      # e.g., 08:00
     end_time = Column(Time, nullable=True)                        # e.g., 09:00
     all_day = Column(Boolean, default=False, nullable=False)      # all-day event
     
     # Categorization
-    habit_type = Column(String(50), nullable=True, index=True)    # e.g., "health"
+    habit_type = Column(String(50), nullable=True)                # e.g., "health"
     notes = Column(Text, nullable=True)                           # extra notes
     
+    # Sync (mantidos por triggers, ver backend/sync.py)
+    revision = Column(Integer, nullable=True)                     # revisão do utilizador na última escrita
+    updated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=True, default=func.current_timestamp())
+    
     # Relationships
-    category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True)
-    category = relationship("Category", back_populates="tasks")
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
+    # Só categorias do mesmo utilizador, mesmo que category_id aponte para outra
+    category = relationship(
+        "Category", back_populates="tasks",
+        primaryjoin="and_(Task.category_id == Category.id, Task.user_id == Category.user_id)",
+    )
     
     def __repr__(self):
         return f"<Task(id={self.id}, title='{self.title}', completed={self.completed})>"
@@ -0,0 +1,71 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func, text
+from backend import tenancy
+from backend.database import Base
+
+class TimeEntry(Base):
+    """Time logged against a task. Append-only: entries are created, stopped once and deleted, never edited"""
+    __tablename__ = "time_entries"
+    __table_args__ = (
+        # Listagem das entradas de uma task
+        Index("ix_time_entries_task_started", "task_id", "started_at"),
+        # No máximo um timer a correr por task
+        Index(
+            "uq_time_entries_running", "task_id", unique=True,
+            sqlite_where=text("ended_at IS NULL"), postgresql_where=text("ended_at IS NULL"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=True)                    # NULL enquanto o timer corre
+    duration_seconds = Column(Integer, nullable=True)             # preenchido ao parar / registar
+    quantity = Column(Float, nullable=True)                       # e.g., 500 (ml de água)
+
+    # Atribuição no momento do registo, para as rollups poderem ser revertidas com exatidão
+    category_id = Column(Integer, nullable=True)
+    habit_type = Column(String(50), nullable=True)
+
+    created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<TimeEntry(id={self.id}, task_id={self.task_id}, duration_seconds={self.duration_seconds})>"
+
+    @property
+    def running(self):
+        """Whether the timer is still running"""
+        return self.ended_at is None
+
+    @property
+    def duration_minutes(self):
+        """Logged duration in minutes"""
+        if self.duration_seconds is None:
+            return None
+        return round(self.duration_seconds / 60, 2)
+
+
+class TimeRollup(Base):
+    """Pre-aggregated planned vs actual time per user and (period, dimension, key), kept up to date on every entry write"""
+    __tablename__ = "time_rollups"
+    __table_args__ = (
+        # Serve também as consultas do resumo: period + dimension + intervalo de datas
+        UniqueConstraint("user_id", "period", "dimension", "period_start", "key", name="uq_time_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=tenancy.current_user_id)
+    period = Column(String(10), nullable=False)                   # "day" ou "week" (semana ISO, começa à segunda)
+    period_start = Column(Date, nullable=False)
+    dimension = Column(String(20), nullable=False)                # "task", "category" ou "habit_type"
+    key = Column(String(50), nullable=False)                      # id da task/categoria ou habit_type; "" = sem valor
+
+    planned_minutes = Column(Integer, nullable=False, default=0)
+    actual_seconds = Column(Integer, nullable=False, default=0)
+    quantity = Column(Float, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TimeRollup({self.period} {self.period_start} {self.dimension}={self.key!r})>"
@@ -0,0 +1,172 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, Optional
+
+
+# Passo (em dias) para os tipos de repetição com intervalo fixo
+DAY_STEPS = {
+    "daily": 1,
+    "every_other_day": 2,
+    "weekly": 7,
+}
+
+# Passo (em meses) para os tipos de repetição baseados no calendário
+MONTH_STEPS = {
+    "monthly": 1,
+    "yearly": 12,
+}
+
+# Conversão de "unit" para o passo de uma repetição "custom"
+CUSTOM_DAY_UNITS = {"days": 1, "weeks": 7}
+CUSTOM_MONTH_UNITS = {"months": 1}
+
+
+def _add_months(anchor: date, months: int) -> date:
+    """Shift a date by whole months, clamping to the last day of the month"""
+    month_index = anchor.month - 1 + months
+    year = anchor.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(anchor.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    """A recurrence anchored on start, repeating every days or every months"""
+    start: date
+    days: int = 0
+    months: int = 0
+
+    @property
+    def repeats(self) -> bool:
+        return bool(self.days or self.months)
+
+    def _first_index(self, window_start: date) -> int:
+        """Index of the first occurrence on or after window_start, without iterating"""
+        if window_start <= self.start:
+            return 0
+
+        if self.days:
+            delta = (window_start - self.start).days
+            return -(-delta // self.days)
+
+        elapsed = (window_start.year - self.start.year) * 12 + window_start.month - self.start.month
+        index = max(elapsed // self.months, 0)
+        # Clamping pode colocar a ocorrência antes da janela; avança no máximo um passo
+        if _add_months(self.start, index * self.months) < window_start:
+            index += 1
+        return index
+
+    def _last_index(self, day: date) -> int:
+        """Index of the last occurrence on or before day (-1 if day is before start)"""
+        if day < self.start:
+            return -1
+        if not self.repeats:
+            return 0
+
+        if self.days:
+            return (day - self.start).days // self.days
+
+        elapsed = (day.year - self.start.year) * 12 + day.month - self.start.month
+        index = elapsed // self.months
+        if _add_months(self.start, index * self.months) > day:
+            index -= 1
+        return index
+
+    def occurrence(self, index: int) -> date:
+        if self.days:
+            return self.start + timedelta(days=index * self.days)
+        return _add_months(self.start, index * self.months)
+
+    def on_or_before(self, day: date) -> Optional[date]:
+        """The last occurrence on or before day"""
+        index = self._last_index(day)
+        return self.occurrence(index) if index >= 0 else None
+
+    def before(self, day: date) -> Optional[date]:
+        """The last occurrence strictly before day"""
+        return self.on_or_before(day - timedelta(days=1))
+
+    def after(self, day: date) -> Optional[date]:
+        """The first occurrence strictly after day"""
+        if not self.repeats:
+            return self.start if self.start > day else None
+        return self.occurrence(self._first_index(day + timedelta(days=1)))
+
+    def is_occurrence(self, day: date) -> bool:
+        return self.on_or_before(day) == day
+
+    def count(self, window_start: date, window_end: date) -> int:
+        """Number of occurrences in [window_start, window_end], in constant time"""
+        if window_end < window_start:
+            return 0
+        if not self.repeats:
+            return int(window_start <= self.start <= window_end)
+        return max(self._last_index(window_end) - self._first_index(window_start) + 1, 0)
+
+    def between(self, window_start: date, window_end: date) -> Iterator[date]:
+        """Lazily yield occurrences in [window_start, window_end]"""
+        if window_end < self.start or window_end < window_start:
+            return
+
+        if not self.repeats:
+            if self.start >= window_start:
+                yield self.start
+            return
+
+        index = self._first_index(window_start)
+        if self.days:
+            current = self.start + timedelta(days=index * self.days)
+            step = timedelta(days=self.days)
+            while current <= window_end:
+                yield current
+                current += step
+        else:
+            while True:
+                current = _add_months(self.start, index * self.months)
+                if current > window_end:
+                    return
+                yield current
+                index += 1
+
+
+def rule_for(
+    start_date: Optional[date],
+    schedule_type: Optional[str],
+    unit: Optional[str] = None,
+    unit_value: Optional[int] = None,
+) -> Optional[RecurrenceRule]:
+    """Build the recurrence rule for a task's schedule fields"""
+    if start_date is None:
+        return None
+
+    if schedule_type in DAY_STEPS:
+        return RecurrenceRule(start_date, days=DAY_STEPS[schedule_type])
+
+    if schedule_type in MONTH_STEPS:
+        return RecurrenceRule(start_date, months=MONTH_STEPS[schedule_type])
+
+    if schedule_type == "custom" and unit_value:
+        if unit in CUSTOM_DAY_UNITS:
+            return RecurrenceRule(start_date, days=CUSTOM_DAY_UNITS[unit] * unit_value)
+        if unit in CUSTOM_MONTH_UNITS:
+            return RecurrenceRule(start_date, months=CUSTOM_MONTH_UNITS[unit] * unit_value)
+
+    # Sem repetição conhecida: a tarefa acontece só no start_date
+    return RecurrenceRule(start_date)
+
+
+def task_rule(task) -> Optional[RecurrenceRule]:
+    """Build the recurrence rule for a Task row"""
+    return rule_for(task.start_date, task.schedule_type, task.unit, task.unit_value)
+
+
+def expand(tasks, window_start: date, window_end: date) -> Iterator[tuple]:
+    """Yield (occurrence_date, task) pairs for every task inside the window"""
+    for task in tasks:
+        rule = task_rule(task)
+        if rule is None:
+            continue
+        for occurrence in rule.between(window_start, window_end):
+            yield occurrence, task
@@ -0,0 +1,384 @@
+"""In-process reminder scheduler for tasks and habits.
+
+Every task with a future occurrence has one entry in a min-heap, keyed on
+the time its next reminder is due: the occurrence (``start_date`` and
+the ``schedule_type`` recurrence, see ``backend.recurrence``) at its
+``start_time`` - or ``REMINDER_DEFAULT_TIME`` for all-day / untimed
+tasks - minus ``REMINDER_LEAD_MINUTES``. One thread sleeps until the top
+of the heap is due; nothing polls the tasks table.
+
+* Startup (the app lifespan) fills the heap in one streaming pass over
+  the tasks that can still fire and heapifies it once.
+* Writes keep it current: the scheduler subscribes to the change-event
+  broker like the WebSocket hub does, and each ``task.*`` event replaces
+  that task's entry (superseded heap entries are skipped when popped and
+  compacted away when they pile up). An import reloads the user's tasks.
+* When an entry is due the task is re-read: deleted tasks, completed
+  one-off tasks and habit occurrences already done are skipped, and a
+  schedule changed behind the scheduler's back is rescheduled instead of
+  fired. Recurring tasks are then pushed again for their next occurrence.
+
+Reminders go to a pluggable sink, ``REMINDER_SINK``: ``log`` (default),
+``queue`` (kept in memory, for tests), ``events`` (a ``reminder.due``
+event to the owner's WebSockets) or ``"module:Class"``. Reminders due
+while the server was down are not replayed.
+
+Each process runs its own scheduler: with several workers set
+``REMINDERS_ENABLED=0`` on all but one (and use a shared events broker so
+it sees every worker's writes).
+"""
+import heapq
+import importlib
+import json
+import logging
+import os
+import threading
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, or_, select, tuple_
+
+from backend import events, recurrence, tenancy
+from backend.models import habit as habit_models, task as task_models
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "1").lower() not in ("0", "false", "no")
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "10"))
+REMINDER_DEFAULT_TIME = time.fromisoformat(os.getenv("REMINDER_DEFAULT_TIME", "09:00"))
+REMINDER_SINK = os.getenv("REMINDER_SINK", "log")
+REMINDER_QUEUE_SIZE = int(os.getenv("REMINDER_QUEUE_SIZE", "1000"))
+REMINDER_BATCH_SIZE = 5000
+
+_LEAD = timedelta(minutes=REMINDER_LEAD_MINUTES)
+_ONE_DAY = timedelta(days=1)
+
+# Acorda pelo menos a cada minuto: apanha mudanças do relógio do sistema
+_MAX_SLEEP_SECONDS = 60.0
+
+# Colunas que definem quando (e se) uma tarefa dispara
+SCHEDULE_COLUMNS = ("id", "user_id", "start_date", "start_time", "all_day", "schedule_type", "unit", "unit_value", "completed")
+
+
+@dataclass(frozen=True)
+class Reminder:
+    user_id: int
+    task_id: int
+    title: str
+    occurrence: date
+    at: datetime                               # quando a tarefa começa
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "occurrence": self.occurrence.isoformat(), "at": self.at.isoformat()}
+
+
+def next_fire(task, now: datetime) -> Optional[tuple]:
+    """(fire_at, occurrence) of the first reminder of task due after now, or None"""
+    rule = recurrence.task_rule(task)
+    if rule is None or (task.completed and not rule.repeats):
+        return None
+    at = task.start_time if task.start_time and not task.all_day else REMINDER_DEFAULT_TIME
+
+    # Primeira ocorrência a partir do dia em que o aviso ainda pode estar no futuro
+    occurrence = rule.after((now + _LEAD).date() - _ONE_DAY)
+    while occurrence is not None:
+        fire_at = datetime.combine(occurrence, at) - _LEAD
+        if fire_at > now:
+            return fire_at, occurrence
+        occurrence = rule.after(occurrence)
+    return None
+
+
+def _from_payload(data: dict) -> SimpleNamespace:
+    # Payload JSON de um evento task.* -> os campos de agenda com os tipos das colunas
+    task = SimpleNamespace(**{name: data.get(name) for name in SCHEDULE_COLUMNS})
+    task.start_date = date.fromisoformat(task.start_date) if task.start_date else None
+    task.start_time = time.fromisoformat(task.start_time) if task.start_time else None
+    return task
+
+
+# -------------------------------
+# Sinks
+# -------------------------------
+class ReminderSink:
+    """Where due reminders are delivered"""
+
+    def send(self, reminder: Reminder) -> None:
+        raise NotImplementedError
+
+
+class LogSink(ReminderSink):
+    def send(self, reminder: Reminder) -> None:
+        logger.info("Reminder for user %s: task %s %r at %s", reminder.user_id, reminder.task_id,
+                    reminder.title, reminder.at.isoformat(timespec="minutes"))
+
+
+class QueueSink(ReminderSink):
+    """Keeps the last REMINDER_QUEUE_SIZE reminders in memory (tests, local development)"""
+
+    def __init__(self, maxlen: int = REMINDER_QUEUE_SIZE):
+        self.sent = deque(maxlen=maxlen)
+
+    def send(self, reminder: Reminder) -> None:
+        self.sent.append(reminder)
+
+
+class EventSink(ReminderSink):
+    """Pushes a reminder.due event to the owner's WebSocket connections"""
+
+    def send(self, reminder: Reminder) -> None:
+        events.emit("reminder.due", reminder.task_id, reminder.as_dict, user_id=reminder.user_id)
+
+
+SINKS = {"log": LogSink, "queue": QueueSink, "events": EventSink}
+
+
+def _load_sink() -> ReminderSink:
+    if REMINDER_SINK in SINKS:
+        return SINKS[REMINDER_SINK]()
+    module_name, _, class_name = REMINDER_SINK.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# -------------------------------
+# Scheduler
+# -------------------------------
+class Scheduler:
+    """Min-heap of the next reminder per task, drained by one background thread"""
+
+    def __init__(self, sink: ReminderSink):
+        self.sink = sink
+        self.counters = Counter()
+        self._heap = []                        # (fire_at, user_id, task_id, occurrence)
+        self._entries = {}                     # (user_id, task_id) -> entrada em vigor no heap
+        self._reloads = set()                  # utilizadores a recarregar (importações)
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        events.broker.subscribe(self)
+
+    @property
+    def connection_count(self) -> int:
+        # Para o broker: enquanto corre, os eventos têm de ser construídos mesmo sem WebSockets
+        return int(self._running)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Estado do heap (sempre com self._condition)
+    def _set(self, key: tuple, fire: Optional[tuple]) -> None:
+        if fire is None:
+            self._entries.pop(key, None)
+            return
+        entry = (fire[0], key[0], key[1], fire[1])
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        # Entradas substituídas ficam no heap até saírem; compacta quando já são a maioria
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+        if self._heap[0] is entry:
+            self._condition.notify()
+
+    def schedule(self, task, now: Optional[datetime] = None) -> None:
+        """Replace the task's entry from its schedule fields"""
+        with self._condition:
+            self._set((task.user_id, task.id), next_fire(task, now or datetime.now()))
+
+    def unschedule(self, user_id: int, task_id: int) -> None:
+        with self._condition:
+            self._entries.pop((user_id, task_id), None)
+
+    def receive(self, event: str) -> None:
+        """Broker callback (any thread): keep the heap in step with task writes"""
+        if not self._running:
+            return
+        data = json.loads(event)
+        event_type = data["type"]
+        if event_type == "task.deleted":
+            self.unschedule(data["user_id"], data["id"])
+        elif event_type == "tasks.imported":
+            with self._condition:
+                self._reloads.add(data["user_id"])
+                self._condition.notify()
+        elif event_type.startswith("task.") and "data" in data:
+            self.schedule(_from_payload(data["data"]))
+
+    # Reconstrução a partir da BD
+    def _rows(self, user_id: Optional[int] = None) -> Iterable:
+        tasks = task_models.Task.__table__
+        query = select(*[tasks.c[name] for name in SCHEDULE_COLUMNS]).where(
+            tasks.c.start_date.isnot(None),
+            # Tarefas únicas já passadas ou feitas nunca mais disparam
+            or_(tasks.c.schedule_type.isnot(None),
+                and_(tasks.c.completed == False, tasks.c.start_date >= date.today() - timedelta(days=1))),  # noqa: E712
+        )
+        if user_id is not None:
+            query = tenancy.owned(query, tasks)
+        with tenancy.strategy.engine().connect() as conn:
+            result = conn.execution_options(yield_per=REMINDER_BATCH_SIZE).execute(query)
+            for rows in result.partitions():
+                yield from rows
+
+    def rebuild(self) -> int:
+        """Fill the heap from every database in one streaming pass; returns the number of entries"""
+        now = datetime.now()
+        entries = {}
+        for user_id in tenancy.strategy.partitions():
+            with tenancy.as_user(user_id or tenancy.DEFAULT_USER_ID):
+                for row in self._rows():
+                    fire = next_fire(row, now)
+                    if fire is not None:
+                        entries[(row.user_id, row.id)] = (fire[0], row.user_id, row.id, fire[1])
+        with self._condition:
+            # Escritas que chegaram durante a leitura ganham à cópia lida
+            entries.update(self._entries)
+            self._entries = entries
+            self._heap = list(entries.values())
+            heapq.heapify(self._heap)
+            self._condition.notify()
+        return len(entries)
+
+    def reload_user(self, user_id: int) -> None:
+        """Replace every entry of user_id from the database"""
+        now = datetime.now()
+        with tenancy.as_user(user_id):
+            fires = [((row.user_id, row.id), next_fire(row, now)) for row in self._rows(user_id)]
+        with self._condition:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+            for key, fire in fires:
+                self._set(key, fire)
+
+    # Disparo
+    def _pop_due(self, now: datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._entries.get((entry[1], entry[2])) is entry:
+                del self._entries[(entry[1], entry[2])]
+                due.append(entry)
+        return due
+
+    def _fire(self, due: list, now: datetime) -> None:
+        by_user = {}
+        for entry in due:
+            by_user.setdefault(entry[1], []).append(entry)
+        for user_id, entries in by_user.items():
+            with tenancy.as_user(user_id):
+                self._fire_user(entries, now)
+
+    def _fire_user(self, entries: list, now: datetime) -> None:
+        tasks = task_models.Task.__table__
+        completions = habit_models.HabitCompletion.__table__
+        # Relê as tarefas: o heap pode estar atrasado em relação a escritas de outros processos
+        with tenancy.strategy.engine().connect() as conn:
+            rows = {row.id: row for row in conn.execute(
+                tenancy.owned(select(*[tasks.c[name] for name in SCHEDULE_COLUMNS], tasks.c.title), tasks)
+                .where(tasks.c.id.in_([entry[2] for entry in entries]))
+            )}
+            done = set(conn.execute(
+                select(completions.c.task_id, completions.c.occurrence_date).where(
+                    tuple_(completions.c.task_id, completions.c.occurrence_date).in_(
+                        [(entry[2], entry[3]) for entry in entries]
+                    )
+                )
+            ).all())
+
+        for fire_at, user_id, task_id, occurrence in entries:
+            row = rows.get(task_id)
+            if row is None:
+                self.counters["skipped"] += 1
+                continue
+            rule = recurrence.task_rule(row)
+            at = row.start_time if row.start_time and not row.all_day else REMINDER_DEFAULT_TIME
+            current = (
+                rule is not None and rule.is_occurrence(occurrence)
+                and datetime.combine(occurrence, at) - _LEAD == fire_at
+            )
+            if not current:
+                # A agenda mudou sem o scheduler saber: reagenda em vez de avisar
+                self.counters["rescheduled"] += 1
+            elif (row.completed and not rule.repeats) or (task_id, occurrence) in done:
+                self.counters["skipped"] += 1
+            else:
+                self._send(Reminder(user_id, task_id, row.title, occurrence, datetime.combine(occurrence, at)))
+            with self._condition:
+                if (user_id, task_id) not in self._entries:
+                    self._set((user_id, task_id), next_fire(row, now))
+
+    def _send(self, reminder: Reminder) -> None:
+        try:
+            self.sink.send(reminder)
+            self.counters["sent"] += 1
+        except Exception:
+            self.counters["failed"] += 1
+            logger.exception("Failed to send reminder for task %s", reminder.task_id)
+
+    def tick(self, now: Optional[datetime] = None) -> int:
+        """Send every reminder due at now; returns how many entries were due"""
+        now = now or datetime.now()
+        with self._condition:
+            reloads, self._reloads = self._reloads, set()
+            due = self._pop_due(now)
+        for user_id in reloads:
+            self.reload_user(user_id)
+        if due:
+            self._fire(due, now)
+        return len(due)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                timeout = _MAX_SLEEP_SECONDS
+                if self._heap:
+                    timeout = min(max((self._heap[0][0] - datetime.now()).total_seconds(), 0), timeout)
+                if timeout > 0 and not self._reloads:
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+            try:
+                self.tick()
+            except Exception:
+                # As entradas deste disparo perdem-se; as seguintes continuam
+                logger.exception("Reminder tick failed")
+
+    def start(self) -> None:
+        """Rebuild the heap and start the background thread"""
+        if not REMINDERS_ENABLED or self._running:
+            return
+        self._running = True
+        logger.info("Scheduled %d reminders", self.rebuild())
+        self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {**self.counters, "scheduled": len(self._entries), "heap": len(self._heap)}
+
+
+scheduler = Scheduler(_load_sink())
+
+
+def render_prometheus() -> str:
+    """Scheduler counters in the Prometheus text exposition format"""
+    stats = scheduler.stats()
+    lines = []
+    for name in ("sent", "skipped", "rescheduled", "failed"):
+        lines += [f"# TYPE reminders_{name}_total counter", f"reminders_{name}_total {stats.get(name, 0)}"]
+    for name in ("scheduled", "heap"):
+        lines += [f"# TYPE reminders_{name} gauge", f"reminders_{name} {stats.get(name, 0)}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,49 @@
+from pydantic import BaseModel, Field
+from typing import Any, Optional
+from enum import Enum
+from backend.constants import MAX_BATCH_REQUESTS
+from backend.schemas.task import Task
+from backend.schemas.category import Category
+
+class BootstrapSection(str, Enum):
+    TODAY = "today"
+    UPCOMING = "upcoming"
+    CATEGORIES = "categories"
+    COUNTS = "counts"
+
+# -----------------------
+# Response
+# -----------------------
+class TaskCounts(BaseModel):
+    total: int
+    completed: int
+    pending: int
+    overdue: int
+
+class Bootstrap(BaseModel):
+    revision: int = Field(..., description="Data revision every section was read at; use it as since for /sync")
+    today: Optional[list[Task]] = Field(None, description="Tasks scheduled for today, as GET /tasks/today")
+    upcoming: Optional[list[Task]] = Field(None, description="As GET /tasks/upcoming")
+    categories: Optional[list[Category]] = None
+    counts: Optional[TaskCounts] = None
+
+# -----------------------
+# Batch
+# -----------------------
+class BatchRequestItem(BaseModel):
+    method: str = Field("GET", pattern="^GET$", description="Only reads can be batched")
+    path: str = Field(..., pattern="^/", description="Path and query string, e.g. /tasks/upcoming?days=3")
+    headers: dict[str, str] = Field(default_factory=dict, description="Extra headers, e.g. If-None-Match")
+
+class BatchRequest(BaseModel):
+    requests: list[BatchRequestItem] = Field(..., min_length=1, max_length=MAX_BATCH_REQUESTS)
+
+class BatchResponseItem(BaseModel):
+    status: int
+    headers: dict[str, str] = Field(default_factory=dict, description="ETag and Content-Type of the response")
+    body: Any = Field(None, description="Decoded JSON body (text for other content types, null for 304)")
+
+class BatchResponse(BaseModel):
+    revision: int = Field(..., description="Data revision after the last request")
+    consistent: bool = Field(..., description="No write landed while the requests ran: they all saw revision")
+    responses: list[BatchResponseItem]
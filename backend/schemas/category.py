@@ -9,4 +9,5 @@ class CategoryCreate(CategoryBase):
 class Category(CategoryBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
+    user_id: int
 
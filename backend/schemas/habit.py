@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import date
+from backend.schemas.task import ScheduleType, HabitType
+
+class HabitStats(BaseModel):
+    task_id: int
+    title: str
+    schedule_type: Optional[ScheduleType] = None
+    habit_type: Optional[HabitType] = None
+    category_id: Optional[int] = None
+    current_streak: int = Field(0, description="Consecutive occurrences completed up to the latest one due")
+    longest_streak: int = 0
+    last_completed: Optional[date] = Field(None, description="Latest completed occurrence")
+    total_completions: int = 0
+    scheduled_7d: int = Field(0, description="Occurrences in the last 7 days, today included")
+    completed_7d: int = 0
+    completion_rate_7d: Optional[float] = Field(None, description="completed_7d / scheduled_7d, null when nothing was scheduled")
+    scheduled_30d: int = 0
+    completed_30d: int = 0
+    completion_rate_30d: Optional[float] = None
@@ -0,0 +1,55 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional
+from datetime import date
+from enum import Enum
+
+class InsightPeriod(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+
+class InsightDimension(str, Enum):
+    ALL = "all"
+    HABIT_TYPE = "habit_type"
+    CATEGORY = "category"
+
+# -----------------------
+# Response
+# -----------------------
+class InsightRow(BaseModel):
+    period_start: date
+    key: Optional[str] = Field(None, description="Habit type or category id; null for the totals or when unset")
+    label: Optional[str] = Field(None, description="Category name")
+    tasks: int
+    completed: int
+    completion_rate: Optional[float] = Field(None, description="completed / tasks; null without tasks")
+    planned_minutes: int
+    completed_minutes: int = Field(..., description="Planned minutes of the completed tasks")
+    habit_completions: int
+
+class InsightSummary(BaseModel):
+    period: InsightPeriod
+    by: InsightDimension
+    pending_days: int = Field(..., description="Days with writes not aggregated yet; 0 when the rows are current")
+    rows: list[InsightRow]
+
+class OverduePoint(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    day: date
+    pending: int
+    overdue: int
+
+class OverdueTrend(BaseModel):
+    points: list[OverduePoint]
+
+class PatternRow(BaseModel):
+    group: int | str = Field(..., description="Weekday (0 = Monday), start hour or planned-duration bucket")
+    tasks: int
+    completed: int
+    completion_rate: Optional[float] = None
+
+class PatternReport(BaseModel):
+    start: date = Field(..., alias="from")
+    end: date = Field(..., alias="to")
+    by_weekday: list[PatternRow]
+    by_hour: list[PatternRow]
+    by_planned_duration: list[PatternRow]
@@ -0,0 +1,70 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Optional
+from datetime import date, datetime
+from enum import Enum
+from backend.constants import MAX_BULK_SIZE
+from backend.schemas.task import Task
+from backend.schemas.category import Category
+
+class SyncChanges(BaseModel):
+    revision: int = Field(..., description="Pass this back as since on the next sync")
+    has_more: bool = Field(False, description="More changes are pending; sync again right away")
+    tasks: list[Task] = Field(default_factory=list, description="Tasks created or updated since the given revision")
+    categories: list[Category] = Field(default_factory=list)
+    deleted_tasks: list[int] = Field(default_factory=list, description="Apply deletions before the upserts")
+    deleted_categories: list[int] = Field(default_factory=list)
+
+# -----------------------
+# Operações offline
+# -----------------------
+class OperationType(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    COMPLETE = "complete"
+    UNCOMPLETE = "uncomplete"
+    DELETE = "delete"
+
+class OperationStatus(str, Enum):
+    APPLIED = "applied"
+    PARTIAL = "partial"            # alguns campos perderam para escritas mais recentes
+    STALE = "stale"                # todos os campos perderam
+    DUPLICATE = "duplicate"        # op_id (ou client_id de um create) já aplicado
+    NOT_FOUND = "not_found"
+    DELETED = "deleted"            # a tarefa foi apagada entretanto
+    INVALID = "invalid"
+
+class Operation(BaseModel):
+    op_id: str = Field(..., min_length=1, max_length=64, description="Unique id generated by the client; resending it is a no-op")
+    type: OperationType
+    task_id: Optional[int] = Field(None, ge=1, description="Server id of the task")
+    client_id: Optional[str] = Field(None, min_length=1, max_length=64, description="Client id of a task created offline; required for create")
+    timestamp: datetime = Field(..., description="When the edit was made on the device; later edits win field by field")
+    fields: dict[str, Any] = Field(default_factory=dict, description="Task fields, for create and update")
+    on: Optional[date] = Field(None, description="Habits only: the occurrence completed or uncompleted, default the one due at timestamp")
+
+    @model_validator(mode='after')
+    def validate_target(self):
+        """A create names its client id; every other operation names the task"""
+        if self.type is OperationType.CREATE:
+            if not self.client_id:
+                raise ValueError('client_id is required for create')
+        elif self.task_id is None and not self.client_id:
+            raise ValueError('task_id or client_id is required')
+        return self
+
+class OperationBatch(BaseModel):
+    operations: list[Operation] = Field(..., min_length=1, max_length=MAX_BULK_SIZE, description="In the order they were made")
+
+class OperationResult(BaseModel):
+    op_id: str
+    status: OperationStatus
+    task_id: Optional[int] = None
+    ignored_fields: list[str] = Field(default_factory=list, description="Fields written on the server after this operation")
+    error: Optional[str] = None
+
+class OperationBatchResult(BaseModel):
+    revision: int = Field(..., description="Data revision after the batch; use it as since for /sync")
+    results: list[OperationResult]
+    ids: dict[str, int] = Field(default_factory=dict, description="Server id of each task created in the batch, by client id")
+    tasks: list[Task] = Field(default_factory=list, description="Server state of every task the batch touched")
+    deleted_tasks: list[int] = Field(default_factory=list)
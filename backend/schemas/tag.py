@@ -0,0 +1,54 @@
+from pydantic import BaseModel, Field, field_validator, ConfigDict
+from typing import Optional
+from enum import Enum
+from backend.constants import MAX_BULK_SIZE
+
+class TagKind(str, Enum):
+    TAG = "tag"
+    RESULT = "result"      # rótulos de resultado, p.ex. "High Effort / Low Outcome"
+
+class TagBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=50, description="Tag name, unique per user; used in tag expressions")
+    kind: TagKind = Field(TagKind.TAG, description="Free tag or result label")
+    color: Optional[str] = Field(None, max_length=20, description="Display color")
+
+    @field_validator('name')
+    @classmethod
+    def validate_name(cls, v):
+        """Names are quoted with '"' in tag expressions, so they can't contain one"""
+        v = v.strip()
+        if not v:
+            raise ValueError('name cannot be blank')
+        if '"' in v:
+            raise ValueError('name cannot contain \'"\'')
+        return v
+
+class TagCreate(TagBase):
+    pass
+
+class TagUpdate(TagBase):
+    name: Optional[str] = Field(None, min_length=1, max_length=50)
+    kind: Optional[TagKind] = None
+
+class Tag(TagBase):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    user_id: int
+
+class TagAssignment(BaseModel):
+    tag_ids: list[int] = Field(..., min_length=1, max_length=MAX_BULK_SIZE, description="Tags to (un)assign")
+    task_ids: list[int] = Field(..., min_length=1, max_length=MAX_BULK_SIZE, description="Tasks to (un)tag")
+
+class TagAssignmentResult(BaseModel):
+    tag_ids: list[int] = Field(..., description="Requested tags that exist")
+    task_ids: list[int] = Field(..., description="Requested tasks that exist")
+    changed: int = Field(..., description="Assignments added or removed")
+
+class TaskTags(BaseModel):
+    tag_ids: list[int] = Field(..., max_length=MAX_BULK_SIZE, description="Every tag of the task; replaces the current ones")
+
+class TagSummaryRow(BaseModel):
+    tag: Tag
+    tasks: int
+    completed: int
+    completion_rate: Optional[float] = Field(None, description="completed / tasks, null when the tag has no tasks")
@@ -8,6 +8,7 @@ from enum import Enum
 # -----------------------
 class ScheduleType(str, Enum):
     DAILY = "daily"
+    EVERY_OTHER_DAY = "every_other_day"
     WEEKLY = "weekly"
     MONTHLY = "monthly"
     YEARLY = "yearly"
@@ -73,6 +74,24 @@ class TaskCreate(TaskBase):
         
         return self
 
+# -----------------------
+# Import - histórico: datas passadas e tarefas concluídas são válidas
+# -----------------------
+class TaskImport(TaskBase):
+    completed: bool = Field(False, description="Whether the task is completed")
+
+    @model_validator(mode='after')
+    def validate_times_and_units(self):
+        """Validate end_time is after start_time and unit_value is provided when unit is specified"""
+        if self.end_time and self.start_time:
+            if self.end_time <= self.start_time:
+                raise ValueError('end_time must be after start_time')
+
+        if self.unit and not self.unit_value:
+            raise ValueError('unit_value is required when unit is specified')
+
+        return self
+
 # -----------------------
 # Update (todos opcionais) - WITH VALIDATORS for input validation
 # -----------------------
@@ -107,12 +126,22 @@ class TaskUpdate(BaseModel):
                 raise ValueError('end_time must be after start_time')
         return self
 
+# -----------------------
+# Edição offline reenviada - a data era válida no dia em que foi feita
+# -----------------------
+class TaskPatch(TaskUpdate):
+    @field_validator('start_date')
+    @classmethod
+    def validate_start_date(cls, v):
+        return v
+
 # -----------------------
 # Response (inclui id e timestamps) - NO date validation, only fetch from DB
 # -----------------------
 class Task(TaskBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
+    user_id: int
     completed: bool = False
     
     # Only validate time relationship, not dates (data already in DB is trusted)
@@ -144,7 +173,55 @@ class TaskList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     
     tasks: list[Task]
-    total: int
-    page: int
-    size: int
-    pages: int
\ No newline at end of file
+    size: int = Field(..., description="Number of tasks in this page")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
+    total: Optional[int] = Field(None, description="Total matching tasks, only when requested")
+
+# -----------------------
+# Ocorrências no calendário (expandidas no servidor)
+# -----------------------
+class TaskOccurrence(BaseModel):
+    task_id: int
+    date: date
+    title: str
+    completed: bool = False
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    all_day: bool = False
+    schedule_type: Optional[ScheduleType] = None
+    habit_type: Optional[HabitType] = None
+    category_id: Optional[int] = None
+
+# -----------------------
+# Operações em lote (bulk)
+# -----------------------
+class TaskBulkUpdate(TaskUpdate):
+    id: int = Field(..., ge=1, description="ID of the task to update")
+
+class TaskBulkDelete(BaseModel):
+    ids: list[int] = Field(..., min_length=1, description="IDs of the tasks to delete")
+
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    ok: bool
+    id: Optional[int] = None
+    task: Optional[Task] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    results: list[BulkItemResult]
+    succeeded: int
+    failed: int
+
+# -----------------------
+# Importação (CSV / NDJSON)
+# -----------------------
+class ImportLineError(BaseModel):
+    line: int = Field(..., description="Line of the upload where the record starts (1-based)")
+    error: str
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: list[ImportLineError] = Field(..., description="Errors per line, up to MAX_IMPORT_ERRORS")
+    errors_truncated: bool = Field(False, description="Whether more lines failed than are listed in errors")
@@ -0,0 +1,72 @@
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Optional
+from datetime import date, datetime
+from enum import Enum
+
+MAX_ENTRY_MINUTES = 24 * 60
+
+class RollupPeriod(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+
+class RollupDimension(str, Enum):
+    TASK = "task"
+    CATEGORY = "category"
+    HABIT_TYPE = "habit_type"
+
+# -----------------------
+# Input
+# -----------------------
+class TimerStop(BaseModel):
+    quantity: Optional[float] = Field(None, ge=0, description="Amount achieved, for measurable goals (e.g., 500 ml)")
+
+class TimeEntryLog(BaseModel):
+    """A finished block of time logged after the fact"""
+    started_at: Optional[datetime] = Field(None, description="Defaults to ended_at (or now) minus the duration")
+    ended_at: Optional[datetime] = None
+    duration_minutes: Optional[float] = Field(None, gt=0, le=MAX_ENTRY_MINUTES)
+    quantity: Optional[float] = Field(None, ge=0)
+
+    @model_validator(mode='after')
+    def validate_span(self):
+        """Need a duration, a start/end pair or at least a quantity; end must be after start"""
+        if self.started_at and self.ended_at:
+            if self.ended_at <= self.started_at:
+                raise ValueError('ended_at must be after started_at')
+            if (self.ended_at - self.started_at).total_seconds() > MAX_ENTRY_MINUTES * 60:
+                raise ValueError('a single entry cannot exceed 24 hours')
+            if self.duration_minutes is not None:
+                raise ValueError('give either ended_at or duration_minutes, not both')
+        elif self.ended_at and self.duration_minutes is None:
+            raise ValueError('ended_at requires started_at or duration_minutes')
+        if self.duration_minutes is None and self.ended_at is None and self.quantity is None:
+            raise ValueError('give a duration, an ended_at or a quantity')
+        return self
+
+# -----------------------
+# Response
+# -----------------------
+class TimeEntry(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    task_id: int
+    started_at: datetime
+    ended_at: Optional[datetime] = None
+    duration_minutes: Optional[float] = None
+    quantity: Optional[float] = None
+    running: bool = False
+
+class TimeSummaryRow(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    period_start: date
+    key: Optional[str] = Field(None, description="Task id, category id or habit type; null when unset")
+    label: Optional[str] = Field(None, description="Task title or category name")
+    planned_minutes: int
+    actual_minutes: float
+    quantity: float
+    entries: int
+
+class TimeSummary(BaseModel):
+    period: RollupPeriod
+    by: RollupDimension
+    rows: list[TimeSummaryRow]
@@ -0,0 +1,140 @@
+"""Full-text search over tasks using a SQLite FTS5 index.
+
+The index is an external-content FTS5 table (it stores only the inverted
+index, the text stays in ``tasks``) kept in sync by triggers, so every
+write path - ORM or raw SQL - updates it.
+
+Rebuild the index of an existing database with:
+
+    python -m backend.search rebuild
+"""
+import logging
+import re
+import sys
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "tasks_fts"
+
+# Pesos do bm25 por coluna: title, description, notes
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, description, notes,
+    content='tasks', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, notes)
+        VALUES (new.id, new.title, new.description, new.notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, notes)
+        VALUES ('delete', old.id, old.title, old.description, old.notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description, notes ON tasks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, notes)
+        VALUES ('delete', old.id, old.title, old.description, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, title, description, notes)
+        VALUES (new.id, new.title, new.description, new.notes);
+    END
+    """,
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Bases de dados onde o índice FTS foi instalado com sucesso (partilhado por engines sync e async)
+_enabled_databases = set()
+
+
+def _database_key(engine: Engine) -> tuple:
+    return (engine.dialect.name, engine.url.database)
+
+
+def install_fts(engine: Engine) -> bool:
+    """Create the FTS5 table and sync triggers if missing; returns whether FTS is usable"""
+    if engine.dialect.name != "sqlite":
+        return False
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            conn.execute(text(_CREATE_TABLE))
+            for trigger in _TRIGGERS:
+                conn.execute(text(trigger))
+            # Base de dados antiga: indexa as tarefas que já existem
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError:
+        logger.warning("SQLite FTS5 is not available, search falls back to ILIKE", exc_info=True)
+        return False
+
+    _enabled_databases.add(_database_key(engine))
+    return True
+
+
+def rebuild_fts(engine: Engine) -> None:
+    """Rebuild the FTS index from the contents of the tasks table"""
+    install_fts(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def fts_enabled(engine: Engine) -> bool:
+    """Whether search queries on this engine can use the FTS index"""
+    return _database_key(engine) in _enabled_databases
+
+
+def build_match_query(search_term: str) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression with prefix matching on the last word"""
+    tokens = _TOKEN_RE.findall(search_term)
+    if not tokens:
+        return None
+
+    # Cada termo entre aspas para neutralizar a sintaxe do FTS5 (AND, OR, NEAR, ...)
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_statement():
+    """SELECT over one user's tasks joined to the FTS index, ordered by bm25 rank"""
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return text(
+        f"""
+        SELECT tasks.* FROM {FTS_TABLE}
+        JOIN tasks ON tasks.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH :match AND tasks.user_id = :user_id
+        ORDER BY bm25({FTS_TABLE}, {weights}), tasks.id
+        LIMIT :limit OFFSET :skip
+        """
+    )
+
+
+if __name__ == "__main__":
+    from backend import database
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m backend.search rebuild")
+        sys.exit(2)
+
+    rebuild_fts(database.engine)
+    print(f"Rebuilt {FTS_TABLE} on {database.SQLALCHEMY_DATABASE_URL}")
@@ -0,0 +1,44 @@
+"""Fast JSON path for list endpoints.
+
+Rows come straight from the database as tuples of the requested columns
+and are encoded by pydantic-core's Rust serializer, skipping the per-row
+model construction and validation of ``response_model``. Data read from
+the database was validated on the way in, so this is safe for responses.
+"""
+from typing import Iterable, List, Optional
+
+from fastapi import Response
+from pydantic_core import to_json
+
+from backend import metrics
+from backend.schemas import task as task_schemas
+
+# Campos que a resposta de uma Task pode conter, pela ordem do schema
+TASK_FIELDS = tuple(task_schemas.Task.model_fields)
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Parse a ?fields=a,b,c sparse fieldset; raises ValueError on unknown names"""
+    if not fields:
+        return list(TASK_FIELDS)
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in TASK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(TASK_FIELDS)}")
+
+    # id vem sempre, para o cliente conseguir identificar as linhas
+    return ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+
+
+def rows_to_dicts(rows: Iterable, fields: List[str]) -> List[dict]:
+    """Project database rows onto the requested fields"""
+    projected = [{name: getattr(row, name) for name in fields} for row in rows]
+    metrics.record_rows(len(projected))
+    return projected
+
+
+def json_response(content, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Encode content with the Rust serializer; keeps headers set on the injected response (e.g. ETag)"""
+    headers = dict(response.headers) if response is not None else None
+    return Response(to_json(content), status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,280 @@
+"""Production entrypoint: one schema step, preforked workers, warm-up and readiness.
+
+    python -m backend.server                        # SERVER_WORKERS workers on SERVER_HOST:SERVER_PORT
+    python -m backend.server --workers 4 --port 8000
+    python -m backend.server migrate                # only the schema step (e.g. a deploy job)
+
+The parent process does the shared work once, before any worker exists:
+
+1. schema: migrations plus the FTS, sync, insights and tag triggers
+   (``tenancy.prepare_database``). Workers start with ``SCHEMA_SETUP=skip``
+   and never run DDL;
+2. preload: import the app (FastAPI, SQLAlchemy, the models, schemas and
+   route table), which is most of a cold start;
+3. warm-up: run the app-start reads once, which compiles their statements
+   into the engine's cache.
+
+It then forks ``SERVER_WORKERS`` workers sharing one listening socket.
+They inherit the imported app and compiled statements copy-on-write,
+open and warm their own connections (``warm_up`` in the lifespan) and
+only then report ready. Background jobs (insights refresher, archiver,
+reminders) run in worker 0 alone; a worker that dies is replaced.
+Without ``os.fork`` (Windows) the workers are uvicorn's spawned
+processes, each importing the app on its own, and the parent runs the
+background jobs.
+
+``GET /healthz`` answers while the process serves; ``GET /readyz`` is 200
+once the lifespan has finished and the database answers, 503 before that
+and while shutting down. ``/metrics`` reports the startup steps and the
+seconds from process start to ready and to the first request.
+
+Caches and WebSocket events are per process unless ``CACHE_BACKEND`` and
+``EVENTS_BROKER`` plug in shared ones (see backend/cache.py, backend/events.py).
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from backend import analytics, archive, database, metrics, reminders, tenancy, write_queue
+
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+# 0 = um worker por CPU
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+SERVER_LOG_LEVEL = os.getenv("SERVER_LOG_LEVEL", "info")
+# Ligações abertas e aquecidas por worker antes de aceitar pedidos (0 desliga o aquecimento)
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(min(database.DB_POOL_SIZE, 4))))
+# Um worker que morre antes disto é substituído só depois de uma pausa (evita ciclos de crash)
+WORKER_MIN_UPTIME_SECONDS = 5.0
+
+_ready = False
+_draining = False
+
+
+# -------------------------------
+# Esquema, aquecimento e tarefas de fundo
+# -------------------------------
+def prepare_schema() -> None:
+    """The one-shot schema step: migrations and triggers on the configured database"""
+    with metrics.timed_startup("schema"):
+        tenancy.prepare_database(database.engine)
+
+
+def schema_setup_skipped() -> bool:
+    """Whether the schema step already ran before this process (SCHEMA_SETUP=skip)"""
+    return os.getenv("SCHEMA_SETUP", "startup").lower() == "skip"
+
+
+def warm_up(connections: int = WARMUP_CONNECTIONS) -> int:
+    """Open connections pool connections and run the app-start reads on each; returns the statements run"""
+    from backend import bootstrap
+
+    # Todas abertas ao mesmo tempo, para o pool criar ligações distintas (PRAGMAs e statement cache do SQLite)
+    sessions = [database.SessionLocal() for _ in range(connections)]
+    try:
+        for db in sessions:
+            for query in bootstrap.QUERIES.values():
+                query(db, cached=False)
+        return connections * len(bootstrap.QUERIES)
+    finally:
+        for db in sessions:
+            db.close()
+
+
+def background_jobs_enabled() -> bool:
+    """Whether this process runs the background jobs (BACKGROUND_JOBS, set per worker by serve)"""
+    return os.getenv("BACKGROUND_JOBS", "1").lower() not in ("0", "false", "no")
+
+
+def start_background_jobs() -> None:
+    analytics.refresher.start()
+    archive.archiver.start()
+    # Lê as tarefas agendadas numa só passagem antes de aceitar pedidos
+    with metrics.timed_startup("reminders"):
+        reminders.scheduler.start()
+
+
+def stop_background_jobs() -> None:
+    reminders.scheduler.stop()
+    archive.archiver.stop()
+    analytics.refresher.stop()
+
+
+def close_databases() -> None:
+    """Finish queued writes and close every pool, process pool and engine of this process"""
+    analytics.shutdown_pool()
+    if write_queue.writer is not None:
+        write_queue.writer.stop()
+    tenancy.strategy.dispose()
+    database.engine.dispose()
+
+
+# -------------------------------
+# Estado para /healthz e /readyz
+# -------------------------------
+def mark_ready() -> None:
+    global _ready
+    _ready = True
+    metrics.mark("ready")
+
+
+def mark_draining() -> None:
+    global _draining
+    _draining = True
+
+
+def readiness() -> Optional[str]:
+    """None if this worker should get traffic, else why not"""
+    if _draining:
+        return "shutting down"
+    if not _ready:
+        return "starting"
+    try:
+        with database.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return f"database unavailable: {e.__class__.__name__}"
+    return None
+
+
+# -------------------------------
+# Processo pai: pré-carga e fork dos workers
+# -------------------------------
+def _config(app, host: str, port: int):
+    import uvicorn
+
+    return uvicorn.Config(app, host=host, port=port, lifespan="on", log_level=SERVER_LOG_LEVEL)
+
+
+def _run_worker(index: int, config, sock) -> None:
+    import uvicorn
+
+    # Os sinais voltam ao normal: o uvicorn instala os seus para o shutdown gracioso
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.environ["BACKGROUND_JOBS"] = "1" if index == 0 else "0"
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def _fork_worker(index: int, config, sock) -> int:
+    pid = os.fork()
+    if pid == 0:
+        _run_worker(index, config, sock)
+    logger.info("Started worker %d (pid %d)", index, pid)
+    return pid
+
+
+def _supervise(workers: int, config, sock) -> None:
+    """Fork the workers and keep them running until SIGTERM / SIGINT"""
+    children = {_fork_worker(index, config, sock): (index, time.monotonic()) for index in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # Um Ctrl-C no terminal já chega a todo o grupo; um segundo sinal forçaria a saída dos workers
+        if signum == signal.SIGINT:
+            return
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index, started = children.pop(pid, (None, 0.0))
+        if index is None or stopping:
+            continue
+        logger.warning("Worker %d (pid %d) exited with status %d; replacing it", index, pid, status)
+        if time.monotonic() - started < WORKER_MIN_UPTIME_SECONDS:
+            time.sleep(WORKER_MIN_UPTIME_SECONDS)
+        children[_fork_worker(index, config, sock)] = (index, time.monotonic())
+    sock.close()
+
+
+def _serve_spawned(workers: int, host: str, port: int) -> None:
+    """Without fork: uvicorn spawns the workers and this process runs the background jobs"""
+    import uvicorn
+
+    os.environ["BACKGROUND_JOBS"] = "0"
+    os.environ["SERVER_STARTED_AT"] = str(metrics.STARTED_AT)
+    start_background_jobs()
+    try:
+        uvicorn.run(
+            "backend.main:app", host=host, port=port, workers=workers, lifespan="on", log_level=SERVER_LOG_LEVEL
+        )
+    finally:
+        stop_background_jobs()
+        close_databases()
+
+
+def serve(workers: int = SERVER_WORKERS, host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+    """Prepare the schema once, preload and warm the app, then run workers processes"""
+    import uvicorn
+
+    workers = workers or os.cpu_count() or 1
+    prepare_schema()
+    os.environ["SCHEMA_SETUP"] = "skip"
+    if not hasattr(os, "fork") and workers > 1:
+        _serve_spawned(workers, host, port)
+        return
+
+    with metrics.timed_startup("preload"):
+        from backend.main import app
+    if WARMUP_CONNECTIONS:
+        with metrics.timed_startup("compile"):
+            warm_up(1)
+    # Ligações abertas antes do fork não podem ser partilhadas pelos filhos
+    tenancy.strategy.dispose()
+    database.engine.dispose()
+
+    config = _config(app, host, port)
+    if workers == 1:
+        uvicorn.Server(config).run()
+        return
+    sock = config.bind_socket()
+    logger.info("Listening on %s:%d with %d workers", host, port, workers)
+    _supervise(workers, config, sock)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Productivity API server")
+    parser.add_argument("command", nargs="?", choices=("serve", "migrate"), default="serve")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="0 = one per CPU")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=SERVER_LOG_LEVEL.upper(), format="%(asctime)s %(process)d %(name)s %(message)s")
+
+
+    if args.command == "migrate":
+        prepare_schema()
+        print(f"Schema ready on {database.SQLALCHEMY_DATABASE_URL}")
+        sys.exit(0)
+    serve(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    # Pela cópia importada do módulo: é nela que o lifespan da app marca o estado de /readyz
+    from backend.server import main as run
+
+    run()
@@ -0,0 +1,205 @@
+"""Change tracking for delta sync and conditional GETs.
+
+Every insert, update or delete on ``tasks`` and ``categories`` bumps the
+owner's revision counter (one ``sync_revision`` row per user) and stamps
+the row with it; deletes leave a row in ``sync_tombstones``, except a
+task moved to the archive, which clients keep. This is done with SQLite
+triggers so that ORM writes, the RETURNING paths and bulk executemany all
+get tracked the same way.
+
+The current revision doubles as a cheap validator for the list endpoints:
+if it has not moved, nothing a list could contain has changed. Being per
+user, one tenant's writes never invalidate another tenant's ETags.
+
+Two more triggers keep ``task_field_clocks``: when each field of a task
+last changed. Offline operations (``crud/sync.apply_operations``) are
+merged field by field against those clocks, last writer wins.
+"""
+import hashlib
+import logging
+from datetime import date
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend import database, tenancy
+from backend.models import sync as models
+
+logger = logging.getLogger(__name__)
+
+# (tabela, nome da entidade nas tombstones)
+TRACKED_TABLES = (("tasks", "task"), ("categories", "category"))
+
+# Linhas que saem para um arquivo (ver backend/archive.py) não são apagadas para os clientes: sem tombstone
+ARCHIVE_TABLES = {"tasks": "tasks_archive"}
+
+
+# Campos de uma tarefa fundidos um a um pelas operações offline (ver crud/sync.apply_operations)
+MERGED_FIELDS = (
+    "title", "description", "completed", "schedule_type", "unit", "unit_value", "start_date",
+    "start_time", "end_time", "all_day", "habit_type", "notes", "category_id",
+)
+
+# Milissegundos: duas escritas no mesmo segundo têm de se distinguir
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _next_revision(row: str) -> str:
+    return (
+        f"INSERT OR IGNORE INTO sync_revision (user_id, value) VALUES ({row}.user_id, 0); "
+        f"UPDATE sync_revision SET value = value + 1 WHERE user_id = {row}.user_id"
+    )
+
+
+def _current_revision(row: str) -> str:
+    return f"(SELECT value FROM sync_revision WHERE user_id = {row}.user_id)"
+
+
+def _triggers(table: str, entity: str) -> tuple:
+    archived = (
+        f"WHERE NOT EXISTS (SELECT 1 FROM {ARCHIVE_TABLES[table]} WHERE id = old.id)" if table in ARCHIVE_TABLES else ""
+    )
+    stamp = (
+        f"UPDATE {table} SET revision = {_current_revision('new')}, updated_at = CURRENT_TIMESTAMP "
+        f"WHERE id = new.id"
+    )
+    return (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_ai AFTER INSERT ON {table} BEGIN
+            {_next_revision('new')};
+            {stamp};
+        END
+        """,
+        # WHEN evita re-disparar por causa do próprio UPDATE de revision
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_au AFTER UPDATE ON {table}
+        WHEN new.revision IS old.revision BEGIN
+            {_next_revision('new')};
+            {stamp};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_ad AFTER DELETE ON {table} BEGIN
+            {_next_revision('old')};
+            INSERT INTO sync_tombstones (user_id, entity, entity_id, revision, deleted_at)
+            SELECT old.user_id, '{entity}', old.id, {_current_revision('old')}, CURRENT_TIMESTAMP {archived};
+        END
+        """,
+    )
+
+
+def _clock_triggers() -> tuple:
+    # Só os campos que mudaram de facto; o UPDATE de revision dos triggers acima não os toca
+    stamps = "".join(
+        f"""
+            INSERT INTO task_field_clocks (task_id, field, updated_at)
+            SELECT new.id, '{field}', {_NOW} WHERE old.{field} IS NOT new.{field}
+            ON CONFLICT (task_id, field) DO UPDATE SET updated_at = excluded.updated_at;"""
+        for field in MERGED_FIELDS
+    )
+    return (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_clock_au AFTER UPDATE OF {", ".join(MERGED_FIELDS)} ON tasks BEGIN
+            {stamps}
+        END
+        """,
+        # Tarefas que vão para o arquivo guardam os relógios, para voltarem com eles
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_clock_ad AFTER DELETE ON tasks
+        WHEN NOT EXISTS (SELECT 1 FROM {ARCHIVE_TABLES['tasks']} WHERE id = old.id) BEGIN
+            DELETE FROM task_field_clocks WHERE task_id = old.id;
+        END
+        """,
+    )
+
+
+def drop_triggers(conn) -> None:
+    """Remove the revision and field clock triggers (migrations reinstall them with install_sync)"""
+    for table, _ in TRACKED_TABLES:
+        for suffix in ("ai", "au", "ad"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_sync_{suffix}"))
+    for suffix in ("au", "ad"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS tasks_clock_{suffix}"))
+
+
+def install_sync(engine: Engine) -> bool:
+    """Add the sync columns to older databases and install the revision and field clock triggers"""
+    if engine.dialect.name != "sqlite":
+        logger.warning("Change tracking triggers are only installed on SQLite")
+        return False
+
+    with engine.begin() as conn:
+        for table, entity in TRACKED_TABLES:
+            columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+            # Bases de dados criadas antes destas colunas existirem
+            if "revision" not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN revision INTEGER"))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_user_revision ON {table} (user_id, revision)"
+                ))
+            if "updated_at" not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
+
+            for trigger in _triggers(table, entity):
+                conn.execute(text(trigger))
+
+            # Linhas antigas sem revisão: uma revisão distinta por linha (base do dono + id)
+            if conn.execute(text(f"SELECT 1 FROM {table} WHERE revision IS NULL LIMIT 1")).first():
+                conn.execute(text(
+                    f"UPDATE {table} SET revision = COALESCE({_current_revision(table)}, 0) + id, "
+                    f"updated_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE revision IS NULL"
+                ))
+                conn.execute(text(
+                    f"INSERT INTO sync_revision (user_id, value) "
+                    f"SELECT user_id, MAX(revision) FROM {table} WHERE true GROUP BY user_id "
+                    f"ON CONFLICT (user_id) DO UPDATE SET value = MAX(value, excluded.value)"
+                ))
+
+        # Migrações anteriores à 0007 (que cria task_field_clocks) também chamam install_sync
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_field_clocks'")).first():
+            for trigger in _clock_triggers():
+                conn.execute(text(trigger))
+    return True
+
+
+def current_revision(db: Session) -> int:
+    """The latest revision written to the current user's tasks or categories"""
+    return db.scalar(
+        select(models.SyncRevision.value).where(models.SyncRevision.user_id == tenancy.current_user_id())
+    ) or 0
+
+
+def touch(db: Session) -> None:
+    """Bump the current user's revision for a write the triggers don't track (e.g. tag assignments); the caller commits"""
+    user_id = tenancy.current_user_id()
+    db.execute(text("INSERT OR IGNORE INTO sync_revision (user_id, value) VALUES (:user_id, 0)"), {"user_id": user_id})
+    db.execute(text("UPDATE sync_revision SET value = value + 1 WHERE user_id = :user_id"), {"user_id": user_id})
+
+
+def make_etag(revision: int, request: Request) -> str:
+    """Strong ETag for a response that depends only on the user, their data revision, the URL and the day"""
+    # O dia entra na chave porque filtros como overdue_only dependem de date.today()
+    key = f"{tenancy.current_user_id()}:{revision}:{date.today().isoformat()}:{request.url.path}?{request.url.query}"
+    return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip() for value in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def etag_guard(request: Request, response: Response, db: Session = Depends(database.get_db)) -> None:
+    """Dependency: answer 304 before running the route if the client's copy is current"""
+    etag = make_etag(current_revision(db), request)
+    if _etag_matches(etag, request.headers.get("if-none-match")):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": "no-cache"},
+        )
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
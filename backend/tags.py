@@ -0,0 +1,463 @@
+"""Tag expressions over in-memory posting bitmaps.
+
+Each user's tag assignments are held as Python integers used as bitmaps
+indexed by task id: one per tag, plus the user's task ids and the
+completed ones. ``work AND (urgent OR "high effort") AND NOT done`` is
+then a handful of C-level ``&``/``|``/``~`` over whole bitmaps, however
+many tags the expression names, instead of one JOIN per tag; per-tag
+summaries and counts are popcounts. When the matches (or the tasks left
+out) are few, their ids reach SQL as one JSON parameter (``id IN (SELECT
+value FROM json_each(?))``); when both sides are large the filter is
+sent as correlated EXISTS probes instead, which are cheap precisely
+because a page ordered by ``start_date`` fills after a few rows. Either
+way tag filters compose with every other ``get_tasks`` filter and with
+keyset pagination.
+
+A user's index is read on first use (two index-only scans) and kept in an
+LRU of ``TAG_INDEX_MAX_USERS`` users. Writes keep it current through the
+change events - the index subscribes to the broker like the WebSocket hub
+and the reminder scheduler - so it follows task creation, completion and
+deletion as well as tag (un)assignment, once the write is durable.
+``TAG_INDEX_TTL_SECONDS`` bounds how long an index missed by writes of
+another process (without a shared broker) can stay stale.
+
+Bitmaps are sized by the highest task id, not by the number of tasks: in
+a shared database a user's tasks are spread over everyone's ids, so a
+bitmap costs up to max(id) / 8 bytes per tag of a loaded user.
+"""
+import json
+import logging
+import operator
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import accumulate, count
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, exists, false, func, not_, or_, select, text, true
+from sqlalchemy.engine import Engine
+
+from backend import events, tenancy
+from backend.models import tag as models, task as task_models
+
+logger = logging.getLogger(__name__)
+
+TAG_INDEX_MAX_USERS = int(os.getenv("TAG_INDEX_MAX_USERS", "256"))
+TAG_INDEX_TTL_SECONDS = float(os.getenv("TAG_INDEX_TTL_SECONDS", os.getenv("CACHE_TTL_SECONDS", "300")))
+# Acima disto (dos dois lados) o filtro vai para o SQL como EXISTS em vez de uma lista de ids
+TAG_FILTER_MAX_IDS = int(os.getenv("TAG_FILTER_MAX_IDS", "5000"))
+
+# Expressões: nomes (ou "nomes com espaços"), AND / OR / NOT e parênteses
+MAX_EXPRESSION_LENGTH = 1000
+# Parênteses e NOT encaixados: o parser e a avaliação são recursivos, cada nível custa frames da pilha
+MAX_EXPRESSION_DEPTH = 32
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+_OPERATORS = {"AND", "OR", "NOT"}
+
+_TRIGGERS = (
+    # Sem PRAGMA foreign_keys o ON DELETE CASCADE não corre: as atribuições saem por trigger
+    # (as de tarefas que foram para o arquivo ficam, para voltarem com elas)
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_tags_ad AFTER DELETE ON tasks
+    WHEN NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = old.id) BEGIN
+        DELETE FROM task_tags WHERE task_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tags_tags_ad AFTER DELETE ON tags BEGIN
+        DELETE FROM task_tags WHERE tag_id = old.id;
+    END
+    """,
+)
+
+
+def install_tags(engine: Engine) -> bool:
+    """Install the triggers that drop the assignments of deleted tasks and tags"""
+    if engine.dialect.name != "sqlite":
+        logger.warning("Tag cleanup triggers are only installed on SQLite")
+        return False
+    with engine.begin() as conn:
+        for trigger in _TRIGGERS:
+            conn.execute(text(trigger))
+    return True
+
+
+# -------------------------------
+# Bitmaps
+# -------------------------------
+def to_bitmap(ids: Iterable[int]) -> int:
+    """Bitmap with the bit of every id set"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for task_id in ids:
+        data[task_id >> 3] |= 1 << (task_id & 7)
+    return int.from_bytes(data, "little")
+
+
+def to_ids(bitmap: int) -> List[int]:
+    """Ids whose bit is set, in ascending order"""
+    # Tudo em C: bits do menos para o mais significativo, partidos nos "1"; cada id é o comprimento acumulado
+    gaps = bin(bitmap)[:1:-1].split("1")
+    gaps.pop()
+    return list(map(operator.add, accumulate(map(len, gaps)), count()))
+
+
+# -------------------------------
+# Expressões
+# -------------------------------
+def parse(expression: str):
+    """Parse a tag expression into a tree of ("tag", name) / ("not", x) / ("and"|"or", a, b)"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Tag expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None:
+            raise ValueError(f"Unterminated quote in tag expression at {position}")
+        opening, closing, quoted, word = match.groups()
+        if opening or closing:
+            tokens.append(opening or closing)
+        elif quoted is not None:
+            tokens.append(("tag", quoted))
+        elif word.upper() in _OPERATORS:
+            tokens.append(word.upper())
+        else:
+            tokens.append(("tag", word))
+        position = match.end()
+    if not tokens:
+        raise ValueError("Empty tag expression")
+
+    def peek():
+        return tokens[0] if tokens else None
+
+    def parse_or(depth):
+        node = parse_and(depth)
+        while peek() == "OR":
+            tokens.pop(0)
+            node = ("or", node, parse_and(depth))
+        return node
+
+    def parse_and(depth):
+        node = parse_not(depth)
+        # "a b" é o mesmo que "a AND b"
+        while peek() == "AND" or isinstance(peek(), tuple) or peek() in ("NOT", "("):
+            if peek() == "AND":
+                tokens.pop(0)
+            node = ("and", node, parse_not(depth))
+        return node
+
+    def parse_not(depth):
+        token = tokens.pop(0) if tokens else None
+        if token in ("NOT", "(") and depth >= MAX_EXPRESSION_DEPTH:
+            raise ValueError(f"Tag expression nested deeper than {MAX_EXPRESSION_DEPTH} levels")
+        if token == "NOT":
+            return ("not", parse_not(depth + 1))
+        if token == "(":
+            node = parse_or(depth + 1)
+            if not tokens or tokens.pop(0) != ")":
+                raise ValueError("Missing ')' in tag expression")
+            return node
+        if isinstance(token, tuple):
+            return token
+        raise ValueError(f"Unexpected {token or 'end'} in tag expression")
+
+    tree = parse_or(0)
+    if tokens:
+        raise ValueError(f"Unexpected {tokens[0] if isinstance(tokens[0], str) else tokens[0][1]!r} in tag expression")
+    return tree
+
+
+def tag_names(tree) -> set:
+    """Every tag name an expression refers to"""
+    if tree[0] == "tag":
+        return {tree[1]}
+    return set().union(*(tag_names(child) for child in tree[1:]))
+
+
+def resolve(conn, names: Iterable[str]) -> Dict[str, int]:
+    """Ids of the current user's tags with the given names (unknown names are left out)"""
+    names = list(names)
+    if not names:
+        return {}
+    query = tenancy.owned(select(models.Tag.name, models.Tag.id), models.Tag).where(models.Tag.name.in_(names))
+    return {name: tag_id for name, tag_id in conn.execute(query)}
+
+
+# -------------------------------
+# Índice por utilizador
+# -------------------------------
+class TagIndex:
+    """One user's bitmaps: every task, the completed ones and one per tag"""
+
+    def __init__(self, tasks: int, completed: int, tags: Dict[int, int]):
+        self.tasks = tasks
+        self.completed = completed
+        self.tags = tags
+        self.expires_at = time.monotonic() + TAG_INDEX_TTL_SECONDS
+
+    def evaluate(self, tree, tag_ids: Dict[str, int]) -> int:
+        """Bitmap of the tasks matching an expression tree"""
+        kind = tree[0]
+        if kind == "tag":
+            tag_id = tag_ids.get(tree[1])
+            return self.tags.get(tag_id, 0) if tag_id is not None else 0
+        if kind == "not":
+            return self.tasks & ~self.evaluate(tree[1], tag_ids)
+        left, right = self.evaluate(tree[1], tag_ids), self.evaluate(tree[2], tag_ids)
+        return left & right if kind == "and" else left | right
+
+    def apply(self, event: dict) -> None:
+        """Follow one change event"""
+        event_type, entity_id, data = event["type"], event.get("id"), event.get("data") or {}
+        if event_type == "task.deleted":
+            mask = ~(1 << entity_id)
+            self.tasks &= mask
+            self.completed &= mask
+            for tag_id, bitmap in self.tags.items():
+                if bitmap >> entity_id & 1:
+                    self.tags[tag_id] = bitmap & mask
+        elif event_type == "tasks.archived":
+            # Saem do índice mas guardam as tags na base de dados (voltam se forem restauradas)
+            mask = ~to_bitmap(data["ids"])
+            self.tasks &= mask
+            self.completed &= mask
+            self.tags = {tag_id: bitmap & mask for tag_id, bitmap in self.tags.items() if bitmap & mask}
+        elif event_type.startswith("task.") and "completed" in data:
+            bit = 1 << entity_id
+            self.tasks |= bit
+            self.completed = self.completed | bit if data["completed"] else self.completed & ~bit
+        elif event_type == "tag.deleted":
+            self.tags.pop(entity_id, None)
+        elif event_type in ("tags.assigned", "tags.unassigned"):
+            mask = to_bitmap(data["task_ids"])
+            for tag_id in data["tag_ids"]:
+                bitmap = self.tags.get(tag_id, 0)
+                bitmap = bitmap | mask if event_type == "tags.assigned" else bitmap & ~mask
+                if bitmap:
+                    self.tags[tag_id] = bitmap
+                else:
+                    self.tags.pop(tag_id, None)
+        elif event_type == "task.tags":
+            bit = 1 << data["task_id"]
+            for tag_id in [tag_id for tag_id, bitmap in self.tags.items() if bitmap & bit]:
+                self.tags[tag_id] &= ~bit
+            for tag_id in data["tag_ids"]:
+                self.tags[tag_id] = self.tags.get(tag_id, 0) | bit
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held by the bitmaps"""
+        return sum((bitmap.bit_length() + 7) // 8 for bitmap in (self.tasks, self.completed, *self.tags.values()))
+
+
+def load(conn) -> TagIndex:
+    """Read the current user's index from the database"""
+    tasks = task_models.Task.__table__
+    assignments = models.TaskTag.__table__
+    ids, completed = [], []
+    for task_id, done in conn.execute(tenancy.owned(select(tasks.c.id, tasks.c.completed), tasks)):
+        ids.append(task_id)
+        if done:
+            completed.append(task_id)
+
+    by_tag = {}
+    for tag_id, task_id in conn.execute(
+        tenancy.owned(select(assignments.c.tag_id, assignments.c.task_id), assignments)
+    ):
+        by_tag.setdefault(tag_id, []).append(task_id)
+    universe = to_bitmap(ids)
+    # As tarefas arquivadas mantêm as suas linhas em task_tags, mas ficam fora do índice
+    by_tag = {tag_id: to_bitmap(t) & universe for tag_id, t in by_tag.items()}
+    return TagIndex(universe, to_bitmap(completed), {tag_id: bitmap for tag_id, bitmap in by_tag.items() if bitmap})
+
+
+class TagIndexes:
+    """LRU of per-user indexes, kept in step with writes through the events broker"""
+
+    def __init__(self, max_users: int = TAG_INDEX_MAX_USERS):
+        self.max_users = max_users
+        self.counters = Counter()
+        self._indexes = OrderedDict()          # user_id -> TagIndex
+        self._loading = {}                     # user_id -> eventos recebidos durante a leitura
+        self._lock = threading.Lock()
+        self._load_locks = [threading.Lock() for _ in range(64)]
+        events.broker.subscribe(self)
+
+    @property
+    def connection_count(self) -> int:
+        # Para o broker: só vale a pena construir eventos enquanto houver índices carregados
+        return len(self._indexes) + len(self._loading)
+
+    def _lookup(self, user_id: int) -> Optional[TagIndex]:
+        index = self._indexes.get(user_id)
+        if index is not None and index.expires_at < time.monotonic():
+            del self._indexes[user_id]
+            self.counters["expirations"] += 1
+            index = None
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+        return index
+
+    def run(self, fn, *args):
+        """Call fn(index, *args) with the current user's index, under the index lock"""
+        user_id = tenancy.current_user_id()
+        with self._lock:
+            index = self._lookup(user_id)
+            if index is not None:
+                self.counters["hits"] += 1
+                return fn(index, *args)
+
+        with self._load_locks[user_id % len(self._load_locks)]:
+            with self._lock:
+                index = self._lookup(user_id)
+                if index is None:
+                    self._loading[user_id] = []
+            if index is None:
+                try:
+                    with tenancy.strategy.engine().connect() as conn:
+                        index = load(conn)
+                finally:
+                    with self._lock:
+                        pending = self._loading.pop(user_id)
+                # Escritas que terminaram durante a leitura (reaplicar é idempotente)
+                for event in pending:
+                    index.apply(event)
+                with self._lock:
+                    self._indexes[user_id] = index
+                    self.counters["loads"] += 1
+                    while len(self._indexes) > self.max_users:
+                        self._indexes.popitem(last=False)
+                        self.counters["evictions"] += 1
+            with self._lock:
+                return fn(index, *args)
+
+    def receive(self, event: str) -> None:
+        """Broker callback (any thread)"""
+        data = json.loads(event)
+        event_type = data["type"]
+        if not event_type.startswith(("task", "tag")):
+            return
+        user_id = data["user_id"]
+        with self._lock:
+            if user_id in self._loading:
+                self._loading[user_id].append(data)
+            elif user_id in self._indexes:
+                if event_type in ("tasks.imported", "tasks.restored"):
+                    # Tarefas (e tags) que não passaram pelos eventos: relê na próxima leitura
+                    del self._indexes[user_id]
+                else:
+                    self._indexes[user_id].apply(data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "users": len(self._indexes),
+                "bytes": sum(index.size for index in self._indexes.values()),
+            }
+
+
+indexes = TagIndexes()
+
+
+# -------------------------------
+# Consultas
+# -------------------------------
+def _compile(expression: str) -> tuple:
+    """Parse expression and resolve its tag names for the current user"""
+    tree = parse(expression)
+    with tenancy.strategy.engine().connect() as conn:
+        return tree, resolve(conn, tag_names(tree))
+
+
+def _exists(tree, tag_ids: Dict[str, int], column):
+    """The expression as correlated EXISTS on task_tags (primary key probes, no bitmaps)"""
+    kind = tree[0]
+    if kind == "tag":
+        tag_id = tag_ids.get(tree[1])
+        if tag_id is None:
+            return false()
+        assignments = models.TaskTag.__table__
+        return exists().where(
+            assignments.c.user_id == tenancy.current_user_id(),
+            assignments.c.tag_id == tag_id,
+            assignments.c.task_id == column,
+        )
+    if kind == "not":
+        return not_(_exists(tree[1], tag_ids, column))
+    combine = and_ if kind == "and" else or_
+    return combine(_exists(tree[1], tag_ids, column), _exists(tree[2], tag_ids, column))
+
+
+def clause(expression: str, column):
+    """SQL condition restricting column (a task id) to the current user's tasks matching expression"""
+    tree, tag_ids = _compile(expression)
+
+    def pick(index: TagIndex):
+        matched = index.evaluate(tree, tag_ids)
+        hits = matched.bit_count()
+        misses = index.tasks.bit_count() - hits
+        # Manda para o SQL a lista mais curta: os que casam ou os que ficam de fora
+        if hits <= misses and hits <= TAG_FILTER_MAX_IDS:
+            return to_ids(matched), False
+        if misses < hits and misses <= TAG_FILTER_MAX_IDS:
+            return to_ids(index.tasks & ~matched), True
+        return None, False
+    ids, negated = indexes.run(pick)
+
+    if ids is None:
+        # Muitos resultados de ambos os lados: percorrer pela ordem da página e parar cedo sai mais barato
+        return _exists(tree, tag_ids, column)
+    if not ids:
+        return true() if negated else false()
+    if tenancy.strategy.engine().dialect.name == "sqlite":
+        values = func.json_each(json.dumps(ids)).table_valued("value")
+        condition = column.in_(select(values.c.value))
+    else:
+        condition = column.in_(ids)
+    return ~condition if negated else condition
+
+
+def count_matching(expression: str, completed: Optional[bool] = None) -> int:
+    """Number of the current user's tasks matching expression (and completed, if given), from the bitmaps alone"""
+    tree, tag_ids = _compile(expression)
+
+    def popcount(index: TagIndex):
+        matched = index.evaluate(tree, tag_ids)
+        if completed is not None:
+            matched = matched & index.completed if completed else matched & ~index.completed
+        return matched.bit_count()
+    return indexes.run(popcount)
+
+
+def summarize(tag_ids: List[int], expression: Optional[str] = None) -> Dict[int, tuple]:
+    """(tasks, completed) per tag, optionally among the tasks matching expression"""
+    tree, names = _compile(expression) if expression else (None, {})
+
+    def popcounts(index: TagIndex):
+        counts = {}
+        scope = index.evaluate(tree, names) if tree is not None else None
+        completed = scope & index.completed if scope is not None else index.completed
+        for tag_id in tag_ids:
+            bitmap = index.tags.get(tag_id, 0)
+            # Sem expressão o âmbito são todas as tarefas: poupa-se um AND por tag
+            total = (bitmap & scope).bit_count() if scope is not None else bitmap.bit_count()
+            counts[tag_id] = (total, (bitmap & completed).bit_count())
+        return counts
+    return indexes.run(popcounts)
+
+
+def render_prometheus() -> str:
+    """Tag index counters in the Prometheus text exposition format"""
+    stats = indexes.stats()
+    lines = []
+    for name in ("hits", "loads", "evictions", "expirations"):
+        lines += [f"# TYPE tag_index_{name}_total counter", f"tag_index_{name}_total {stats.get(name, 0)}"]
+    for name in ("users", "bytes"):
+        lines += [f"# TYPE tag_index_{name} gauge", f"tag_index_{name} {stats.get(name, 0)}"]
+    return "\n".join(lines) + "\n"
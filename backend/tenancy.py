@@ -0,0 +1,329 @@
+"""Per-user data ownership and tenant partitioning.
+
+Every owned row (tasks, categories, time entries, rollups, tombstones,
+sync revisions) carries a ``user_id``. ``TenantMiddleware`` reads the
+caller from the ``X-User-Id`` header (or ``?user_id=`` on WebSockets,
+which cannot set headers) into a context variable; the crud functions
+scope every query with ``owned`` and new rows pick the owner up from the
+column default. Requests without the header act as ``DEFAULT_USER_ID``,
+so single-user clients keep working. This module partitions data, it
+does not authenticate: put it behind something that sets the header.
+
+Where the rows live is pluggable through ``TENANCY``:
+
+* ``shared`` (default) - one database; ``user_id`` leads every composite
+  index, so a tenant's queries only read that tenant's index pages and
+  their cost does not grow with the number of other tenants.
+* ``database`` - one SQLite file per tenant in ``TENANT_DB_DIR``, opened
+  on demand (and migrated on first use) behind an LRU of at most
+  ``TENANT_MAX_ENGINES`` engines with ``TENANT_POOL_SIZE`` connections
+  each, which bounds the open file handles. Async engines for tenant
+  files do not pool connections.
+* ``"module:Class"`` - any other ``Partitioning``.
+
+In shared mode the FTS5 search index is shared too: matching walks every
+tenant's postings before the owner filter applies. Per-tenant files do
+not have that problem.
+"""
+import importlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend import database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_ID = 1
+USER_HEADER = "X-User-Id"
+_HEADER_KEY = USER_HEADER.lower().encode()
+
+TENANCY = os.getenv("TENANCY", "shared")
+TENANT_DB_DIR = os.getenv("TENANT_DB_DIR", "./tenants")
+TENANT_MAX_ENGINES = int(os.getenv("TENANT_MAX_ENGINES", "64"))
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "2"))
+
+_current_user: ContextVar[int] = ContextVar("current_user", default=DEFAULT_USER_ID)
+
+
+def current_user_id() -> int:
+    """Owner of the rows read and written in this context"""
+    return _current_user.get()
+
+
+@contextmanager
+def as_user(user_id: int):
+    """Run the block as user_id (scripts, benchmarks, background jobs)"""
+    token = _current_user.set(user_id)
+    try:
+        yield user_id
+    finally:
+        _current_user.reset(token)
+
+
+def owned(query, entity):
+    """Restrict a query or statement to the current user's rows of entity (ORM class or Table)"""
+    columns = getattr(entity, "c", None)
+    column = columns.user_id if columns is not None else entity.user_id
+    return query.where(column == current_user_id())
+
+
+def parse_user_id(value: Optional[str]) -> int:
+    """User id from a header or query value; raises ValueError if it is not a positive integer"""
+    if value is None or value == "":
+        return DEFAULT_USER_ID
+    user_id = int(value)
+    if user_id < 1:
+        raise ValueError(f"Invalid user id: {value}")
+    return user_id
+
+
+# -------------------------------
+# Estratégias de particionamento
+# -------------------------------
+class Partitioning:
+    """Where a tenant's rows are stored: hands out the engine and sessions for the current user"""
+
+    def engine(self) -> Engine:
+        raise NotImplementedError
+
+    def session(self) -> Session:
+        return Session(bind=self.engine(), autoflush=False)
+
+    def async_session(self):
+        raise NotImplementedError
+
+    def partitions(self) -> list:
+        """User ids to visit (as_user) to read every database once; None when one database holds every tenant"""
+        return [None]
+
+    def open_engines(self) -> list:
+        """Engines currently open, for background jobs that visit every database"""
+        return []
+
+    def stats(self) -> dict:
+        """Counters for /metrics"""
+        return {}
+
+    def dispose(self) -> None:
+        pass
+
+
+class SharedDatabase(Partitioning):
+    """Every tenant in the one configured database, separated by user_id"""
+
+    def engine(self) -> Engine:
+        return database.engine
+
+    def session(self) -> Session:
+        return database.SessionLocal()
+
+    def async_session(self):
+        return database.AsyncSessionLocal()
+
+    def open_engines(self) -> list:
+        return [database.engine]
+
+
+def prepare_database(engine: Engine) -> None:
+    """Bring a database to the current schema with its FTS, sync, insights and tag triggers"""
+    from backend import analytics, migrations, search, sync, tags
+
+    migrations.upgrade(engine)
+    search.install_fts(engine)
+    sync.install_sync(engine)
+    analytics.install_analytics(engine)
+    tags.install_tags(engine)
+
+
+class DatabasePerTenant(Partitioning):
+    """One SQLite file per tenant behind a bounded LRU of open engines"""
+
+    def __init__(self, directory: str = TENANT_DB_DIR, max_engines: int = TENANT_MAX_ENGINES,
+                 pool_size: int = TENANT_POOL_SIZE):
+        self.directory = directory
+        self.max_engines = max_engines
+        self.pool_size = pool_size
+        self.counters = Counter()
+        self._engines = OrderedDict()          # user_id -> (engine, async_engine)
+        self._prepared = set()                 # ficheiros já migrados neste processo
+        self._lock = threading.Lock()
+        # Aberturas do mesmo tenant em série, de tenants diferentes em paralelo
+        self._open_locks = [threading.Lock() for _ in range(64)]
+        os.makedirs(directory, exist_ok=True)
+
+    def url(self, user_id: int) -> str:
+        return f"sqlite:///{os.path.join(self.directory, f'tenant_{user_id}.db')}"
+
+    def _lookup(self, user_id: int):
+        with self._lock:
+            entry = self._engines.get(user_id)
+            if entry is not None:
+                self._engines.move_to_end(user_id)
+            return entry
+
+    def _entry(self, user_id: int) -> tuple:
+        entry = self._lookup(user_id)
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry
+
+        with self._open_locks[user_id % len(self._open_locks)]:
+            entry = self._lookup(user_id)
+            if entry is not None:
+                self.counters["hits"] += 1
+                return entry
+            entry = self._open(user_id)
+            with self._lock:
+                self._engines[user_id] = entry
+                self._evict()
+        return entry
+
+    def _open(self, user_id: int) -> tuple:
+        url = self.url(user_id)
+        options = database.engine_options(url)
+        options.update(pool_size=self.pool_size, max_overflow=0)
+        engine = database.configure_engine(create_engine(url, **options), url)
+        if user_id not in self._prepared:
+            with as_user(user_id):
+                prepare_database(engine)
+            self._prepared.add(user_id)
+
+        async_engine = None
+        if database.ASYNC_DB:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            from sqlalchemy.pool import NullPool
+
+            # Sem pool: fechar um engine async exige o event loop, e assim não há nada para fechar
+            async_url = database.async_url(url)
+            async_engine = create_async_engine(async_url, poolclass=NullPool, connect_args={"check_same_thread": False})
+            database.configure_engine(async_engine.sync_engine, async_url)
+        self.counters["opens"] += 1
+        return engine, async_engine
+
+    def _evict(self) -> None:
+        # Fecha os menos usados recentemente, saltando os que têm ligações em uso
+        for user_id in list(self._engines):
+            if len(self._engines) <= self.max_engines:
+                return
+            engine, _ = self._engines[user_id]
+            if engine.pool.checkedout():
+                continue
+            del self._engines[user_id]
+            engine.dispose()
+            self.counters["evictions"] += 1
+
+    def engine(self) -> Engine:
+        return self._entry(current_user_id())[0]
+
+    def async_session(self):
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        return AsyncSession(self._entry(current_user_id())[1], autoflush=False, expire_on_commit=False)
+
+    def partitions(self) -> list:
+        pattern = re.compile(r"tenant_(\d+)\.db$")
+        return sorted(int(match.group(1)) for match in map(pattern.match, os.listdir(self.directory)) if match)
+
+    def open_engines(self) -> list:
+        with self._lock:
+            return [engine for engine, _ in self._engines.values()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "open": len(self._engines)}
+
+    def dispose(self) -> None:
+        with self._lock:
+            for engine, _ in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+def _load_strategy() -> Partitioning:
+    if TENANCY == "shared":
+        return SharedDatabase()
+    if TENANCY == "database":
+        return DatabasePerTenant()
+    module_name, _, class_name = TENANCY.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+strategy = _load_strategy()
+
+# As dependências get_db / get_async_db abrem as sessões pela estratégia
+database.session_factory = strategy.session
+database.async_session_factory = strategy.async_session
+
+
+def render_prometheus() -> str:
+    """Tenant engine counters in the Prometheus text exposition format"""
+    stats = strategy.stats()
+    if not stats:
+        return ""
+    lines = []
+    for name in ("hits", "opens", "evictions"):
+        lines += [f"# TYPE tenant_engine_{name}_total counter", f"tenant_engine_{name}_total {stats.get(name, 0)}"]
+    lines += ["# TYPE tenant_engines_open gauge", f"tenant_engines_open {stats.get('open', 0)}"]
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Middleware ASGI
+# -------------------------------
+class TenantMiddleware:
+    """Set the current user from X-User-Id (or ?user_id= on WebSockets) for the whole request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        value = None
+        for name, raw in scope.get("headers", ()):
+            if name == _HEADER_KEY:
+                value = raw.decode("latin-1")
+                break
+        if value is None and scope["type"] == "websocket":
+            from urllib.parse import parse_qs
+
+            value = parse_qs(scope.get("query_string", b"").decode()).get("user_id", [None])[0]
+
+        try:
+            user_id = parse_user_id(value)
+        except ValueError:
+            await self._reject(scope, send)
+            return
+
+        token = _current_user.set(user_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_user.reset(token)
+
+    @staticmethod
+    async def _reject(scope, send):
+        if scope["type"] == "websocket":
+            # Fechar antes do accept recusa o handshake (HTTP 403)
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        body = json.dumps({"detail": f"{USER_HEADER} must be a positive integer"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 400,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
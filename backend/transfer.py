@@ -0,0 +1,214 @@
+"""Streaming export and chunked import of tasks, as CSV or NDJSON.
+
+Exports run a single SELECT with ``yield_per`` (a server-side cursor on
+PostgreSQL; SQLite steps its cursor as rows are fetched) and encode each
+fetched batch straight into the response body, so memory stays flat no
+matter how many tasks there are. ``gzip`` compresses the stream on the
+fly.
+
+Imports are read into a temporary file that spills to disk past
+``IMPORT_SPOOL_BYTES``, then parsed one record at a time and inserted in
+transactions of ``IMPORT_BATCH_SIZE`` rows. Gzipped uploads are detected
+by their magic bytes. A record that fails validation (or its insert) is
+reported with the line it starts on and does not stop the others; so is
+one that is not valid UTF-8. A truncated or corrupt gzip upload ends the
+import where it breaks, after inserting the records read until then;
+rows already committed stay committed. Imported tasks get new ids.
+"""
+import csv
+import gzip
+import io
+import json
+import re
+import zlib
+from datetime import date, time
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pydantic_core import to_json
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend import events
+from backend.constants import EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, MAX_IMPORT_ERRORS
+from backend.crud import task as task_crud
+from backend.schemas import task as schemas
+
+# Formato -> media type
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Acima disto o upload é escrito em disco em vez de ficar em memória
+IMPORT_SPOOL_BYTES = 1024 * 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+# Bytes que não são UTF-8 chegam como surrogates (surrogateescape), que texto válido nunca contém
+_UNDECODABLE = re.compile("[\udc80-\udcff]")
+_NOT_UTF8 = "not valid UTF-8"
+
+
+# -------------------------------
+# Exportação
+# -------------------------------
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows, fields: List[str]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([_csv_value(getattr(row, name)) for name in fields] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows, fields: List[str]) -> bytes:
+    return b"".join(to_json({name: getattr(row, name) for name in fields}) + b"\n" for row in rows)
+
+
+def export_chunks(engine: Engine, fmt: str, fields: List[str], **filters) -> Iterator[bytes]:
+    """Encoded export body, one chunk per batch of rows fetched from the database"""
+    # A consulta é construída já, com o utilizador do pedido; as linhas são lidas depois
+    return _export_chunks(engine, task_crud.export_statement(fields, **filters), fmt, fields)
+
+
+def _export_chunks(engine: Engine, statement, fmt: str, fields: List[str]) -> Iterator[bytes]:
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    if fmt == "csv":
+        yield ",".join(fields).encode() + b"\n"
+
+    # Ligação própria: o corpo é gerado depois de a rota (e a sua sessão) terminar
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(statement)
+        for rows in result.partitions():
+            yield encode(rows, fields)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a stream of chunks into a single gzip member"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+# -------------------------------
+# Importação
+# -------------------------------
+def open_upload(fileobj: IO[bytes]) -> IO[str]:
+    """Text view of an uploaded file, transparently gunzipped"""
+    magic = fileobj.read(2)
+    fileobj.seek(0)
+    if magic == _GZIP_MAGIC:
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode="rb")
+    # utf-8-sig ignora o BOM que o Excel põe nos CSV; bytes inválidos são reportados no registo onde aparecem
+    return io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="surrogateescape", newline="")
+
+
+def _csv_records(stream: IO[str]) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    reader = csv.DictReader(stream)
+    start = 2
+    for record in reader:
+        # Campos entre aspas podem ocupar várias linhas: reporta a linha onde o registo começa
+        if None in record:
+            yield start, None, "more values than header columns"
+        elif any(value and _UNDECODABLE.search(value) for value in record.values()):
+            yield start, None, _NOT_UTF8
+        else:
+            yield start, {key: value if value != "" else None for key, value in record.items()}, None
+        start = reader.line_num + 1
+
+
+def _ndjson_records(stream: IO[str]) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        if _UNDECODABLE.search(line):
+            yield number, None, _NOT_UTF8
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, None, f"invalid JSON: {e.msg}"
+            continue
+        if isinstance(record, dict):
+            yield number, record, None
+        else:
+            yield number, None, "each line must be a JSON object"
+
+
+def read_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(line, record, error) for every record of the upload, parsed incrementally"""
+    return _csv_records(stream) if fmt == "csv" else _ndjson_records(stream)
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc']) or 'body'}: {err['msg']}" for err in e.errors()
+    )
+
+
+class _ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def import_tasks(db: Session, fileobj: IO[bytes], fmt: str) -> dict:
+    """Validate and insert every record of an upload in batched transactions; returns the report"""
+    report = _ImportReport()
+    batch, lines = [], []
+
+    def flush():
+        for line, error in zip(lines, task_crud.insert_task_batch(db, batch)):
+            if error is None:
+                report.imported += 1
+            else:
+                report.fail(line, error)
+        batch.clear()
+        lines.clear()
+
+    line = 0
+    try:
+        for line, record, error in read_records(open_upload(fileobj), fmt):
+            if error is None:
+                try:
+                    task = schemas.TaskImport.model_validate(record)
+                except ValidationError as e:
+                    error = _validation_message(e)
+            if error is not None:
+                report.fail(line, error)
+                continue
+
+            batch.append(task.model_dump())
+            lines.append(line)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        # gzip truncado ou corrompido: o que já foi lido é importado, o resto do ficheiro fica de fora
+        report.fail(line + 1, f"unreadable gzip data: {e}")
+    flush()
+    if report.imported:
+        # Um só evento para a importação inteira: quem o recebe relê as tarefas do utilizador
+        events.emit("tasks.imported", None, lambda: {"imported": report.imported})
+    return report.as_dict()
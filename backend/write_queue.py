@@ -0,0 +1,215 @@
+"""Opt-in group commit for the small write routes.
+
+With ``GROUP_COMMIT=1`` the write routes hand their crud call to a single
+writer thread instead of committing on their own connection. The writer
+drains whatever is queued (up to ``GROUP_COMMIT_MAX_OPS``) and runs the
+whole group in one transaction, so a burst of concurrent writes costs one
+fsync instead of one each and writers stop queueing on the SQLite lock.
+Groups form on their own while the previous one is committing; on disks
+with slow fsync, ``GROUP_COMMIT_WINDOW_MS`` additionally waits that long
+for stragglers, trading a little latency for larger groups.
+
+Each operation runs in its own session joined to the group's transaction
+with ``join_transaction_mode="create_savepoint"``, inside a SAVEPOINT of its
+own: the crud function's ``commit()`` only releases a nested SAVEPOINT, and
+an operation that raises is rolled back entirely without affecting the
+others.
+Change events and cache invalidation are held back until the real commit
+and every caller's future then resolves with its own result or error. If
+the group commit itself fails, every operation in it fails with that
+error.
+
+Operations are grouped per engine: with one SQLite file per tenant
+(``TENANCY=database``) each tenant's writes share a transaction on that
+tenant's file. Only the sync routes go through the writer; with
+``DB_ASYNC=1`` the async routes keep committing on their own.
+"""
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend import cache, events
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_OPS = int(os.getenv("GROUP_COMMIT_MAX_OPS", "64"))
+# Espera máxima por mais operações depois da primeira (0 = só o que já está na fila)
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0"))
+
+_STOP = object()
+
+
+class _Operation:
+    __slots__ = ("engine", "func", "args", "kwargs", "context", "future")
+
+    def __init__(self, engine: Engine, func: Callable, args: tuple, kwargs: dict):
+        self.engine = engine
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        # Corre no contexto de quem pediu: as métricas do pedido contam as suas instruções SQL
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    """Single writer thread applying queued crud writes in shared transactions"""
+
+    def __init__(self, engine: Engine, max_ops: int = GROUP_COMMIT_MAX_OPS, window_ms: float = GROUP_COMMIT_WINDOW_MS):
+        self.engine = engine
+        self.max_ops = max_ops
+        self.window = window_ms / 1000
+        self.counters = Counter()
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Queue func(session, *args, **kwargs); the future resolves once its group has committed"""
+        return self.submit_to(self.engine, func, *args, **kwargs)
+
+    def submit_to(self, engine: Engine, func: Callable, *args, **kwargs) -> Future:
+        """Like submit, on another database (e.g. a tenant's file)"""
+        operation = _Operation(engine, func, args, kwargs)
+        self._ensure_started()
+        self._queue.put(operation)
+        return operation.future
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Apply what is already queued, then stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    # -------------------------------
+    # Thread de escrita
+    # -------------------------------
+    def _next_group(self) -> tuple:
+        group, stopping = [], False
+        first = self._queue.get()
+        if first is _STOP:
+            return group, True
+        group.append(first)
+
+        deadline = time.monotonic() + self.window
+        while len(group) < self.max_ops:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            group.append(item)
+        return group, stopping
+
+    def _run(self) -> None:
+        while True:
+            group, stopping = self._next_group()
+            by_engine = {}
+            for operation in group:
+                by_engine.setdefault(operation.engine, []).append(operation)
+            for operations in by_engine.values():
+                try:
+                    self._apply(operations)
+                except Exception as e:
+                    # Nunca deixar a thread morrer com pedidos à espera
+                    logger.exception("Group commit failed")
+                    for operation in operations:
+                        if not operation.future.done():
+                            operation.future.set_exception(e)
+            if stopping:
+                return
+
+    def _run_operation(self, conn, operation: _Operation, pending_events: list, tags: set):
+        # SAVEPOINT por operação: se a função falhar, nada do que escreveu fica, mesmo o que já "comitou"
+        savepoint = conn.begin_nested()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint", autoflush=False)
+        session.info["cache_deferred_tables"] = tags
+        try:
+            with events.deferred(pending_events):
+                result = operation.func(session, *operation.args, **operation.kwargs)
+        except BaseException:
+            session.close()
+            savepoint.rollback()
+            raise
+        session.close()
+        savepoint.commit()
+        return result
+
+    def _apply(self, group: list) -> None:
+        outcomes, pending_events, tags = [], [], set()
+        with group[0].engine.connect() as conn:
+            conn.begin()
+            for operation in group:
+                held = []
+                try:
+                    result = operation.context.run(self._run_operation, conn, operation, held, tags)
+                except Exception as e:
+                    outcomes.append((operation, None, e))
+                    continue
+                outcomes.append((operation, result, None))
+                pending_events.extend(held)
+            conn.commit()
+
+        self.counters["groups"] += 1
+        self.counters["operations"] += len(group)
+        self.counters["max_group_size"] = max(self.counters["max_group_size"], len(group))
+
+        # Só agora as escritas são duráveis e visíveis a outras ligações
+        if tags:
+            cache.backend.invalidate(tags)
+        events.publish_deferred(pending_events)
+        for operation, result, error in outcomes:
+            if error is None:
+                operation.future.set_result(result)
+            else:
+                operation.future.set_exception(error)
+
+
+writer: Optional[GroupCommitWriter] = None
+if GROUP_COMMIT:
+    from backend import database
+
+    writer = GroupCommitWriter(database.engine)
+
+
+def apply(db: Session, func: Callable, *args, **kwargs):
+    """Run a crud write, on db directly or through the group-commit writer when it is enabled"""
+    if writer is None:
+        return func(db, *args, **kwargs)
+    return writer.submit_to(db.get_bind(), func, *args, **kwargs).result()
+
+
+def render_prometheus() -> str:
+    """Group commit counters in the Prometheus text exposition format"""
+    if writer is None:
+        return ""
+    counters = writer.counters
+    return "\n".join([
+        "# TYPE group_commit_groups_total counter",
+        f"group_commit_groups_total {counters['groups']}",
+        "# TYPE group_commit_operations_total counter",
+        f"group_commit_operations_total {counters['operations']}",
+        "# TYPE group_commit_max_group_size gauge",
+        f"group_commit_max_group_size {counters['max_group_size']}",
+    ]) + "\n"
@@ -94,7 +94,7 @@ const useTaskAPI = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       const data = await response.json();
-      return data;
+      return data.tasks;
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : 'Unknown error occurred';
       setError(`Failed to fetch tasks: ${errorMessage}`);
@@ -37,7 +37,7 @@ export default function HomeScreen() {
     try {
       const response = await fetch(`${API_URL}/tasks/`);
       const data = await response.json();
-      setTasks(data);
+      setTasks(data.tasks);
     } catch (error) {
       console.error('Erro ao buscar tarefas:', error);
     } finally {